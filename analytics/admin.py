@@ -0,0 +1,23 @@
+from django.contrib import admin
+from .models import DailyCategorySales, DailyProductSales, ProductRecommendation
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'units', 'revenue', 'orders')
+    list_filter = ('date',)
+    list_select_related = ('product',)
+
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'category', 'units', 'revenue')
+    list_filter = ('date',)
+    list_select_related = ('category',)
+
+
+@admin.register(ProductRecommendation)
+class ProductRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'rank', 'related', 'orders')
+    list_select_related = ('product', 'related')
+    raw_id_fields = ('product', 'related')
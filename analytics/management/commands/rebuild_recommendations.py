@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from analytics.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает матрицу совместных покупок и top-K «часто покупают вместе» из заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Заказов в одной пачке подсчёта')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Строк в одном INSERT')
+        parser.add_argument('--top-k', type=int, help='Соседей на товар (по умолчанию RECOMMENDATIONS_TOP_K)')
+
+    def handle(self, *args, **options):
+        pairs, recommendations = rebuild_recommendations(options['chunk_size'], options['batch_size'], options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'Пар: {pairs}, рекомендаций: {recommendations}'))
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from analytics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневные сводки продаж из заказов (целиком или за период)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', type=date.fromisoformat, help='YYYY-MM-DD, включительно')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='YYYY-MM-DD, включительно')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups(options['date_from'], options['date_to'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Строк в сводках: {rows}'))
@@ -0,0 +1,72 @@
+from django.db import models
+from products.models import Category, Product
+
+REVENUE_FIELD = dict(max_digits=14, decimal_places=2, default=0)
+
+
+class DailyProductSales(models.Model):
+    """Продажи товара за день (заказы без статуса canceled)"""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(**REVENUE_FIELD)
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'product')
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.units}"
+
+
+class DailyCategorySales(models.Model):
+    """Продажи категории за день (по категории товара)"""
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(**REVENUE_FIELD)
+
+    class Meta:
+        unique_together = ('date', 'category')
+        verbose_name = 'Продажи категории за день'
+        verbose_name_plural = 'Продажи категорий по дням'
+
+    def __str__(self):
+        return f"{self.date} {self.category_id}: {self.units}"
+
+
+class ProductPair(models.Model):
+    """
+    Разреженная матрица совместных покупок: в скольких заказах (без canceled)
+    product и related куплены вместе. Хранится в обе стороны — (a, b) и (b, a).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'related')
+        verbose_name = 'Совместная покупка'
+        verbose_name_plural = 'Совместные покупки'
+
+    def __str__(self):
+        return f"{self.product_id} + {self.related_id}: {self.orders}"
+
+
+class ProductRecommendation(models.Model):
+    """Top-K соседей товара по ProductPair — то, что отдаёт эндпоинт «часто покупают вместе»"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    rank = models.PositiveSmallIntegerField()
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField()
+
+    class Meta:
+        # Эндпоинт читает соседей одним проходом по этому индексу
+        unique_together = ('product', 'rank')
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации «часто покупают вместе»'
+
+    def __str__(self):
+        return f"{self.product_id} #{self.rank}: {self.related_id}"
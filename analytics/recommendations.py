@@ -0,0 +1,173 @@
+import heapq
+import logging
+from collections import Counter, defaultdict
+from functools import reduce
+from itertools import islice, permutations
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from orders.models import OrderItem
+from .models import ProductPair, ProductRecommendation
+from .rollups import EXCLUDED_STATUS, upsert_increments
+
+logger = logging.getLogger(__name__)
+
+# Заказы с большим числом разных товаров (оптовые) дают квадратичное число пар и только шум
+MAX_ORDER_PRODUCTS = 50
+
+
+def order_pairs(product_ids):
+    """Упорядоченные пары разных товаров одного заказа: (a, b) и (b, a)"""
+    product_ids = sorted(set(product_ids))
+    if len(product_ids) > MAX_ORDER_PRODUCTS:
+        return []
+    return list(permutations(product_ids, 2))
+
+
+def refresh_top_k(product_ids, top_k=None):
+    """
+    Пересчитывает top-K соседей товаров из ProductPair: одна выборка с ROW_NUMBER() по индексу.
+    Строки пишутся upsert-ом по (product, rank) с удалением хвоста, поэтому параллельные
+    пересчёты одного товара не упираются в уникальный ключ.
+    """
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    product_ids = sorted(product_ids)
+    if not product_ids:
+        return
+    ranked = (
+        ProductPair.objects.filter(product_id__in=product_ids, orders__gt=0)
+        .annotate(rank=Window(RowNumber(), partition_by=[F('product_id')], order_by=[F('orders').desc(), F('related_id')]))
+        .filter(rank__lte=top_k)
+        .values_list('product_id', 'rank', 'related_id', 'orders')
+    )
+    rows = sorted(
+        (ProductRecommendation(product_id=product_id, rank=rank, related_id=related_id, orders=orders)
+         for product_id, rank, related_id, orders in ranked),
+        key=lambda row: (row.product_id, row.rank),
+    )
+    lengths = Counter(row.product_id for row in rows)
+    with transaction.atomic():
+        if rows:
+            ProductRecommendation.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['product', 'rank'], update_fields=['related', 'orders'],
+            )
+        ProductRecommendation.objects.filter(
+            reduce(or_, (Q(product_id=product_id, rank__gt=lengths[product_id]) for product_id in product_ids))
+        ).delete()
+
+
+def affected_products(pairs, top_k):
+    """
+    Товары, чей top-K мог измениться от изменения пар: сосед уже в списке, список неполный
+    или новый счётчик пары дотягивает до K-го места. Остальные пересчитывать незачем.
+    """
+    product_ids = {a for a, _ in pairs}
+    listed = defaultdict(dict)
+    for product_id, related_id, orders in ProductRecommendation.objects.filter(product_id__in=product_ids).values_list(
+        'product_id', 'related_id', 'orders'
+    ):
+        listed[product_id][related_id] = orders
+    counts = {
+        (a, b): orders
+        for a, b, orders in ProductPair.objects.filter(product_id__in=product_ids, related_id__in=product_ids)
+        .values_list('product_id', 'related_id', 'orders')
+    }
+    affected = set()
+    for a, b in pairs:
+        current = listed[a]
+        orders = counts.get((a, b), 0)
+        if b in current or (orders > 0 and (len(current) < top_k or orders >= min(current.values()))):
+            affected.add(a)
+    return affected
+
+
+def record_co_purchases(product_ids, sign=1):
+    """
+    Инкрементальное обновление: прибавляет (sign=1) или вычитает (sign=-1) заказ из матрицы пар.
+    В транзакции заказа — только upsert счётчиков; top-K затронутых товаров пересчитывается
+    после коммита, вне блокировок заказа. Если пересчёт упал, списки догонит rebuild_recommendations.
+    """
+    pairs = order_pairs(product_ids)
+    if not pairs:
+        return
+    upsert_increments(ProductPair, ['product', 'related'], ['orders'], [(a, b, sign) for a, b in pairs])
+
+    def refresh():
+        top_k = settings.RECOMMENDATIONS_TOP_K
+        try:
+            refresh_top_k(affected_products(pairs, top_k), top_k)
+        except Exception:
+            logger.exception('Не удалось пересчитать рекомендации товаров %s', sorted({a for a, _ in pairs}))
+
+    transaction.on_commit(refresh)
+
+
+def count_pairs(chunk_size=5000):
+    """
+    Офлайн-подсчёт матрицы: позиции заказов читаются курсором, отсортированными по заказу,
+    пары считаются пачками по chunk_size заказов в Counter и сливаются в общий словарь.
+    Возвращает {(a, b): число заказов}.
+    """
+    items = (
+        OrderItem.objects.exclude(order__status=EXCLUDED_STATUS)
+        .order_by('order_id', 'product_id')
+        .values_list('order_id', 'product_id')
+    )
+    matrix = Counter()
+    chunk = Counter()
+    orders_in_chunk = 0
+    current_order, current_products = None, []
+    for order_id, product_id in items.iterator(chunk_size=chunk_size):
+        if order_id != current_order:
+            if current_products:
+                chunk.update(order_pairs(current_products))
+                orders_in_chunk += 1
+                if orders_in_chunk >= chunk_size:
+                    matrix.update(chunk)
+                    chunk, orders_in_chunk = Counter(), 0
+            current_order, current_products = order_id, []
+        current_products.append(product_id)
+    if current_products:
+        chunk.update(order_pairs(current_products))
+    matrix.update(chunk)
+    return matrix
+
+
+def top_k_rows(matrix, top_k):
+    neighbours = defaultdict(list)
+    for (product_id, related_id), orders in matrix.items():
+        if orders > 0:
+            neighbours[product_id].append((orders, -related_id))
+    for product_id, candidates in neighbours.items():
+        for rank, (orders, negative_id) in enumerate(heapq.nlargest(top_k, candidates), start=1):
+            yield ProductRecommendation(product_id=product_id, rank=rank, related_id=-negative_id, orders=orders)
+
+
+def insert_batches(model, rows, batch_size):
+    """bulk_create из генератора кусками — без списка всех объектов в памяти"""
+    rows = iter(rows)
+    total = 0
+    while batch := list(islice(rows, batch_size)):
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def rebuild_recommendations(chunk_size=5000, batch_size=5000, top_k=None):
+    """Полная пересборка ProductPair и ProductRecommendation. Возвращает (пар, рекомендаций)."""
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    matrix = count_pairs(chunk_size)
+    with transaction.atomic():
+        ProductPair.objects.all().delete()
+        ProductRecommendation.objects.all().delete()
+        pairs = insert_batches(
+            ProductPair,
+            (ProductPair(product_id=a, related_id=b, orders=orders) for (a, b), orders in matrix.items() if orders > 0),
+            batch_size,
+        )
+        recommendations = insert_batches(ProductRecommendation, top_k_rows(matrix, top_k), batch_size)
+    return pairs, recommendations
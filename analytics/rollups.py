@@ -0,0 +1,158 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import OrderItem
+from products.models import Product
+from .models import DailyCategorySales, DailyProductSales
+
+# Отменённые заказы в продажи не входят
+EXCLUDED_STATUS = 'canceled'
+
+
+def order_lines(order, exclude_item=None):
+    """(product_id, category_id, quantity, price) позиций заказа"""
+    items = OrderItem.objects.filter(order=order)
+    if exclude_item is not None:
+        items = items.exclude(pk=exclude_item)
+    return list(items.values_list('product_id', 'product__category_id', 'quantity', 'price'))
+
+
+def upsert_increments(model, keys, values, rows):
+    """
+    INSERT ... ON CONFLICT (keys) DO UPDATE SET value = value + EXCLUDED.value
+    Прибавляет rows к счётчикам одним запросом (PostgreSQL и SQLite >= 3.24).
+    Строки вставляются в порядке ключа: параллельные заказы блокируют общие строки
+    сводок (одна категория — разные товары) в одном порядке и не попадают во взаимную блокировку.
+    """
+    if not rows:
+        return
+    rows = sorted(rows, key=lambda row: row[:len(keys)])
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [model._meta.get_field(name).column for name in keys + values]
+    key_columns = columns[:len(keys)]
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    updates = ', '.join(f'{qn(column)} = {table}.{qn(column)} + EXCLUDED.{qn(column)}' for column in columns[len(keys):])
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(column) for column in columns)}) VALUES {placeholders} "
+        f"ON CONFLICT ({', '.join(qn(column) for column in key_columns)}) DO UPDATE SET {updates}"
+    )
+    params = []
+    for row in rows:
+        for name, value in zip(keys + values, row):
+            if name == 'date':
+                value = connection.ops.adapt_datefield_value(value)
+            elif isinstance(value, Decimal):
+                value = connection.ops.adapt_decimalfield_value(value)
+            params.append(value)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_order(order, lines, sign=1):
+    """
+    Добавляет (sign=1) или вычитает (sign=-1) заказ из дневных сводок.
+    Вызывается внутри транзакции, которая меняет сам заказ.
+    """
+    day = timezone.localdate(order.created_at)
+    products = defaultdict(lambda: [0, Decimal(0)])
+    categories = defaultdict(lambda: [0, Decimal(0)])
+    for product_id, category_id, quantity, price in lines:
+        revenue = Decimal(price) * quantity
+        for totals in (products[product_id], categories[category_id]):
+            totals[0] += quantity
+            totals[1] += revenue
+
+    upsert_increments(
+        DailyProductSales, ['date', 'product'], ['units', 'revenue', 'orders'],
+        [(day, product_id, units * sign, revenue * sign, sign) for product_id, (units, revenue) in products.items()],
+    )
+    upsert_increments(
+        DailyCategorySales, ['date', 'category'], ['units', 'revenue'],
+        [(day, category_id, units * sign, revenue * sign) for category_id, (units, revenue) in categories.items()],
+    )
+
+
+def record_item_change(order, item_id, old=None, new=None):
+    """
+    Позиция заказа изменена в обход CheckoutView (админка, shell): заказ вычитается
+    в составе «со старой позицией» и прибавляется «с новой».
+    old/new — (product_id, quantity, price) или None (позиция создана/удалена).
+    Возвращает строки заказа до и после изменения.
+    """
+    others = order_lines(order, exclude_item=item_id)
+    product_ids = {line[0] for line in (old, new) if line}
+    categories = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'category_id'))
+
+    def with_line(line):
+        if line is None:
+            return others
+        product_id, quantity, price = line
+        return others + [(product_id, categories[product_id], quantity, price)]
+
+    before, after = with_line(old), with_line(new)
+    record_order(order, before, sign=-1)
+    record_order(order, after)
+    return before, after
+
+
+def move_product_category(product_id, old_category_id, new_category_id=None):
+    """
+    Сводки по категориям ведутся по текущей категории товара (как в rebuild_rollups):
+    при смене категории история продаж товара переносится в новую, при удалении товара — вычитается.
+    """
+    history = DailyProductSales.objects.filter(product_id=product_id).values_list('date', 'units', 'revenue')
+    rows = []
+    for day, units, revenue in history:
+        rows.append((day, old_category_id, -units, -revenue))
+        if new_category_id is not None:
+            rows.append((day, new_category_id, units, revenue))
+    upsert_increments(DailyCategorySales, ['date', 'category'], ['units', 'revenue'], rows)
+
+
+def rebuild_rollups(date_from=None, date_to=None, batch_size=1000):
+    """Пересобирает сводки из OrderItem за период (или целиком). Возвращает число строк."""
+    items = (
+        OrderItem.objects.exclude(order__status=EXCLUDED_STATUS)
+        .annotate(day=TruncDate('order__created_at'))
+        .order_by()
+    )
+    rollups = [DailyProductSales.objects.all(), DailyCategorySales.objects.all()]
+    if date_from:
+        items = items.filter(day__gte=date_from)
+        rollups = [queryset.filter(date__gte=date_from) for queryset in rollups]
+    if date_to:
+        items = items.filter(day__lte=date_to)
+        rollups = [queryset.filter(date__lte=date_to) for queryset in rollups]
+
+    revenue = Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    by_product = items.values('day', 'product_id').annotate(
+        units=Sum('quantity'), revenue=revenue, orders=Count('order_id', distinct=True)
+    )
+    by_category = items.values('day', 'product__category_id').annotate(units=Sum('quantity'), revenue=revenue)
+
+    with transaction.atomic():
+        for queryset in rollups:
+            queryset.delete()
+        product_rows = DailyProductSales.objects.bulk_create(
+            [
+                DailyProductSales(date=row['day'], product_id=row['product_id'], units=row['units'],
+                                  revenue=row['revenue'], orders=row['orders'])
+                for row in by_product.iterator(chunk_size=batch_size)
+            ],
+            batch_size=batch_size,
+        )
+        category_rows = DailyCategorySales.objects.bulk_create(
+            [
+                DailyCategorySales(date=row['day'], category_id=row['product__category_id'],
+                                   units=row['units'], revenue=row['revenue'])
+                for row in by_category.iterator(chunk_size=batch_size)
+            ],
+            batch_size=batch_size,
+        )
+    return len(product_rows) + len(category_rows)
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from orders.models import Order, OrderItem
+from products.models import Product
+from .recommendations import record_co_purchases
+from .rollups import EXCLUDED_STATUS, move_product_category, order_lines, record_item_change, record_order
+
+# Заказ, созданный CheckoutView, учитывается там же (позиции вставляются bulk_create без сигналов).
+# Остальные изменения — статус заказа, позиции из админки/shell, удаление, смена категории товара —
+# ловятся здесь. Массовые QuerySet.update()/bulk_create()/delete() позиций учитываются неточно
+# или вовсе без сигналов: после них нужны rebuild_sales_rollups и rebuild_recommendations.
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, **kwargs):
+    # Новый заказ пока без позиций — их учтут обработчики OrderItem; здесь — переходы в/из canceled
+    if created:
+        return
+    was_counted = getattr(instance, '_loaded_status', instance.status) != EXCLUDED_STATUS
+    is_counted = instance.status != EXCLUDED_STATUS
+    if was_counted != is_counted:
+        lines = order_lines(instance)
+        sign = 1 if is_counted else -1
+        record_order(instance, lines, sign=sign)
+        record_co_purchases([line[0] for line in lines], sign=sign)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_loaded_status', instance.status) != EXCLUDED_STATUS:
+        lines = order_lines(instance)
+        record_order(instance, lines, sign=-1)
+        record_co_purchases([line[0] for line in lines], sign=-1)
+
+
+def sync_order_item(item, old, new):
+    """Пересчитывает вклад заказа после изменения одной позиции"""
+    order = item.order
+    if order.status == EXCLUDED_STATUS:
+        return
+    with transaction.atomic():
+        before, after = record_item_change(order, item.pk, old, new)
+        before_ids = {line[0] for line in before}
+        after_ids = {line[0] for line in after}
+        if before_ids != after_ids:
+            record_co_purchases(list(before_ids), sign=-1)
+            record_co_purchases(list(after_ids))
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_loaded_line', None)
+    new = instance.line_key()
+    if old != new:
+        sync_order_item(instance, old, new)
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, origin=None, **kwargs):
+    # Каскад от заказа уже вычтен в order_deleted, от товара — в product_deleted
+    if origin is instance:
+        sync_order_item(instance, getattr(instance, '_loaded_line', instance.line_key()), None)
+
+
+@receiver(post_save, sender=Product)
+def product_category_changed(sender, instance, created, **kwargs):
+    old = getattr(instance, '_loaded_category_id', None)
+    if not created and old is not None and old != instance.category_id:
+        move_product_category(instance.pk, old, instance.category_id)
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    # Строки товара в сводках удалит каскад, а его доля в сводках категории — здесь
+    move_product_category(instance.pk, getattr(instance, '_loaded_category_id', instance.category_id))
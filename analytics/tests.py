@@ -0,0 +1,220 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from users.models import User
+from .models import DailyCategorySales, DailyProductSales, ProductPair, ProductRecommendation
+from .recommendations import affected_products, rebuild_recommendations
+from .rollups import rebuild_rollups, record_order
+
+
+class CheckoutMixin:
+    def checkout(self, *lines):
+        cart, _ = Cart.objects.get_or_create(user=self.buyer)
+        ids = [CartItem.objects.create(cart=cart, product=product, quantity=quantity).id for product, quantity in lines]
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/orders/checkout/', {'selected_cart_items': ids}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.data['order_id'])
+
+
+class SalesRollupTests(CheckoutMixin, TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create(username='buyer', phone='+998900000041', address='Nukus')
+        self.staff = User.objects.create(username='boss', phone='+998900000042', is_staff=True)
+        self.category = Category.objects.create(name='Texnika')
+        self.phone = Product.objects.create(category=self.category, name='Phone', description='', price=100, discount_price=90, stock=10)
+        self.case = Product.objects.create(category=self.category, name='Case', description='', price=10, stock=10)
+
+    def snapshot(self, nonzero=False):
+        # Инкрементальные правки оставляют нулевые строки, которых нет после пересборки
+        products, categories = DailyProductSales.objects.all(), DailyCategorySales.objects.all()
+        if nonzero:
+            products, categories = products.exclude(units=0), categories.exclude(units=0)
+        return (
+            sorted(products.values_list('product_id', 'units', 'revenue', 'orders')),
+            sorted(categories.values_list('category_id', 'units', 'revenue')),
+        )
+
+    def test_checkout_and_cancel_update_rollups(self):
+        self.checkout((self.phone, 2), (self.case, 1))
+        order = self.checkout((self.phone, 1))
+        self.assertEqual(self.snapshot(), (
+            [(self.phone.id, 3, Decimal('270.00'), 2), (self.case.id, 1, Decimal('10.00'), 1)],
+            [(self.category.id, 4, Decimal('280.00'))],
+        ))
+
+        order.status = 'canceled'
+        order.save()
+        self.assertEqual(DailyProductSales.objects.get(product=self.phone).units, 2)
+
+        incremental = self.snapshot()
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_orders_edited_outside_checkout_match_rebuild(self):
+        # Заказ из админки/shell: позиции добавляются, меняются и удаляются по одной
+        accessories = Category.objects.create(name='Aksessuar')
+        self.checkout((self.phone, 1), (self.case, 2))
+        order = Order.objects.create(user=self.buyer, total_price=0, address='Nukus')
+        OrderItem.objects.create(order=order, product=self.phone, price=90, quantity=1)
+        case_item = OrderItem.objects.create(order=order, product=self.case, price=10, quantity=1)
+        self.assertEqual(DailyProductSales.objects.get(product=self.phone).orders, 2)
+
+        case_item.quantity = 4
+        case_item.save()
+        phone_item = OrderItem.objects.get(order=order, product=self.phone)
+        phone_item.product = self.case
+        phone_item.save()
+        self.case.category = accessories
+        self.case.save()
+        case_item.delete()
+
+        incremental = self.snapshot(nonzero=True)
+        self.assertEqual(incremental[0], [(self.phone.id, 1, Decimal('90.00'), 1), (self.case.id, 3, Decimal('110.00'), 2)])
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(nonzero=True), incremental)
+
+        order.delete()
+        self.phone.delete()
+        incremental = self.snapshot(nonzero=True)
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(nonzero=True), incremental)
+
+    def test_upserts_lock_rows_in_key_order(self):
+        # Разные товары одной пары категорий в разном порядке строк — порядок блокировок один
+        accessories = Category.objects.create(name='Aksessuar')
+        self.case.category = accessories
+        self.case.save()
+        order = Order.objects.create(user=self.buyer, total_price=0, address='Nukus')
+        lines = [(self.case.id, accessories.id, 1, Decimal('10')), (self.phone.id, self.category.id, 1, Decimal('90'))]
+        executed = []
+
+        def capture(execute, sql, params, many, context):
+            executed.append(params)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            record_order(order, lines)
+        product_params, category_params = executed
+        self.assertEqual(product_params[1::5], [self.phone.id, self.case.id])
+        self.assertEqual(category_params[1::4], sorted([self.category.id, accessories.id]))
+
+    def test_staff_endpoints_read_rollups(self):
+        self.checkout((self.phone, 2), (self.case, 5))
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        top = client.get('/api/analytics/sales/products/', {'sort': 'units', 'limit': 1})
+        daily = client.get('/api/analytics/sales/daily/')
+
+        self.assertEqual([row['product_name'] for row in top.data], ['Case'])
+        self.assertEqual(daily.data[0]['revenue'], '230.00')
+
+        client.force_authenticate(self.buyer)
+        self.assertEqual(client.get('/api/analytics/sales/daily/').status_code, 403)
+
+
+class RecommendationTests(CheckoutMixin, TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create(username='buyer', phone='+998900000043', address='Nukus')
+        category = Category.objects.create(name='Texnika')
+        self.phone, self.case, self.charger = (
+            Product.objects.create(category=category, name=name, description='', price=price, stock=10)
+            for name, price in (('Phone', 100), ('Case', 10), ('Charger', 20))
+        )
+
+    def snapshot(self):
+        return (
+            sorted(ProductPair.objects.filter(orders__gt=0).values_list('product_id', 'related_id', 'orders')),
+            sorted(ProductRecommendation.objects.values_list('product_id', 'rank', 'related_id', 'orders')),
+        )
+
+    def neighbours(self, product):
+        response = APIClient().get(f'/api/products/{product.id}/recommendations/')
+        self.assertEqual(response.status_code, 200)
+        return [(row['id'], row['orders']) for row in response.data]
+
+    def test_checkout_and_cancel_update_neighbours(self):
+        self.checkout((self.phone, 1), (self.case, 1), (self.charger, 1))
+        self.checkout((self.phone, 1), (self.case, 2))
+        order = self.checkout((self.phone, 1), (self.charger, 1))
+        self.checkout((self.phone, 1), (self.charger, 1))
+        self.assertEqual(self.neighbours(self.phone), [(self.charger.id, 3), (self.case.id, 2)])
+        self.assertEqual(self.neighbours(self.case), [(self.phone.id, 2), (self.charger.id, 1)])
+
+        order.status = 'canceled'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(self.neighbours(self.phone), [(self.case.id, 2), (self.charger.id, 2)])
+
+        incremental = self.snapshot()
+        self.assertEqual(rebuild_recommendations(chunk_size=1, batch_size=2), (6, 6))
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_endpoint_is_one_query_and_skips_inactive(self):
+        self.checkout((self.phone, 1), (self.case, 1), (self.charger, 1))
+        Product.objects.filter(pk=self.case.pk).update(is_active=False)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.neighbours(self.phone), [(self.charger.id, 1)])
+        self.assertEqual(self.neighbours(Product(id=999999)), [])
+        self.assertEqual(APIClient().get('/api/products/abc/recommendations/').status_code, 404)
+
+    def test_order_items_edited_outside_checkout_match_rebuild(self):
+        self.checkout((self.phone, 1), (self.case, 1))
+        order = Order.objects.create(user=self.buyer, total_price=0, address='Nukus')
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, product=self.phone, price=100, quantity=1)
+            item = OrderItem.objects.create(order=order, product=self.case, price=10, quantity=1)
+        self.assertEqual(self.neighbours(self.phone), [(self.case.id, 2)])
+
+        item.product = self.charger
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertEqual(self.neighbours(self.phone), [(self.case.id, 1), (self.charger.id, 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.neighbours(self.phone), [(self.case.id, 1)])
+
+        incremental = self.snapshot()
+        rebuild_recommendations()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_checkout_refreshes_top_k_after_commit(self):
+        cart = Cart.objects.create(user=self.buyer)
+        ids = [CartItem.objects.create(cart=cart, product=product, quantity=1).id for product in (self.phone, self.case)]
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post('/api/orders/checkout/', {'selected_cart_items': ids}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(ProductRecommendation.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.neighbours(self.phone), [(self.case.id, 1)])
+
+    @override_settings(RECOMMENDATIONS_TOP_K=1)
+    def test_pairs_below_kth_place_skip_refresh(self):
+        self.checkout((self.phone, 1), (self.case, 1))
+        self.checkout((self.phone, 1), (self.case, 1))
+        self.checkout((self.case, 1), (self.charger, 1))
+        with self.assertNumQueries(2):
+            self.assertEqual(affected_products([(self.phone.id, self.charger.id)], top_k=1), set())
+        self.assertEqual(
+            affected_products([(self.phone.id, self.case.id), (self.charger.id, self.case.id)], top_k=1),
+            {self.phone.id, self.charger.id},
+        )
+
+        self.checkout((self.phone, 1), (self.charger, 1))
+        self.assertEqual(self.neighbours(self.phone), [(self.case.id, 2)])
+        self.assertEqual(self.neighbours(self.charger), [(self.phone.id, 1)])
+        incremental = self.snapshot()
+        rebuild_recommendations()
+        self.assertEqual(self.snapshot(), incremental)
@@ -0,0 +1,12 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import SalesAnalyticsViewSet
+
+app_name = 'analytics'
+
+router = DefaultRouter()
+router.register(r'sales', SalesAnalyticsViewSet, basename='sales')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,70 @@
+from django.db.models import F, Sum
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import DailyCategorySales, DailyProductSales
+from .serializers import (
+    CategorySalesSerializer,
+    DailySalesSerializer,
+    ProductSalesSerializer,
+    SalesRangeSerializer,
+)
+
+
+class SalesAnalyticsViewSet(viewsets.ViewSet):
+    """Отчёты по продажам из дневных сводок — только для staff"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_params(self, request):
+        serializer = SalesRangeSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    @staticmethod
+    def in_range(queryset, params):
+        if params.get('date_from'):
+            queryset = queryset.filter(date__gte=params['date_from'])
+        if params.get('date_to'):
+            queryset = queryset.filter(date__lte=params['date_to'])
+        return queryset
+
+    @extend_schema(parameters=[SalesRangeSerializer], responses=DailySalesSerializer(many=True), summary='Выручка по дням')
+    @action(detail=False, methods=['get'])
+    def daily(self, request):
+        params = self.get_params(request)
+        # Итоги дня одинаковы в обеих сводках, а строк по категориям меньше
+        rows = (
+            self.in_range(DailyCategorySales.objects.all(), params)
+            .values('date').annotate(units=Sum('units'), revenue=Sum('revenue')).order_by('date')
+        )
+        return Response(DailySalesSerializer(rows, many=True).data)
+
+    @extend_schema(parameters=[SalesRangeSerializer], responses=ProductSalesSerializer(many=True), summary='Топ товаров')
+    @action(detail=False, methods=['get'])
+    def products(self, request):
+        params = self.get_params(request)
+        rows = (
+            self.in_range(DailyProductSales.objects.all(), params)
+            .values('product_id').annotate(
+                product_name=F('product__name'), units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders')
+            )
+            .filter(units__gt=0)
+            .order_by(f"-{params['sort']}", 'product_id')[:params['limit']]
+        )
+        return Response(ProductSalesSerializer(rows, many=True).data)
+
+    @extend_schema(parameters=[SalesRangeSerializer], responses=CategorySalesSerializer(many=True), summary='Топ категорий')
+    @action(detail=False, methods=['get'])
+    def categories(self, request):
+        params = self.get_params(request)
+        rows = (
+            self.in_range(DailyCategorySales.objects.all(), params)
+            .values('category_id').annotate(
+                category_name=F('category__name'), units=Sum('units'), revenue=Sum('revenue')
+            )
+            .filter(units__gt=0)
+            .order_by(f"-{params['sort']}", 'category_id')[:params['limit']]
+        )
+        return Response(CategorySalesSerializer(rows, many=True).data)
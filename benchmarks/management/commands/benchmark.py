@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from benchmarks.runner import (
+    check_budgets, load_budgets, run_scenarios, save_baseline, save_budgets, uncovered_routes,
+)
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все маршруты config/urls.py на синтетических данных в отдельной тестовой БД '
+        'и сверяет число запросов с benchmarks/budgets.json; p95 — только с базой этой же машины (--baseline)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Множитель размера набора данных')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--baseline', help='JSON с p95 прежнего прогона на этой машине (без него p95 не проверяется)')
+        parser.add_argument('--save-baseline', help='Записать p95 этого прогона в JSON для --baseline')
+        parser.add_argument('--latency-factor', type=float, default=2.0,
+                            help='Во сколько раз p95 может превышать базовое значение из --baseline')
+        parser.add_argument('--only', help='Только сценарии, содержащие подстроку')
+        parser.add_argument('--update-budgets', action='store_true', help='Записать замеры как новые бюджеты')
+
+    def handle(self, *args, **options):
+        missing = uncovered_routes(SCENARIOS)
+        if missing:
+            raise CommandError('Маршруты без сценария: ' + ', '.join(f'{r} {m}' for r, m in sorted(missing)))
+        scenarios = [s for s in SCENARIOS if not options['only'] or options['only'] in s.key]
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write(f"Заполнение данных (scale={options['scale']})...")
+            ctx = seed_dataset(options['scale'])
+            results = run_scenarios(scenarios, ctx, options['iterations'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'сценарий':<40} {'p50 мс':>8} {'p95 мс':>8} {'запросы':>8} {'ошибки':>7}")
+        for key, result in results.items():
+            self.stdout.write(
+                f"{key:<40} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['queries']:>8} {result['errors']:>7}"
+            )
+
+        if options['save_baseline']:
+            save_baseline(results, options['save_baseline'])
+            self.stdout.write(self.style.SUCCESS(f"База p95 записана в {options['save_baseline']}"))
+        if options['update_budgets']:
+            save_budgets(results)
+            self.stdout.write(self.style.SUCCESS('Бюджеты обновлены'))
+            return
+
+        baseline = load_budgets(Path(options['baseline'])) if options['baseline'] else None
+        violations = check_budgets(results, load_budgets(), baseline, options['latency_factor'])
+        if violations:
+            raise CommandError('Превышены бюджеты:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS('Все сценарии в пределах бюджетов'))
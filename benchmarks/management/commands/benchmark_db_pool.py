@@ -0,0 +1,117 @@
+import copy
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from benchmarks.runner import percentile
+from products.models import Product
+
+ENGINES = {
+    'без пула': 'django.db.backends.postgresql',
+    'пул': 'config.db.postgresql_pool',
+}
+# Отдельные параметры подключения — отдельный пул, не общий с приложением
+APPLICATION_NAME = 'benchmark_db_pool'
+
+
+def simulate(engine, settings_dict, threads, requests, queries):
+    """
+    threads потоков по requests «запросов»: соединение, queries SELECT-ов, close()
+    (как request_finished в Django). Возвращает req/s, p50/p95 в мс, ошибки и статистику пула.
+    """
+    backend = load_backend(engine)
+    sql = f'SELECT id, name, price FROM {Product._meta.db_table} ORDER BY id DESC LIMIT 20'
+    timings, errors, pools = [], [], set()
+    lock = threading.Lock()
+
+    def worker():
+        # Алиас default: обработчики django.contrib.postgres ищут соединение по алиасу
+        wrapper = backend.DatabaseWrapper(copy.deepcopy(settings_dict), 'default')
+        local_timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            try:
+                with wrapper.cursor() as cursor:
+                    for _ in range(queries):
+                        cursor.execute(sql)
+                        cursor.fetchall()
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                wrapper.close()
+            local_timings.append((time.perf_counter() - started) * 1000)
+        with lock:
+            timings.extend(local_timings)
+            if getattr(wrapper, 'pool', None):
+                pools.add(wrapper.pool)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    pool_stats = [pool.snapshot() for pool in pools]
+    for pool in pools:
+        pool.close()
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(sorted(timings), 50), 2),
+        'p95_ms': round(percentile(sorted(timings), 95), 2),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'pools': pool_stats,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает открытие соединения на каждый запрос с пулом config.db.postgresql_pool: '
+        'потоки имитируют синхронные view под uvicorn на базе из DATABASES["default"]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на поток')
+        parser.add_argument('--queries', type=int, default=3, help='SQL-запросов на HTTP-запрос')
+        parser.add_argument('--pool-size', type=int, help='MAX_SIZE пула (по умолчанию из настроек)')
+
+    def handle(self, *args, **options):
+        default = connections['default']
+        if default.vendor != 'postgresql':
+            raise CommandError('Нужен PostgreSQL: пул есть только у бэкенда config.db.postgresql_pool')
+        settings_dict = {**default.settings_dict, 'CONN_MAX_AGE': 0}
+        settings_dict['OPTIONS'] = {**settings_dict['OPTIONS'], 'application_name': APPLICATION_NAME}
+        settings_dict['POOL'] = dict(settings_dict.get('POOL') or {})
+        if options['pool_size']:
+            settings_dict['POOL']['MAX_SIZE'] = options['pool_size']
+
+        self.stdout.write(
+            f"{options['threads']} потоков x {options['requests']} запросов, "
+            f"{options['queries']} SQL на запрос, пул MAX_SIZE={settings_dict['POOL'].get('MAX_SIZE', 10)}"
+        )
+        self.stdout.write(f"{'режим':<10} {'req/s':>9} {'p50 мс':>8} {'p95 мс':>8} {'ошибки':>7}")
+        results = {}
+        for label, engine in ENGINES.items():
+            results[label] = result = simulate(
+                engine, settings_dict, options['threads'], options['requests'], options['queries'],
+            )
+            self.stdout.write(
+                f"{label:<10} {result['rps']:>9} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['errors']:>7}"
+            )
+            if result['first_error']:
+                self.stderr.write(f"  первая ошибка: {result['first_error']}")
+            for stats in result['pools']:
+                self.stdout.write(
+                    f"  пул: открыто {stats['opened']}, выдано {stats['checkouts']}, ожиданий {stats['waits']} "
+                    f"({stats['wait_seconds']:.3f} с), таймаутов {stats['timeouts']}"
+                )
+
+        before, after = results['без пула'], results['пул']
+        if before['rps']:
+            self.stdout.write(self.style.SUCCESS(f"Пропускная способность с пулом: x{after['rps'] / before['rps']:.1f}"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from benchmarks.plans import PLAN_QUERIES, check_plans
+from benchmarks.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN канонических запросов эндпоинтов на синтетических данных в отдельной тестовой БД; '
+        'ошибка, если план читает целиком таблицу больше --min-rows строк'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Множитель размера набора данных')
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Полный проход по таблице меньшего размера допустим')
+        parser.add_argument('--show-plans', action='store_true', help='Печатать планы всех запросов')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write(f"Заполнение данных (scale={options['scale']})...")
+            ctx = seed_dataset(options['scale'])
+            plans, violations = check_plans(ctx, options['min_rows'], PLAN_QUERIES)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        for name, plan in plans.items():
+            failed = any(violation.startswith(f'{name}:') for violation in violations)
+            self.stdout.write(f"{'SEQ SCAN' if failed else 'ok':<9} {name}")
+            if options['show_plans'] or failed:
+                self.stdout.write('\n'.join(f'          {line}' for line in plan.splitlines()))
+
+        if violations:
+            raise CommandError('Полный проход по большим таблицам:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS(f'Все планы используют индексы (порог {options["min_rows"]} строк)'))
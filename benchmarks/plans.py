@@ -0,0 +1,119 @@
+import json
+import re
+
+from django.db import connection
+
+from analytics.models import ProductRecommendation
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products.models import Product, Review
+
+PAGE = 10
+# SQLite: «SCAN таблица» без индекса — полный проход; «SCAN ... USING INDEX» и «SEARCH» — по индексу
+SQLITE_SCAN = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)')
+
+
+class PlanQuery:
+    """Канонический запрос эндпоинта: build(ctx) возвращает QuerySet"""
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+
+
+def client_cart_id(ctx):
+    # Вьюхи корзины сначала получают корзину (get_or_create по user), затем фильтруют по cart_id
+    return Cart.objects.values_list('id', flat=True).get(user_id=ctx['client'].pk)
+
+
+def category_price(ctx):
+    return (Product.objects.filter(is_active=True, category_id=ctx['category_ids'][-1],
+                                   effective_price__gte=10, effective_price__lte=500)
+            .order_by('-id')[:PAGE])
+
+
+PLAN_QUERIES = [
+    PlanQuery('products:product-list', lambda ctx: Product.objects.filter(is_active=True).order_by('-id')[:PAGE]),
+    PlanQuery('products:product-list ?category&min_price&max_price', category_price),
+    PlanQuery('products:product-list ?ordering=price', lambda ctx: (
+        Product.objects.filter(is_active=True).order_by('effective_price', 'id')[:PAGE]
+    )),
+    PlanQuery('products:product-reviews', lambda ctx: (
+        Review.objects.filter(product_id=ctx['reviewed_product_id']).order_by('-created_at')[:PAGE]
+    )),
+    PlanQuery('products:product-recommendations', lambda ctx: (
+        ProductRecommendation.objects.filter(product_id=ctx['purchased_product_id'], related__is_active=True)
+        .select_related('related').order_by('rank')
+    )),
+    PlanQuery('products:product-add-review (проверка покупки)', lambda ctx: (
+        OrderItem.objects.filter(order__user_id=ctx['client'].pk, product_id=ctx['purchased_product_id'])[:1]
+    )),
+    PlanQuery('cart:cart-add', lambda ctx: (
+        CartItem.objects.filter(cart_id=client_cart_id(ctx), product_id=ctx['product_ids'][0])
+    )),
+    PlanQuery('cart:cart-list', lambda ctx: (
+        CartItem.objects.filter(cart_id=client_cart_id(ctx)).select_related('product').with_line_total().order_by('id')
+    )),
+    PlanQuery('orders:order-list', lambda ctx: (
+        Order.objects.filter(user_id=ctx['client'].pk).order_by('-created_at', '-id')[:PAGE]
+    )),
+    PlanQuery('orders:order-detail (строки заказа)', lambda ctx: (
+        OrderItem.objects.filter(order_id=ctx['order_id']).select_related('product')
+    )),
+]
+
+
+def analyze():
+    # Свежая статистика после заполнения, иначе планировщик оценивает таблицы как пустые
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def table_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def postgres_seq_scans(plan):
+    node = plan.get('Plan', plan)
+    if node['Node Type'] == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from postgres_seq_scans(child)
+
+
+def seq_scans(queryset):
+    """Таблицы, которые план запроса читает целиком"""
+    if connection.vendor == 'postgresql':
+        plan = queryset.explain(format='json')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return sorted(set(postgres_seq_scans(plan[0])))
+    if connection.vendor == 'sqlite':
+        plan = queryset.explain()
+        tables = SQLITE_SCAN.findall(plan)
+        if tables and queryset.query.high_mark is not None and 'TEMP B-TREE FOR ORDER BY' not in plan:
+            # Проход в порядке ORDER BY с LIMIT останавливается на первой странице (как Index Scan в PostgreSQL)
+            tables = tables[1:]
+        return sorted(set(tables))
+    return []
+
+
+def check_plans(ctx, min_rows=1000, queries=PLAN_QUERIES):
+    """
+    Прогоняет EXPLAIN каждого запроса. Возвращает (планы, нарушения):
+    нарушение — полный проход по таблице, в которой больше min_rows строк.
+    """
+    analyze()
+    rows = {}
+    plans, violations = {}, []
+    for query in queries:
+        queryset = query.build(ctx)
+        plans[query.name] = queryset.explain()
+        for table in seq_scans(queryset):
+            if table not in rows:
+                rows[table] = table_rows(table)
+            if rows[table] > min_rows:
+                violations.append(f'{query.name}: Seq Scan по {table} ({rows[table]} строк)')
+    return plans, violations
@@ -0,0 +1,146 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.authentication import user_token_claims
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'budgets.json'
+SKIPPED_METHODS = {'head', 'options'}
+
+
+def route_methods(patterns=None, namespace=''):
+    """Все пары (имя маршрута, HTTP-метод) из config/urls.py; админка — одной точкой admin:index"""
+    routes = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.app_name == 'admin':
+                routes.add(('admin:index', 'GET'))
+                continue
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            routes |= route_methods(pattern.url_patterns, prefix)
+            continue
+        if not pattern.name:
+            continue  # static/media в DEBUG
+        callback = pattern.callback
+        actions = getattr(callback, 'actions', None)
+        if actions:
+            methods = actions.keys()
+        else:
+            view_class = getattr(callback, 'view_class', None) or getattr(callback, 'cls')
+            methods = [method for method in view_class.http_method_names if hasattr(view_class, method)]
+        routes |= {(f'{namespace}{pattern.name}', method.upper()) for method in methods if method not in SKIPPED_METHODS}
+    return routes
+
+
+def uncovered_routes(scenarios):
+    return route_methods() - {(scenario.route, scenario.method) for scenario in scenarios}
+
+
+def build_clients(ctx):
+    """Клиенты с настоящими JWT (как после TelegramAuthView) и сессией для админки"""
+    clients = {None: APIClient()}
+    for role in ('client', 'staff'):
+        refresh = RefreshToken.for_user(ctx[role])
+        for claim, value in user_token_claims(ctx[role]).items():
+            refresh[claim] = value
+        clients[role] = APIClient()
+        clients[role].credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    clients['admin'] = Client()
+    clients['admin'].force_login(ctx['staff'])
+    return clients
+
+
+def percentile(values, percent):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def run_scenario(scenario, ctx, clients, iterations):
+    """
+    Выполняет сценарий iterations раз с пустым кэшем (худший случай).
+    Возвращает p50/p95 в мс, максимум запросов к БД и число ответов с ошибкой.
+    """
+    client = clients[scenario.user]
+    timings, queries, errors = [], [], 0
+    for _ in range(iterations):
+        state = scenario.setup(ctx)
+        url = reverse(scenario.route, kwargs=scenario.kwargs(ctx, state))
+        data = scenario.data(ctx, state)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if scenario.method == 'GET':
+                response = client.get(url, scenario.query)
+            else:
+                response = client.generic(scenario.method, url, json.dumps(data) if data is not None else '',
+                                          content_type='application/json')
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        errors += response.status_code >= 400
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': max(queries),
+        'errors': errors,
+    }
+
+
+def run_scenarios(scenarios, ctx, iterations=20):
+    clients = build_clients(ctx)
+    return {scenario.key: run_scenario(scenario, ctx, clients, iterations) for scenario in scenarios}
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(results, fields, path):
+    # Сценарии, которые не запускались (--only), сохраняют прежние значения
+    path = Path(path)
+    saved = load_budgets(path) if path.exists() else {}
+    saved.update({key: {field: result[field] for field in fields} for key, result in results.items()})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(saved.items())), f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def save_budgets(results, path=BUDGETS_PATH):
+    """В репозитории — только число запросов: оно не зависит от машины"""
+    save_results(results, ('queries',), path)
+
+
+def save_baseline(results, path):
+    """p95 прогона на этой машине — база для --latency-factor следующих прогонов"""
+    save_results(results, ('p95_ms',), path)
+
+
+def check_budgets(results, budgets, baseline=None, latency_factor=2.0):
+    """
+    Список нарушений: ответы с ошибкой, превышение бюджета запросов и,
+    если передан baseline (замер на этой же машине), p95 выше базового в latency_factor раз.
+    """
+    violations = []
+    for key, result in sorted(results.items()):
+        budget = budgets.get(key)
+        if budget is None:
+            violations.append(f'{key}: нет бюджета в budgets.json')
+            continue
+        if result['errors']:
+            violations.append(f"{key}: {result['errors']} ответ(ов) с ошибкой")
+        if result['queries'] > budget['queries']:
+            violations.append(f"{key}: {result['queries']} запросов к БД, бюджет {budget['queries']}")
+        base = (baseline or {}).get(key)
+        if base is not None and latency_factor and result['p95_ms'] > base['p95_ms'] * latency_factor:
+            violations.append(f"{key}: p95 {result['p95_ms']} мс, база {base['p95_ms']} мс x{latency_factor}")
+    return violations
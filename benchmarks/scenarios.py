@@ -0,0 +1,111 @@
+import itertools
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cart.models import Cart, CartItem
+from products.models import Product
+from telegram_auth.otp import issue_code
+
+
+class Scenario:
+    """
+    Один запрос к маршруту config/urls.py.
+    route — имя для reverse(), user — 'client', 'staff', 'admin' (сессия) или None,
+    setup(ctx) готовит данные вне замера и возвращает state для kwargs/data.
+    """
+
+    def __init__(self, route, method='GET', kwargs=None, query=None, data=None, user=None, setup=None):
+        self.route = route
+        self.method = method
+        self.kwargs = kwargs or (lambda ctx, state: {})
+        self.query = query or {}
+        self.data = data or (lambda ctx, state: None)
+        self.user = user
+        self.setup = setup or (lambda ctx: {})
+
+    @property
+    def key(self):
+        return f'{self.route} {self.method}'
+
+
+def product_pk(ctx, state):
+    return {'pk': ctx['product_id']}
+
+
+def product_payload(ctx, state):
+    return {'category': ctx['category_ids'][-1], 'name': 'Bench tovar', 'description': 'Test', 'price': '9.90', 'stock': 5}
+
+
+def create_product(ctx):
+    product = Product.objects.create(category_id=ctx['category_ids'][0], name='Óshiriletuǵın', description='', price=1)
+    return {'pk': product.pk}
+
+
+def create_cart_item(ctx):
+    cart, _ = Cart.objects.get_or_create(user=ctx['client'])
+    item = CartItem.objects.create(cart=cart, product_id=ctx['product_ids'][-1], quantity=1)
+    return {'cart_item_id': item.id}
+
+
+webhook_updates = itertools.count(1)
+
+SCENARIOS = [
+    Scenario('users:profile', user='client'),
+    Scenario('users:profile', 'PATCH', data=lambda ctx, state: {'address': 'Nukus'}, user='client'),
+
+    Scenario('products:api-root'),
+    Scenario('products:category-list'),
+    Scenario('products:category-tree'),
+    Scenario('products:product-list'),
+    Scenario('products:product-list', 'POST', data=product_payload, user='staff'),
+    Scenario('products:product-cache-stats', user='staff'),
+    Scenario('products:product-facets', query={'min_price': 10, 'max_price': 500}),
+    Scenario('products:product-detail', kwargs=product_pk),
+    Scenario('products:product-detail', 'PUT', kwargs=product_pk, data=product_payload, user='staff'),
+    Scenario('products:product-detail', 'PATCH', kwargs=product_pk, data=lambda ctx, state: {'stock': 1000}, user='staff'),
+    Scenario('products:product-detail', 'DELETE', kwargs=lambda ctx, state: state, setup=create_product, user='staff'),
+    Scenario('products:product-add-review', 'POST', user='client',
+             kwargs=lambda ctx, state: {'pk': ctx['purchased_product_id']},
+             data=lambda ctx, state: {'rating': 5, 'comment': 'Jaqsı'}),
+    Scenario('products:product-availability', kwargs=product_pk),
+    Scenario('products:product-reviews', kwargs=lambda ctx, state: {'pk': ctx['reviewed_product_id']}),
+    Scenario('products:product-recommendations', kwargs=lambda ctx, state: {'pk': ctx['purchased_product_id']}),
+    Scenario('products:product-toggle-active', 'POST', kwargs=lambda ctx, state: {'pk': ctx['product_ids'][-2]}, user='staff'),
+
+    Scenario('cart:api-root', user='client'),
+    Scenario('cart:cart-list', user='client'),
+    Scenario('cart:cart-add', 'POST', user='client',
+             data=lambda ctx, state: {'product_id': ctx['product_ids'][1], 'quantity': 1}),
+    Scenario('cart:cart-batch', 'POST', user='client', data=lambda ctx, state: {'items': [
+        {'product_id': product_id, 'quantity': 1, 'mode': 'set'} for product_id in ctx['product_ids'][:10]
+    ]}),
+    Scenario('cart:cart-remove', 'DELETE', kwargs=lambda ctx, state: state, setup=create_cart_item, user='client'),
+
+    Scenario('orders:api-root', user='client'),
+    Scenario('orders:order-list', user='client'),
+    Scenario('orders:order-detail', kwargs=lambda ctx, state: {'pk': ctx['order_id']}, user='client'),
+    Scenario('orders:checkout', 'POST', user='client', setup=create_cart_item,
+             data=lambda ctx, state: {'selected_cart_items': [state['cart_item_id']], 'address': 'Nukus'}),
+
+    Scenario('telegram_auth:login', 'POST',
+             setup=lambda ctx: {'code': issue_code(ctx['client'], ctx['client'].telegram_chat_id)},
+             data=lambda ctx, state: state),
+    Scenario('telegram_auth:webhook', 'POST', data=lambda ctx, state: {
+        'update_id': next(webhook_updates),
+        'message': {'chat': {'id': int(ctx['client'].telegram_chat_id)}, 'text': '/login'},
+    }),
+    Scenario('token_refresh', 'POST',
+             setup=lambda ctx: {'refresh': str(RefreshToken.for_user(ctx['client']))},
+             data=lambda ctx, state: state),
+
+    Scenario('analytics:api-root', user='staff'),
+    Scenario('analytics:sales-daily', user='staff'),
+    Scenario('analytics:sales-products', user='staff', query={'sort': 'units'}),
+    Scenario('analytics:sales-categories', user='staff'),
+
+    Scenario('metrics', user='staff'),
+    Scenario('schema'),
+    Scenario('swagger-ui'),
+    Scenario('redoc'),
+    Scenario('admin:index', user='admin'),
+]
@@ -0,0 +1,99 @@
+import random
+from io import StringIO
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import transaction
+
+from cart.models import Cart, CartItem
+from orders.models import Order, OrderItem
+from products.models import Category, Product, Review
+from users.models import User
+
+# Размер набора при scale=1; всё умножается на scale
+BASE_SIZES = {'root_categories': 5, 'subcategories': 4, 'products': 2000, 'users': 200, 'orders': 500, 'reviews': 1000}
+BATCH_SIZE = 1000
+
+
+def seed_dataset(scale=1, seed=42):
+    """
+    Синтетический каталог с заказами и отзывами. Возвращает контекст для сценариев:
+    id товаров, категорий и заказа, пользователей client/staff.
+    """
+    rng = random.Random(seed)
+    sizes = {name: max(int(size * scale), 1) for name, size in BASE_SIZES.items()}
+
+    with transaction.atomic():
+        categories = []
+        for i in range(sizes['root_categories']):
+            root = Category.objects.create(name=f'Kategoriya {i}', slug=f'bench-{i}')
+            categories.append(root)
+            for j in range(sizes['subcategories']):
+                categories.append(Category.objects.create(name=f'Kategoriya {i}.{j}', slug=f'bench-{i}-{j}', parent=root))
+
+        products = []
+        for i in range(sizes['products']):
+            price = Decimal(rng.randint(100, 100000)) / 100
+            discount_price = None if i % 3 else Decimal(rng.randint(50, 90))
+            products.append(Product(
+                category=rng.choice(categories), name=f'Tovar {i}', slug=f'tovar-{i}',
+                description=f'Sintetikalıq tovar {i}', price=price, discount_price=discount_price,
+                effective_price=Product.effective_price_of(price, discount_price),
+                stock=1_000_000, is_active=i % 20 != 0,
+            ))
+        Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+
+        User.objects.bulk_create([
+            User(username=f'user{i}', phone=f'+99891{i:07d}', address='Nukus')
+            for i in range(sizes['users'])
+        ], batch_size=BATCH_SIZE)
+        users = list(User.objects.order_by('id'))
+        client = User.objects.create(username='bench-client', phone='+998990000001', address='Nukus',
+                                     telegram_chat_id='990000001')
+        staff = User.objects.create(username='bench-staff', phone='+998990000002', role='admin',
+                                    is_staff=True, is_superuser=True)
+
+        orders = Order.objects.bulk_create([
+            Order(user=client if i % 10 == 0 else rng.choice(users), total_price=0, address='Nukus',
+                  status=rng.choice(['pending', 'paid', 'shipped', 'canceled']))
+            for i in range(sizes['orders'])
+        ], batch_size=BATCH_SIZE)
+        order_items = []
+        for order in orders:
+            for product_id in rng.sample(product_ids, 3):
+                order_items.append(OrderItem(order=order, product_id=product_id, price=Decimal('10.00'), quantity=rng.randint(1, 3)))
+        OrderItem.objects.bulk_create(order_items, batch_size=BATCH_SIZE)
+
+        pairs = {(rng.choice(users).id, rng.choice(product_ids)) for _ in range(sizes['reviews'])}
+        Review.objects.bulk_create([
+            Review(user_id=user_id, product_id=product_id, rating=rng.randint(1, 5), comment='Jaqsı')
+            for user_id, product_id in pairs
+        ], batch_size=BATCH_SIZE)
+
+        cart = Cart.objects.create(user=client)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product_id=product_id, quantity=1) for product_id in product_ids[:5]])
+
+    # Агрегаты, которые bulk_create обошёл
+    call_command('rebuild_product_ratings', stdout=StringIO())
+    call_command('rebuild_sales_rollups', stdout=StringIO())
+    call_command('rebuild_recommendations', stdout=StringIO())
+
+    client_order = Order.objects.filter(user=client).order_by('id').first()
+    # Отзывы видны только у активных товаров; product_ids[-2] переключает сценарий toggle-active
+    reviewed = (
+        Review.objects.filter(product__is_active=True).exclude(product_id=product_ids[-2])
+        .order_by('id').values_list('product_id', flat=True).first()
+    )
+    middle = Product.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+    return {
+        'client': client,
+        'product_id': middle[middle.count() // 2],
+        'staff': staff,
+        'product_ids': product_ids,
+        'category_ids': [category.id for category in categories],
+        'order_id': client_order.id,
+        'purchased_product_id': client_order.items.values_list('product_id', flat=True).first(),
+        'reviewed_product_id': reviewed,
+    }
+
@@ -0,0 +1,52 @@
+from django.test import TestCase, TransactionTestCase
+
+from products.models import Product
+from .plans import PLAN_QUERIES, PlanQuery, check_plans
+from .runner import check_budgets, load_budgets, run_scenarios, uncovered_routes
+from .scenarios import SCENARIOS
+from .seed import seed_dataset
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """
+    Число запросов не зависит от объёма данных — малого набора достаточно, чтобы поймать N+1.
+    Без обёртки TestCase в транзакцию: как в команде benchmark, записи идут в autocommit
+    (BEGIN/COMMIT считаются) и on_commit-колбэки выполняются.
+    """
+
+    def test_every_route_has_scenario(self):
+        self.assertEqual(uncovered_routes(SCENARIOS), set())
+
+    def test_scenarios_fit_query_budgets(self):
+        ctx = seed_dataset(scale=0.05)
+        results = run_scenarios(SCENARIOS, ctx, iterations=1)
+        self.assertEqual(check_budgets(results, load_budgets()), [])
+
+    def test_latency_is_checked_only_against_baseline(self):
+        results = {'x GET': {'queries': 2, 'p95_ms': 30.0, 'errors': 0}}
+        budgets = {'x GET': {'queries': 2}}
+        self.assertEqual(check_budgets(results, budgets), [])
+        self.assertEqual(check_budgets(results, budgets, baseline={'x GET': {'p95_ms': 20.0}}), [])
+        self.assertEqual(
+            check_budgets(results, budgets, baseline={'x GET': {'p95_ms': 10.0}}),
+            ['x GET: p95 30.0 мс, база 10.0 мс x2.0'],
+        )
+
+
+class QueryPlanTests(TestCase):
+    """На крошечных таблицах PostgreSQL законно выбирает Seq Scan — набор побольше, чем для бюджетов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed_dataset(scale=0.25)
+
+    def test_hot_queries_avoid_full_scans(self):
+        plans, violations = check_plans(self.ctx, min_rows=300, queries=PLAN_QUERIES)
+        self.assertEqual(violations, [])
+        self.assertEqual(set(plans), {query.name for query in PLAN_QUERIES})
+
+    def test_unindexed_filter_is_reported(self):
+        query = PlanQuery('by-description', lambda ctx: Product.objects.filter(description='Test'))
+        _, violations = check_plans(self.ctx, min_rows=10, queries=[query])
+        self.assertEqual(len(violations), 1)
+        self.assertIn('products_product', violations[0])
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem
+from .models import Cart, CartItem, StockReservation
 
 
 class CartItemInline(admin.TabularInline):
@@ -10,4 +10,11 @@ class CartItemInline(admin.TabularInline):
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ('user',)
-    inlines = [CartItemInline]
\ No newline at end of file
+    inlines = [CartItemInline]
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('cart', 'product', 'quantity', 'expires_at')
+    list_filter = ('expires_at',)
+    readonly_fields = ('cart', 'product', 'quantity', 'expires_at')
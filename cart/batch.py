@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from products.models import Product
+from .models import CartItem, StockReservation
+from .reservations import reservation_expiry, shift_reserved_stock
+
+ADD, SET, REMOVE = 'add', 'set', 'remove'
+# Коды ошибок пакета: по ним ветвится код, текст error — только для людей
+NOT_FOUND, INSUFFICIENT = 'not_found', 'insufficient'
+
+
+class CartBatchError(Exception):
+    """Пакет не применён: errors — [{'product_id', 'code', 'error', 'available'}]"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(errors)
+
+
+def merge_entries(entries):
+    """
+    Сводит операции пакета к одной на товар, в порядке следования:
+    {product_id: (mode, quantity)}; add после set/remove превращается в set.
+    """
+    merged = {}
+    for entry in entries:
+        product_id, mode, quantity = entry['product_id'], entry['mode'], entry.get('quantity', 0)
+        previous = merged.get(product_id)
+        if mode == ADD and previous is not None:
+            previous_mode, previous_quantity = previous
+            merged[product_id] = (
+                (previous_mode, previous_quantity + quantity) if previous_mode != REMOVE else (SET, quantity)
+            )
+        elif mode == SET and quantity == 0:
+            merged[product_id] = (REMOVE, 0)
+        else:
+            merged[product_id] = (mode, quantity)
+    return merged
+
+
+def locked_products(cart, product_ids):
+    """
+    Товары пакета под блокировкой (в порядке id — как в checkout и release)
+    вместе с текущим количеством в корзине и своим резервом — одним запросом.
+    """
+    in_cart = CartItem.objects.filter(cart=cart, product=OuterRef('pk')).values('quantity')
+    held = StockReservation.objects.filter(cart=cart, product=OuterRef('pk')).values('quantity')
+    return {
+        product.id: product
+        for product in Product.objects.select_for_update(of=('self',))
+        .filter(id__in=product_ids).order_by('id')
+        .only('id', 'name', 'stock', 'reserved_stock')
+        .annotate(
+            in_cart=Coalesce(Subquery(in_cart, output_field=IntegerField()), Value(0)),
+            held=Coalesce(Subquery(held, output_field=IntegerField()), Value(0)),
+        )
+    }
+
+
+def apply_cart_batch(cart, entries):
+    """
+    Применяет пакет {product_id, quantity, mode} к корзине целиком или не применяет вовсе.
+    Итоговые количества считаются под блокировкой товаров, поэтому запись — один
+    INSERT ... ON CONFLICT (cart, product) DO UPDATE SET quantity = EXCLUDED.quantity
+    для add и set и один DELETE для remove; резервы — так же, плюс один UPDATE reserved_stock.
+    Возвращает {product_id: итоговое количество}; при ошибках — CartBatchError.
+    """
+    operations = merge_entries(entries)
+    with transaction.atomic():
+        products = locked_products(cart, operations)
+        errors = []
+        final = {}
+        for product_id, (mode, quantity) in operations.items():
+            product = products.get(product_id)
+            if product is None:
+                errors.append({'product_id': product_id, 'code': NOT_FOUND, 'error': 'Tovar tabılmadı', 'available': 0})
+                continue
+            final[product_id] = {ADD: product.in_cart + quantity, SET: quantity, REMOVE: 0}[mode]
+            # Свой резерв уже учтён в reserved_stock
+            available = max(product.stock - product.reserved_stock + product.held, 0)
+            if final[product_id] > available:
+                errors.append({
+                    'product_id': product_id,
+                    'code': INSUFFICIENT,
+                    'error': 'Qoymada joq' if available == 0 else f'Jetkiliksiz. Qalǵanı: {available}',
+                    'available': available,
+                })
+        if errors:
+            raise CartBatchError(errors)
+
+        kept = {product_id: quantity for product_id, quantity in final.items() if quantity}
+        removed = [product_id for product_id, quantity in final.items() if not quantity]
+        if kept:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in kept.items()],
+                update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+            )
+            expires_at = reservation_expiry()
+            StockReservation.objects.bulk_create(
+                [StockReservation(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                 for product_id, quantity in kept.items()],
+                update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity', 'expires_at'],
+            )
+        if removed:
+            CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+            StockReservation.objects.filter(cart=cart, product_id__in=removed).delete()
+        shift_reserved_stock({product_id: quantity - products[product_id].held for product_id, quantity in final.items()})
+    return final
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from cart.reservations import expire_reservations, reconcile_reserved_stock, release_orphaned_holds
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимает истёкшие резервы корзин и возвращает остаток удалённых в обход release() '
+        '(запускать периодически или с --interval)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Товаров за одну транзакцию')
+        parser.add_argument('--interval', type=int, default=0, help='Повторять каждые N секунд (0 — один проход)')
+        parser.add_argument('--reconcile', action='store_true', help='Пересчитать Product.reserved_stock по резервам')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            updated = reconcile_reserved_stock()
+            self.stdout.write(self.style.SUCCESS(f'reserved_stock пересчитан для {updated} товаров'))
+
+        while True:
+            expired = expire_reservations(batch_size=options['batch_size'])
+            if expired:
+                self.stdout.write(f'Снято резервов: {expired}')
+            orphaned = release_orphaned_holds()
+            if orphaned:
+                self.stdout.write(f'Возвращён остаток удалённых резервов: {orphaned} товаров')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
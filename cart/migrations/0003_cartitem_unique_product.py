@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:11
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    # Повторные строки одного товара в корзине сливаются в самую раннюю с суммой количеств
+    CartItem = apps.get_model('cart', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(rows=Count('id'), first_id=Min('id'), quantity=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        CartItem.objects.filter(pk=group['first_id']).update(quantity=group['quantity'])
+        CartItem.objects.filter(cart_id=group['cart_id'], product_id=group['product_id']).exclude(
+            pk=group['first_id'],
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='cartitem_cart_product_uniq'),
+        ),
+    ]
@@ -1,23 +1,79 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from products.models import Product
 
 User = get_user_model()
 
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def line_total_expression(prefix=''):
+    # Цена к оплате × количество — считается в БД; prefix — путь к строке корзины ('items__')
+    return ExpressionWrapper(
+        F(f'{prefix}product__effective_price') * F(f'{prefix}quantity'),
+        output_field=MONEY_FIELD,
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_total(self):
+        return self.annotate(
+            items_total=Coalesce(Sum(line_total_expression('items__')), Value(Decimal('0')), output_field=MONEY_FIELD),
+        )
+
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+
+    objects = CartQuerySet.as_manager()
     
     def __str__(self):
         return f"Cart of {self.user.username}"
 
 
+class CartItemQuerySet(models.QuerySet):
+    def with_line_total(self):
+        return self.annotate(line_total=line_total_expression())
+
+    def totals(self):
+        return self.aggregate(
+            items_count=Count('id'),
+            total_quantity=Coalesce(Sum('quantity'), 0),
+            total_price=Coalesce(Sum(line_total_expression()), Value(Decimal('0')), output_field=MONEY_FIELD),
+        )
+
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     added_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CartItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Один товар — одна строка корзины; индекс заодно обслуживает поиск (cart, product)
+            models.UniqueConstraint(fields=['cart', 'product'], name='cartitem_cart_product_uniq'),
+        ]
     
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
\ No newline at end of file
+        return f"{self.product.name} x {self.quantity}"
+
+
+class StockReservation(models.Model):
+    """Удержание остатка товара за корзиной до expires_at"""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('cart', 'product')
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} до {self.expires_at:%H:%M}"
@@ -0,0 +1,93 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockReservation
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(minutes=settings.CART_RESERVATION_TTL_MINUTES)
+
+
+def shift_reserved_stock(deltas):
+    """Сдвигает Product.reserved_stock одним UPDATE: {product_id: delta}"""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Product.objects.filter(id__in=deltas).update(
+        reserved_stock=Case(
+            *[When(id=product_id, then=F('reserved_stock') + delta) for product_id, delta in deltas.items()],
+            output_field=IntegerField(),
+        )
+    )
+
+
+def release(cart, product_ids):
+    """Снимает резервы корзины по указанным товарам"""
+    with transaction.atomic():
+        # Сначала товары (в порядке id), затем резервы — тот же порядок блокировок, что и в apply_cart_batch()
+        list(Product.objects.select_for_update().filter(id__in=product_ids).order_by('id').values_list('id'))
+        reservations = StockReservation.objects.filter(cart=cart, product_id__in=product_ids)
+        deltas = defaultdict(int)
+        for product_id, quantity in reservations.values_list('product_id', 'quantity'):
+            deltas[product_id] -= quantity
+        reservations.delete()
+        shift_reserved_stock(deltas)
+
+
+def expire_reservations(batch_size=1000):
+    """Снимает истёкшие резервы пачками. Возвращает количество снятых."""
+    expired = 0
+    while True:
+        now = timezone.now()
+        product_ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .order_by('product_id').values_list('product_id', flat=True).distinct()[:batch_size]
+        )
+        if not product_ids:
+            return expired
+        with transaction.atomic():
+            list(Product.objects.select_for_update().filter(id__in=product_ids).order_by('id').values_list('id'))
+            reservations = StockReservation.objects.filter(product_id__in=product_ids, expires_at__lte=now)
+            deltas = defaultdict(int)
+            for product_id, quantity in reservations.values_list('product_id', 'quantity'):
+                deltas[product_id] -= quantity
+            expired += reservations.delete()[0]
+            shift_reserved_stock(deltas)
+
+
+def reserved_total():
+    """Сумма резервов товара по таблице резервов (для annotate/update по Product)"""
+    reserved = (
+        StockReservation.objects.filter(product=OuterRef('pk'))
+        .order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    return Coalesce(Subquery(reserved, output_field=IntegerField()), Value(0))
+
+
+def reconcile_reserved_stock():
+    """Пересчитывает reserved_stock по таблице резервов (после ручных правок/каскадных удалений)"""
+    return Product.objects.update(reserved_stock=reserved_total())
+
+
+def release_orphaned_holds():
+    """
+    Возвращает в продажу остаток, удержанный резервами, которые удалены в обход release()
+    (ручная правка, массовый DELETE): reserved_stock больше суммы резервов.
+    Пересчёт — под блокировкой товаров, как и любое изменение резервов. Возвращает число товаров.
+    """
+    drifted = list(
+        Product.objects.filter(reserved_stock__gt=0).annotate(held=reserved_total())
+        .filter(reserved_stock__gt=F('held')).values_list('id', flat=True)
+    )
+    if not drifted:
+        return 0
+    with transaction.atomic():
+        list(Product.objects.select_for_update().filter(id__in=drifted).order_by('id').values_list('id'))
+        return Product.objects.filter(id__in=drifted).update(reserved_stock=reserved_total())
@@ -1,20 +1,34 @@
 from rest_framework import serializers
+from drf_spectacular.utils import extend_schema_field
+from .batch import INSUFFICIENT, NOT_FOUND
 from .models import Cart, CartItem
 from products.models import Product
-from products.serializers import ProductSerializer
+
+# Сколько строк принимает один пакет /api/cart/batch/
+CART_BATCH_MAX_ITEMS = 200
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    """Краткая карточка товара для корзины"""
+    available = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'slug', 'price', 'discount_price', 'effective_price', 'stock', 'available', 'image']
 
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = CartProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), 
         source='product', 
         write_only=True
     )
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     
     class Meta: 
         model = CartItem
-        fields = ['id', 'product', 'product_id', 'quantity']
+        fields = ['id', 'product', 'product_id', 'quantity', 'line_total']
 
 
 class CartSerializer(serializers.ModelSerializer):
@@ -25,14 +39,49 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'user', 'cart_items', 'total_price']
 
+    @extend_schema_field(serializers.DecimalField(max_digits=12, decimal_places=2))
     def get_total_price(self, obj):
-        total = 0
-        for item in obj.items.all():
-            price = item.product.discount_price if item.product.discount_price else item.product.price
-            total += price * item.quantity
-        return total
+        # Сумма посчитана в запросе корзины (Cart.objects.with_total()) — без отдельного агрегата
+        total = getattr(obj, 'items_total', None)
+        return total if total is not None else obj.items.totals()['total_price']
+
+
+class CartSummarySerializer(serializers.Serializer):
+    items_count = serializers.IntegerField()
+    total_quantity = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
 
 
 class CartAddSerializer(serializers.Serializer):
     product_id = serializers.IntegerField(required=True)
-    quantity = serializers.IntegerField(required=False, default=1, min_value=1)
\ No newline at end of file
+    quantity = serializers.IntegerField(required=False, default=1, min_value=1)
+
+
+class CartBatchEntrySerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, default=1, min_value=0)
+    mode = serializers.ChoiceField(choices=['add', 'set', 'remove'], default='add')
+
+    def validate(self, attrs):
+        if attrs['mode'] == 'add' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Sanı 1 den kem bolmawı kerek'})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    items = CartBatchEntrySerializer(many=True, allow_empty=False, max_length=CART_BATCH_MAX_ITEMS)
+
+
+class CartBatchErrorSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    code = serializers.ChoiceField(choices=[NOT_FOUND, INSUFFICIENT])
+    error = serializers.CharField()
+    available = serializers.IntegerField()
+
+
+class CartBatchErrorsSerializer(serializers.Serializer):
+    errors = CartBatchErrorSerializer(many=True)
+
+
+class CartBatchResultSerializer(CartSummarySerializer):
+    items = serializers.DictField(child=serializers.IntegerField(), help_text='product_id -> итоговое количество')
@@ -0,0 +1,13 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Cart
+from .reservations import release
+
+
+@receiver(pre_delete, sender=Cart)
+def release_cart_holds(sender, instance, **kwargs):
+    # Каскад (удаление корзины или пользователя) стёр бы резервы, не уменьшив Product.reserved_stock
+    product_ids = list(instance.reservations.values_list('product_id', flat=True))
+    if product_ids:
+        release(instance, product_ids)
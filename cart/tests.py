@@ -1,3 +1,175 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from users.models import User
+from .models import Cart, CartItem, StockReservation
+from .reservations import expire_reservations, release_orphaned_holds
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Kitaplar')
+        self.product = Product.objects.create(category=category, name='Kitap', description='', price=20, stock=3)
+        self.alice = User.objects.create(username='alice', phone='+998900000011')
+        self.bob = User.objects.create(username='bob', phone='+998900000012')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_add_holds_stock_for_other_carts(self):
+        response = self.client_for(self.alice).post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved_stock, self.product.available), (2, 1))
+
+        response = self.client_for(self.bob).post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Jetkiliksiz. Qalǵanı: 1')
+
+        response = self.client_for(self.bob).post('/api/cart/add/', {'product_id': 999999, 'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_checkout_converts_reservation(self):
+        client = self.client_for(self.alice)
+        client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2}, format='json')
+        item = Cart.objects.get(user=self.alice).items.get()
+
+        response = client.post('/api/orders/checkout/', {'selected_cart_items': [item.id], 'address': 'Nukus'}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved_stock), (1, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_releases_expired_holds(self):
+        self.client_for(self.alice).post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 3}, format='json')
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(expire_reservations(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 0)
+
+    def test_deleting_cart_or_user_releases_holds(self):
+        self.client_for(self.alice).post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2}, format='json')
+        self.client_for(self.bob).post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 1}, format='json')
+
+        Cart.objects.get(user=self.alice).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 1)
+
+        self.bob.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_returns_stock_of_reservations_deleted_directly(self):
+        self.client_for(self.alice).post('/api/cart/add/', {'product_id': self.product.id, 'quantity': 2}, format='json')
+        StockReservation.objects.all().delete()
+
+        self.assertEqual(release_orphaned_holds(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_stock, 0)
+        self.assertEqual(release_orphaned_holds(), 0)
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Kitaplar')
+        self.book = Product.objects.create(category=category, name='Kitap', description='', price=20, discount_price=15, stock=5)
+        self.pen = Product.objects.create(category=category, name='Qálem', description='', price=2, stock=10)
+        self.user = User.objects.create(username='alice', phone='+998900000031')
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.book, quantity=2)
+        CartItem.objects.create(cart=cart, product=self.pen, quantity=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_totals_use_discounted_price(self):
+        totals = Cart.objects.get(user=self.user).items.totals()
+        self.assertEqual(totals, {'items_count': 2, 'total_quantity': 5, 'total_price': Decimal('36.00')})
+
+    def test_summary_is_two_queries(self):
+        with self.assertNumQueries(2):  # корзина + агрегат
+            response = self.client.get('/api/cart/', {'summary': 1})
+        self.assertEqual(response.data, {'items_count': 2, 'total_quantity': 5, 'total_price': '36.00'})
+
+    def test_cart_is_two_queries_whatever_its_size(self):
+        with self.assertNumQueries(2):  # корзина + строки с товарами и суммами
+            response = self.client.get('/api/cart/')
+        self.assertEqual([item['line_total'] for item in response.data['cart_items']], ['30.00', '6.00'])
+        self.assertEqual(Decimal(response.data['total_price']), Decimal('36.00'))
+
+    def test_first_visit_creates_empty_cart(self):
+        newcomer = User.objects.create(username='bob', phone='+998900000032')
+        self.client.force_authenticate(newcomer)
+        response = self.client.get('/api/cart/')
+        self.assertEqual((response.data['cart_items'], Decimal(response.data['total_price'])), ([], Decimal('0')))
+        self.assertTrue(Cart.objects.filter(user=newcomer).exists())
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Kitaplar')
+        self.book = Product.objects.create(category=category, name='Kitap', description='', price=20, stock=5)
+        self.pen = Product.objects.create(category=category, name='Qálem', description='', price=2, stock=10)
+        self.lamp = Product.objects.create(category=category, name='Shıra', description='', price=50, stock=1)
+        self.user = User.objects.create(username='alice', phone='+998900000021')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.client.post('/api/cart/add/', {'product_id': self.book.id, 'quantity': 2}, format='json')
+        self.client.post('/api/cart/add/', {'product_id': self.lamp.id, 'quantity': 1}, format='json')
+
+    def batch(self, *items):
+        return self.client.post('/api/cart/batch/', {'items': list(items)}, format='json')
+
+    def quantities(self):
+        cart = Cart.objects.get(user=self.user)
+        return (
+            dict(cart.items.values_list('product_id', 'quantity')),
+            dict(cart.reservations.values_list('product_id', 'quantity')),
+        )
+
+    def test_add_set_remove_applied_together(self):
+        response = self.batch(
+            {'product_id': self.book.id, 'quantity': 1},
+            {'product_id': self.pen.id, 'quantity': 4, 'mode': 'set'},
+            {'product_id': self.pen.id, 'quantity': 1},
+            {'product_id': self.lamp.id, 'mode': 'remove'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['items'], {self.book.id: 3, self.pen.id: 5, self.lamp.id: 0})
+        self.assertEqual(response.data['total_quantity'], 8)
+        items, reservations = self.quantities()
+        self.assertEqual(items, {self.book.id: 3, self.pen.id: 5})
+        self.assertEqual(reservations, items)
+        self.assertEqual(
+            dict(Product.objects.values_list('id', 'reserved_stock')),
+            {self.book.id: 3, self.pen.id: 5, self.lamp.id: 0},
+        )
+
+    def test_any_shortage_rejects_whole_batch(self):
+        response = self.batch(
+            {'product_id': self.pen.id, 'quantity': 3},
+            {'product_id': self.book.id, 'quantity': 4},
+            {'product_id': 999999, 'quantity': 1},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [
+            {'product_id': self.book.id, 'code': 'insufficient', 'error': 'Jetkiliksiz. Qalǵanı: 5', 'available': 5},
+            {'product_id': 999999, 'code': 'not_found', 'error': 'Tovar tabılmadı', 'available': 0},
+        ])
+        self.assertEqual(self.quantities()[0], {self.book.id: 2, self.lamp.id: 1})
 
-# Create your tests here.
+    def test_query_count_does_not_grow_with_batch_size(self):
+        items = [{'product_id': product.id, 'quantity': 1, 'mode': 'set'} for product in (self.book, self.pen, self.lamp)]
+        with self.assertNumQueries(8):
+            self.assertEqual(self.batch(*items).status_code, 200)
@@ -3,21 +3,48 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from .batch import NOT_FOUND, CartBatchError, apply_cart_batch
 from .models import Cart, CartItem
-from products.models import Product
-from .serializers import CartSerializer, CartAddSerializer
+from .reservations import release
+from .serializers import (
+    CartSerializer, CartAddSerializer, CartSummarySerializer,
+    CartBatchSerializer, CartBatchResultSerializer, CartBatchErrorsSerializer,
+)
 
 
 class CartViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='summary',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY,
+                description='1 — только количество и сумма (для бейджа в шапке)'
+            )
+        ],
         responses={200: CartSerializer},
         description='Получить содержимое корзины текущего пользователя',
         summary='Моя корзина'
     )
     def list(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        if request.query_params.get('summary') in ('1', 'true'):
+            cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+            return Response(CartSummarySerializer(cart.items.totals()).data)
+
+        # Корзина вместе с суммой к оплате одним запросом
+        cart = Cart.objects.with_total().filter(user_id=request.user.pk).first()
+        if cart is None:
+            cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+
+        # Все товары корзины одним запросом, суммы строк считает БД
+        prefetch_related_objects([cart], Prefetch(
+            'items',
+            queryset=CartItem.objects.select_related('product').with_line_total().order_by('id')
+        ))
         serializer = CartSerializer(cart)
         return Response(serializer.data)
 
@@ -34,7 +61,7 @@ class CartViewSet(viewsets.ViewSet):
                 request_only=True
             )
         ],
-        description='Добавить товар в корзину',
+        description='Добавить товар в корзину (товар резервируется на CART_RESERVATION_TTL_MINUTES минут)',
         summary='Добавить в корзину'
     )
     @action(detail=False, methods=['post'])
@@ -49,25 +76,47 @@ class CartViewSet(viewsets.ViewSet):
         if qty < 1: 
             return Response({"error": "Sanı 1 den kem bolmawı kerek"}, 400)
 
-        try: 
-            product = Product.objects.get(id=p_id)
-        except Product.DoesNotExist: 
-            return Response({"error": "Tovar tabılmadı"}, 404)
-        
-        if product.stock <= 0: 
-            return Response({"error": "Qoymada joq"}, 400)
-        if product.stock < qty: 
-            return Response({"error": f"Jetkiliksiz. Qalǵanı: {product.stock}"}, 400)
-        
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-        if not created: 
-            item.quantity += qty
-        else: 
-            item.quantity = qty
-        item.save()
+        cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+        try:
+            # Пакет из одной строки: товар блокируется, количество складывается в upsert
+            apply_cart_batch(cart, [{'product_id': p_id, 'quantity': qty, 'mode': 'add'}])
+        except CartBatchError as e:
+            error = e.errors[0]
+            return Response({"error": error['error']}, 404 if error['code'] == NOT_FOUND else 400)
         return Response({"status": "Qosıldı"})
 
+    @extend_schema(
+        request=CartBatchSerializer,
+        responses={200: CartBatchResultSerializer, 400: CartBatchErrorsSerializer},
+        examples=[
+            OpenApiExample(
+                'Синхронизация корзины',
+                value={'items': [
+                    {'product_id': 1, 'quantity': 2, 'mode': 'add'},
+                    {'product_id': 2, 'quantity': 1, 'mode': 'set'},
+                    {'product_id': 3, 'mode': 'remove'},
+                ]},
+                request_only=True
+            )
+        ],
+        description=(
+            'Пакетное изменение корзины: add — прибавить, set — установить (0 = удалить), remove — удалить. '
+            'Остатки всех товаров проверяются одним запросом; при любой ошибке пакет не применяется.'
+        ),
+        summary='Пакетное изменение корзины'
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+        try:
+            final = apply_cart_batch(cart, serializer.validated_data['items'])
+        except CartBatchError as e:
+            return Response({"errors": e.errors}, status=400)
+        return Response({**CartSummarySerializer(cart.items.totals()).data, 'items': final})
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -83,9 +132,11 @@ class CartViewSet(viewsets.ViewSet):
     )
     @action(detail=False, methods=['delete'], url_path=r'remove/(?P<cart_item_id>\d+)')
     def remove(self, request, cart_item_id=None):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
         item = CartItem.objects.filter(cart=cart, id=cart_item_id).first()
         if item:
-            item.delete()
+            with transaction.atomic():
+                release(cart, [item.product_id])
+                item.delete()
             return Response({"status": "Óshirildi"}, status=200)
         return Response({"error": "Tabılmadı"}, status=404)
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+# Содержимое этих бэкендов видно только текущему процессу (или не хранится вовсе):
+# запись в одном воркере (инвалидация, деактивация пользователя) не доходит до остальных
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_is_shared(alias='default'):
+    """Кэш общий для процессов: Redis, Memcached, БД или файловый на одном хосте"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,248 @@
+"""
+Пул соединений PostgreSQL для бэкенда config.db.postgresql_pool.
+
+Django открывает соединение на каждый запрос и закрывает его в request_finished;
+с пулом «закрытие» возвращает соединение в пул, а следующий запрос (в любом потоке,
+в т.ч. в потоке thread_sensitive-исполнителя ASGI) берёт готовое.
+Пул общий для потоков процесса и создаётся заново после fork.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+DEFAULTS = {
+    'MIN_SIZE': 0,        # сколько простаивающих соединений не закрывать по MAX_IDLE
+    'MAX_SIZE': 10,       # потолок открытых соединений процесса
+    'TIMEOUT': 10.0,      # сколько секунд ждать свободное соединение
+    'MAX_LIFETIME': 1800.0,  # соединение старше закрывается при возврате
+    'MAX_IDLE': 300.0,    # простаивающее дольше (сверх MIN_SIZE) закрывается
+    'CHECK_AFTER': 30.0,  # после такого простоя перед выдачей выполняется SELECT 1
+}
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'created', 'released')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = self.released = time.monotonic()
+
+
+class ConnectionPool:
+    def __init__(self, name, min_size=0, max_size=10, timeout=10.0, max_lifetime=1800.0, max_idle=300.0,
+                 check_after=30.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('POOL: нужно 0 <= MIN_SIZE <= MAX_SIZE и MAX_SIZE >= 1')
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.idle = deque()      # LIFO: «тёплые» соединения выдаются первыми
+        self.in_use = {}         # id(connection) -> PooledConnection
+        self.opening = 0
+        self.closed = False
+        self.stats = {
+            'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'timeouts': 0,
+            'opened': 0, 'closed': 0, 'failed_checks': 0,
+        }
+        self.waiting = 0
+
+    @property
+    def size(self):
+        return len(self.idle) + len(self.in_use) + self.opening
+
+    def getconn(self, connect):
+        """
+        Свободное соединение из пула или новое через connect().
+        Если открыто MAX_SIZE соединений — ждёт до TIMEOUT секунд, затем PoolTimeout.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise psycopg2.OperationalError(f'Пул {self.name} закрыт')
+                if self.idle:
+                    entry = self.idle.pop()
+                    self.in_use[id(entry.connection)] = entry
+                    break
+                if self.size < self.max_size:
+                    self.opening += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    self.stats['wait_seconds'] += time.monotonic() - started
+                    raise PoolTimeout(
+                        f'Пул {self.name}: нет свободного соединения за {self.timeout} с '
+                        f'(занято {len(self.in_use)} из {self.max_size})'
+                    )
+                if not waited:
+                    waited = True
+                    self.stats['waits'] += 1
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.stats['checkouts'] += 1
+            self.stats['wait_seconds'] += time.monotonic() - started
+
+        if entry is not None and not self.check(entry):
+            # Битое соединение заменяем новым, не уступая его место в пуле
+            with self.condition:
+                del self.in_use[id(entry.connection)]
+                self.opening += 1
+            self.discard(entry, failed=True)
+            entry = None
+        if entry is None:
+            try:
+                entry = PooledConnection(connect())
+            except BaseException:
+                with self.condition:
+                    self.opening -= 1
+                    self.condition.notify()
+                raise
+            with self.condition:
+                self.opening -= 1
+                self.stats['opened'] += 1
+                self.in_use[id(entry.connection)] = entry
+        return entry.connection
+
+    def check(self, entry):
+        """Соединение, простаивавшее дольше CHECK_AFTER, проверяется SELECT 1 перед выдачей"""
+        if entry.connection.closed:
+            return False
+        if time.monotonic() - entry.released < self.check_after:
+            return True
+        try:
+            with entry.connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not entry.connection.autocommit:
+                entry.connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def putconn(self, connection):
+        """Возврат соединения: незавершённая транзакция откатывается, битое или старое закрывается"""
+        with self.condition:
+            entry = self.in_use.pop(id(connection), None)
+        if entry is None:
+            connection.close()
+            return
+        now = time.monotonic()
+        reusable = not connection.closed and self.pid == os.getpid() and now - entry.created < self.max_lifetime
+        if reusable and connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                reusable = False
+        if not reusable:
+            self.discard(entry)
+            with self.condition:
+                self.condition.notify()
+            return
+        entry.released = now
+        with self.condition:
+            if self.closed:
+                expired = [entry]
+            else:
+                self.idle.append(entry)
+                expired = self.pop_expired(now)
+            self.condition.notify()
+        for stale in expired:
+            self.discard(stale)
+
+    def pop_expired(self, now):
+        # Вызывается под self.condition; самые старые по простою лежат в начале очереди
+        expired = []
+        while len(self.idle) > self.min_size and now - self.idle[0].released >= self.max_idle:
+            expired.append(self.idle.popleft())
+        return expired
+
+    def discard(self, entry, failed=False):
+        try:
+            entry.connection.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            self.stats['closed'] += 1
+            self.stats['failed_checks'] += failed
+
+    def close(self):
+        """Закрывает простаивающие соединения; занятые закроются при возврате"""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = list(self.idle), deque()
+            self.condition.notify_all()
+        for entry in idle:
+            self.discard(entry)
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                **self.stats,
+                'size': self.size, 'idle': len(self.idle), 'in_use': len(self.in_use),
+                'waiting': self.waiting, 'max_size': self.max_size,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_key(alias, conn_params):
+    return alias, tuple(sorted((k, str(v)) for k, v in conn_params.items() if k != 'cursor_factory'))
+
+
+def get_pool(alias, conn_params, options):
+    """
+    Пул для алиаса и параметров подключения (у тестовой БД другое имя — другой пул).
+    После fork пулы родителя не используются: его сокеты закрывать нельзя — это оборвёт его сессии.
+    """
+    key = pool_key(alias, conn_params)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid() or pool.closed:
+            if pool is not None and pool.pid != os.getpid():
+                _pools.clear()
+            pool = _pools[key] = ConnectionPool(
+                alias, **{name.lower(): value for name, value in {**DEFAULTS, **options}.items()},
+            )
+        return pool
+
+
+def close_pools(alias=None, dbname=None):
+    """Закрывает пулы алиаса и/или базы (перед удалением тестовой БД, при остановке)"""
+    with _pools_lock:
+        keys = [
+            key for key in _pools
+            if (alias is None or key[0] == alias) and (dbname is None or ('dbname', dbname) in key[1])
+        ]
+        pools = [_pools.pop(key) for key in keys]
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close()
+
+
+def pool_snapshots():
+    """[(алиас, база, статистика)] пулов текущего процесса"""
+    with _pools_lock:
+        pools = [(key, pool) for key, pool in _pools.items() if pool.pid == os.getpid()]
+    return [(alias, dict(params).get('dbname', ''), pool.snapshot()) for (alias, params), pool in sorted(pools)]
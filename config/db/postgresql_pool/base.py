@@ -0,0 +1,42 @@
+from django.db.backends.postgresql import base, creation
+from django.utils.asyncio import async_unsafe
+
+from config.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # PostgreSQL не удаляет и не копирует базу, к которой есть подключения — сначала закрываем пул
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(dbname=test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools(dbname=self.connection.settings_dict['NAME'])
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL с пулом соединений: настройки — DATABASES[alias]['POOL'],
+    см. config.db.pool.DEFAULTS. CONN_MAX_AGE должен быть 0: соединение отдаётся
+    в пул в конце каждого запроса.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self.alias, conn_params, self.settings_dict.get('POOL', {}))
+        connection = self.pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # Для соединения из пула родительский get_new_connection не вызывался
+        level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = base.IsolationLevel.READ_COMMITTED if level is None else base.IsolationLevel(level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
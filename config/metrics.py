@@ -0,0 +1,242 @@
+"""
+Метрики запросов в памяти процесса: количество, гистограмма задержек, запросы к БД
+и их время, размер ответа — по имени URL. Отдаются в формате Prometheus (MetricsView).
+Каждый процесс (воркер gunicorn/uvicorn) считает свои метрики.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from config.db.pool import pool_snapshots
+
+logger = logging.getLogger('config.metrics.slow')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_PREVIEW_LENGTH = 500
+
+# Учёт запросов к БД текущего HTTP-запроса; contextvar доходит и до потоков sync_to_async
+current_recorder = ContextVar('metrics_query_recorder', default=None)
+
+
+class QueryRecorder:
+    __slots__ = ('count', 'duration', 'slowest', 'keep')
+
+    def __init__(self, keep):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self.keep = keep
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        if self.keep:
+            entry = (duration, sql)
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+
+def record_queries(execute, sql, params, many, context):
+    """execute_wrapper: без активного запроса — просто вызов execute"""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='config.metrics.install_query_recorder')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, view, method, status, duration, queries, db_time, size):
+        with self.lock:
+            stats = self.series.get((view, method))
+            if stats is None:
+                stats = self.series[(view, method)] = {
+                    'statuses': {}, 'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+                    'duration': 0.0, 'queries': 0, 'db_time': 0.0, 'bytes': 0,
+                }
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            stats['buckets'][bisect_left(LATENCY_BUCKETS, duration)] += 1
+            stats['duration'] += duration
+            stats['queries'] += queries
+            stats['db_time'] += db_time
+            stats['bytes'] += size
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        with self.lock:
+            series = {key: {**stats, 'statuses': dict(stats['statuses']), 'buckets': list(stats['buckets'])}
+                      for key, stats in self.series.items()}
+
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(view, method, **extra):
+            pairs = {'view': view, 'method': method, **extra}
+            return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in pairs.items()) + '}'
+
+        family('dukan_http_requests_total', 'counter', 'HTTP requests by view, method and status')
+        for (view, method), stats in sorted(series.items()):
+            for status, count in sorted(stats['statuses'].items()):
+                lines.append(f'dukan_http_requests_total{labels(view, method, status=status)} {count}')
+
+        family('dukan_http_request_duration_seconds', 'histogram', 'Request latency')
+        for (view, method), stats in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats['buckets']):
+                cumulative += count
+                lines.append(f'dukan_http_request_duration_seconds_bucket{labels(view, method, le=bound)} {cumulative}')
+            lines.append(f"dukan_http_request_duration_seconds_sum{labels(view, method)} {stats['duration']:.6f}")
+            lines.append(f'dukan_http_request_duration_seconds_count{labels(view, method)} {cumulative}')
+
+        for name, key, kind, help_text, fmt in (
+            ('dukan_db_queries_total', 'queries', 'counter', 'Database queries executed', '{}'),
+            ('dukan_db_query_duration_seconds_total', 'db_time', 'counter', 'Time spent in database queries', '{:.6f}'),
+            ('dukan_http_response_bytes_total', 'bytes', 'counter', 'Response body bytes', '{}'),
+        ):
+            family(name, kind, help_text)
+            for (view, method), stats in sorted(series.items()):
+                lines.append(f'{name}{labels(view, method)} {fmt.format(stats[key])}')
+
+        pools = pool_snapshots()
+        for name, key, kind, help_text, fmt in (
+            ('dukan_db_pool_connections', 'size', 'gauge', 'Open pooled connections', '{}'),
+            ('dukan_db_pool_connections_in_use', 'in_use', 'gauge', 'Pooled connections checked out', '{}'),
+            ('dukan_db_pool_connections_idle', 'idle', 'gauge', 'Idle pooled connections', '{}'),
+            ('dukan_db_pool_max_connections', 'max_size', 'gauge', 'Pool size limit', '{}'),
+            ('dukan_db_pool_waiting', 'waiting', 'gauge', 'Threads waiting for a connection', '{}'),
+            ('dukan_db_pool_checkouts_total', 'checkouts', 'counter', 'Connections handed out', '{}'),
+            ('dukan_db_pool_waits_total', 'waits', 'counter', 'Checkouts that had to wait', '{}'),
+            ('dukan_db_pool_wait_seconds_total', 'wait_seconds', 'counter', 'Time spent waiting for a connection', '{:.6f}'),
+            ('dukan_db_pool_timeouts_total', 'timeouts', 'counter', 'Checkouts that timed out', '{}'),
+            ('dukan_db_pool_opened_total', 'opened', 'counter', 'Connections opened', '{}'),
+            ('dukan_db_pool_closed_total', 'closed', 'counter', 'Connections closed', '{}'),
+            ('dukan_db_pool_failed_checks_total', 'failed_checks', 'counter', 'Connections failing the health check', '{}'),
+        ):
+            if not pools:
+                break
+            family(name, kind, help_text)
+            for alias, database, stats in pools:
+                lines.append(f'{name}{{alias="{escape(alias)}",database="{escape(database)}"}} {fmt.format(stats[key])}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Должен стоять первым в MIDDLEWARE. Работает и под WSGI, и под ASGI
+    (асинхронный webhook Telegram не переводится в синхронный режим).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Соединения, открытые до загрузки middleware, сигнал connection_created уже пропустили
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.finish(request, response, recorder, started)
+        return response
+
+    async def __acall__(self, request):
+        recorder, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.finish(request, response, recorder, started)
+        return response
+
+    @staticmethod
+    def start():
+        recorder = QueryRecorder(settings.METRICS_SLOW_SQL_COUNT)
+        return recorder, current_recorder.set(recorder), time.perf_counter()
+
+    def finish(self, request, response, recorder, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        registry.observe(view, request.method, response.status_code, duration, recorder.count, recorder.duration, size)
+
+        threshold = settings.METRICS_SLOW_REQUEST_MS
+        if threshold and duration * 1000 >= threshold:
+            self.log_slow(request, view, response, duration, recorder)
+
+    @staticmethod
+    def log_slow(request, view, response, duration, recorder):
+        worst = '\n'.join(
+            f'  {sql_duration * 1000:.1f} ms: {sql[:SQL_PREVIEW_LENGTH]}'
+            for sql_duration, sql in sorted(recorder.slowest, reverse=True)
+        )
+        logger.warning(
+            'Медленный запрос %s %s (%s) -> %s: %.1f ms, SQL: %d запросов, %.1f ms%s',
+            request.method, request.path, view, response.status_code, duration * 1000,
+            recorder.count, recorder.duration * 1000, '\n' + worst if worst else '',
+        )
+
+
+class MetricsView(APIView):
+    """Метрики процесса в формате Prometheus — только для staff"""
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(responses={200: OpenApiTypes.STR}, summary='Метрики Prometheus')
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
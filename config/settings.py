@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party
     'rest_framework',
@@ -35,9 +36,12 @@ INSTALLED_APPS = [
     'cart.apps.CartConfig',
     'orders.apps.OrdersConfig',
     'telegram_auth.apps.TelegramAuthConfig',
+    'analytics.apps.AnalyticsConfig',
+    'benchmarks.apps.BenchmarksConfig',
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',  # первым: учитывает время всех остальных middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,6 +51,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Метрики запросов (/api/metrics/): медленные запросы пишутся в лог config.metrics.slow
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 500))  # 0 — не логировать
+METRICS_SLOW_SQL_COUNT = int(os.getenv('METRICS_SLOW_SQL_COUNT', 3))  # сколько самых долгих SQL в записи
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -77,6 +85,46 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT'),
     }
 }
+# Пул соединений (config.db.postgresql_pool): DB_POOL_MAX_SIZE=0 — без пула,
+# соединение на каждый запрос. MAX_SIZE × число воркеров должно быть меньше max_connections.
+if int(os.getenv('DB_POOL_MAX_SIZE', 10)) > 0:
+    DATABASES['default'].update({
+        'ENGINE': 'config.db.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            'CHECK_AFTER': float(os.getenv('DB_POOL_CHECK_AFTER', 30)),
+        },
+    })
+# DB_ENGINE=sqlite — локальный запуск без PostgreSQL (тесты, бенчмарки)
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_NAME') or os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+
+# Кэш: по умолчанию LocMem, для общего кэша нескольких воркеров на одном хосте —
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache и CACHE_LOCATION=/путь
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'online-dukan'),
+    }
+}
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+# Число процессов веб-сервера (его же читают gunicorn/uvicorn): при > 1 кэш каталога
+# должен быть общим, иначе инвалидация доходит только до воркера, изменившего товар
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+
+# Сколько минут товар в корзине удерживается за покупателем
+CART_RESERVATION_TTL_MINUTES = int(os.getenv('CART_RESERVATION_TTL_MINUTES', 15))
+
+# Сколько соседей «часто покупают вместе» хранить на товар
+RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', 10))
 
 AUTH_PASSWORD_VALIDATORS = []
 AUTH_USER_MODEL = 'users.User'  # ВАЖНО!
@@ -91,12 +139,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Процессов для нарезки вариантов изображений товаров (0 — нарезать в текущем процессе)
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -133,8 +183,26 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Пользователь из JWT: сколько секунд держать в кэше и сколько доверять claims токена
+# (claims — только с общим кэшем: через него все воркеры узнают о деактивации; 0 — не доверять)
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+AUTH_USER_CLAIMS_MAX_AGE = int(os.getenv('AUTH_USER_CLAIMS_MAX_AGE', 0))
+
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_WEBHOOK_PATH = 'telegram/webhook/'  
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_HTTP_TIMEOUT = (3.05, float(os.getenv('TELEGRAM_HTTP_TIMEOUT', 10)))  # (connect, read)
+TELEGRAM_GLOBAL_RATE_LIMIT = float(os.getenv('TELEGRAM_GLOBAL_RATE_LIMIT', 30))  # сообщений/с на бота
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv('TELEGRAM_CHAT_RATE_LIMIT', 1))  # сообщений/с в один чат
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_OUTBOX_MAX_ATTEMPTS', 5))
+TELEGRAM_OUTBOX_RETENTION_DAYS = int(os.getenv('TELEGRAM_OUTBOX_RETENTION_DAYS', 7))  # сколько дней хранить отправленные
+TELEGRAM_UPDATE_WINDOW = int(os.getenv('TELEGRAM_UPDATE_WINDOW', 10000))  # сколько update_id помнить для дедупликации (в каждом процессе отдельно)
+
+# Одноразовые коды входа
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', 300))
+OTP_LIMIT_WINDOW = int(os.getenv('OTP_LIMIT_WINDOW', 600))  # окно счётчиков попыток (сек)
+OTP_MAX_CODES_PER_CHAT = int(os.getenv('OTP_MAX_CODES_PER_CHAT', 5))
+OTP_MAX_ATTEMPTS_PER_IP = int(os.getenv('OTP_MAX_ATTEMPTS_PER_IP', 20))
 
 CORS_ALLOW_ALL_ORIGINS = True 
 CORS_ALLOW_CREDENTIALS = True
@@ -0,0 +1,188 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import skipUnless
+
+import psycopg2
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from psycopg2 import extensions
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from users.models import User
+from .db.pool import ConnectionPool, PoolTimeout, pool_snapshots
+from .metrics import registry
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        category = Category.objects.create(name='Kitaplar')
+        Product.objects.create(category=category, name='Kitap', description='', price=20, stock=3)
+        self.staff = User.objects.create(username='boss', phone='+998900000051', is_staff=True)
+
+    def metrics(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_aggregated_per_view(self):
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+
+        text = self.metrics()
+        self.assertIn('dukan_http_requests_total{view="products:product-list",method="GET",status="200"} 2', text)
+        self.assertIn('dukan_http_request_duration_seconds_count{view="products:product-list",method="GET"} 2', text)
+        queries = next(line for line in text.splitlines()
+                       if line.startswith('dukan_db_queries_total{view="products:product-list"'))
+        self.assertGreater(int(queries.rsplit(' ', 1)[1]), 0)
+
+    def test_async_view_queries_are_counted(self):
+        User.objects.create(username='tg', phone='+998900000052', telegram_chat_id='555')
+        self.client.post('/api/auth/telegram/webhook/', {'update_id': 905001, 'message': {'chat': {'id': 555}, 'text': '/login'}},
+                         content_type='application/json')
+
+        text = self.metrics()
+        queries = next(line for line in text.splitlines()
+                       if line.startswith('dukan_db_queries_total{view="telegram_auth:webhook"'))
+        self.assertGreater(int(queries.rsplit(' ', 1)[1]), 0)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0.001)
+    def test_slow_requests_are_logged_with_worst_sql(self):
+        with self.assertLogs('config.metrics.slow', level='WARNING') as logs:
+            self.client.get('/api/products/')
+        self.assertIn('products:product-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, healthy=True):
+        self.closed = 0
+        self.autocommit = True
+        self.healthy = healthy
+        self.info = SimpleNamespace(transaction_status=extensions.TRANSACTION_STATUS_IDLE)
+        self.rollbacks = 0
+
+    def cursor(self):
+        if not self.healthy:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        return FakeCursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_returned_connection_is_reused(self):
+        pool = ConnectionPool('default', max_size=2)
+        first = pool.getconn(FakeConnection)
+        pool.putconn(first)
+        self.assertIs(pool.getconn(FakeConnection), first)
+        self.assertEqual(pool.snapshot()['opened'], 1)
+        self.assertEqual(pool.snapshot()['checkouts'], 2)
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        pool = ConnectionPool('default')
+        conn = pool.getconn(FakeConnection)
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertIs(pool.getconn(FakeConnection), conn)
+
+    def test_failed_health_check_replaces_connection(self):
+        pool = ConnectionPool('default', check_after=0)
+        broken = pool.getconn(lambda: FakeConnection(healthy=False))
+        pool.putconn(broken)
+        fresh = pool.getconn(FakeConnection)
+        self.assertIsNot(fresh, broken)
+        self.assertTrue(broken.closed)
+        stats = pool.snapshot()
+        self.assertEqual((stats['failed_checks'], stats['size']), (1, 1))
+
+    def test_old_connection_is_closed_on_return(self):
+        pool = ConnectionPool('default', max_lifetime=0)
+        conn = pool.getconn(FakeConnection)
+        pool.putconn(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.snapshot()['size'], 0)
+
+    def test_exhausted_pool_waits_then_times_out(self):
+        pool = ConnectionPool('default', max_size=1, timeout=0.05)
+        conn = pool.getconn(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(FakeConnection)
+
+        threading.Timer(0.02, pool.putconn, [conn]).start()
+        pool.timeout = 5
+        self.assertIs(pool.getconn(FakeConnection), conn)
+        stats = pool.snapshot()
+        self.assertEqual((stats['waits'], stats['timeouts']), (2, 1))
+        self.assertGreater(stats['wait_seconds'], 0.05)
+
+    def test_size_never_exceeds_max_under_contention(self):
+        pool = ConnectionPool('default', max_size=3)
+        peak = []
+
+        def worker():
+            for _ in range(20):
+                conn = pool.getconn(FakeConnection)
+                peak.append(pool.snapshot()['in_use'])
+                time.sleep(0.001)
+                pool.putconn(conn)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(pool.snapshot()['opened'], 3)
+
+
+@skipUnless(connection.vendor == 'postgresql' and hasattr(connection, 'pool'), 'Только бэкенд config.db.postgresql_pool')
+class PooledBackendTests(TransactionTestCase):
+    def test_connection_is_returned_to_pool_between_requests(self):
+        connection.close()
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        self.assertFalse(raw.closed)
+
+        def request():
+            from django.db import connection as thread_connection
+            with thread_connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            reused.append(thread_connection.connection is raw)
+            thread_connection.close()
+
+        reused = []
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+        self.assertEqual(reused, [True])
+        self.assertTrue(any(stats['idle'] for alias, database, stats in pool_snapshots()))
+        self.assertIn('dukan_db_pool_checkouts_total{alias="default"', registry.render())
@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenRefreshView
+from config.metrics import MetricsView
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -18,7 +19,11 @@ urlpatterns = [
     path('api/cart/', include('cart.urls')),
     path('api/orders/', include('orders.urls')),
     path('api/auth/', include('telegram_auth.urls')),
+    path('api/analytics/', include('analytics.urls')),
     
+    # Метрики Prometheus (staff)
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
+
     # JWT
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from products.models import Product
@@ -18,16 +18,56 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     address = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # История заказов пользователя: фильтр по user + сортировка -created_at (и -id для курсора)
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходный статус нужен обработчикам post_save (аналитика учитывает отмену заказа)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Сохранение и зависящие от статуса обновления (post_save) — одна транзакция
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_status = self.status
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    class Meta:
+        indexes = [
+            # Проверка покупки перед отзывом: строки товара -> заказы пользователя
+            models.Index(fields=['product', 'order'], name='orderitem_product_order_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
\ No newline at end of file
+        return f"{self.product.name} x {self.quantity}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходная позиция нужна обработчикам post_save (аналитика пересчитывает вклад заказа)
+        instance._loaded_line = instance.line_key()
+        return instance
+
+    def line_key(self):
+        return (self.__dict__.get('product_id'), self.__dict__.get('quantity'), self.__dict__.get('price'))
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_line = self.line_key()
\ No newline at end of file
@@ -18,6 +18,16 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class OrderListSerializer(serializers.ModelSerializer):
+    """Краткий вид для истории заказов: без позиций, только их количество"""
+    items_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'status', 'total_price', 'created_at', 'items_count', 'total_quantity']
+
+
 class CheckoutSerializer(serializers.Serializer):
     address = serializers.CharField(required=False)
     selected_cart_items = serializers.ListField(
@@ -1,3 +1,170 @@
-from django.test import TestCase
+import threading
+import unittest
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from products.models import Category, Product
+from users.models import User
+from .models import Order, OrderItem
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer', phone='+998900000001', address='Nukus')
+        category = Category.objects.create(name='Telefonlar')
+        self.phone = Product.objects.create(category=category, name='Phone', description='', price=100, discount_price=90, stock=5)
+        self.case = Product.objects.create(category=category, name='Case', description='', price=10, stock=1)
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_checkout_creates_order_and_decrements_stock(self):
+        first = CartItem.objects.create(cart=self.cart, product=self.phone, quantity=2)
+        second = CartItem.objects.create(cart=self.cart, product=self.case, quantity=1)
+
+        response = self.client.post('/api/orders/checkout/', {'selected_cart_items': [first.id, second.id]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['order_id'])
+        self.assertEqual(order.total_price, 190)
+        self.assertEqual(order.items.count(), 2)
+        self.phone.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.phone.stock, self.case.stock), (3, 0))
+        self.assertFalse(self.cart.items.exists())
+
+    def test_replayed_checkout_creates_single_order(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.phone, quantity=1)
+        other = CartItem.objects.create(cart=self.cart, product=self.case, quantity=1)
+
+        first = self.client.post('/api/orders/checkout/', {'selected_cart_items': [item.id]}, format='json')
+        replay = self.client.post('/api/orders/checkout/', {'selected_cart_items': [item.id, other.id]}, format='json')
+
+        self.assertEqual((first.status_code, replay.status_code), (201, 409))
+        self.assertEqual(replay.data['missing'], [item.id])
+        self.assertEqual(Order.objects.count(), 1)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock, 4)
+        self.assertTrue(self.cart.items.filter(pk=other.pk).exists())
+
+    def test_checkout_reports_every_short_item(self):
+        first = CartItem.objects.create(cart=self.cart, product=self.phone, quantity=6)
+        second = CartItem.objects.create(cart=self.cart, product=self.case, quantity=2)
+
+        response = self.client.post('/api/orders/checkout/', {'selected_cart_items': [first.id, second.id]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            {(item['product_id'], item['requested'], item['available']) for item in response.data['items']},
+            {(self.phone.id, 6, 5), (self.case.id, 2, 1)},
+        )
+        self.assertFalse(Order.objects.exists())
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock, 5)
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='regular', phone='+998900000031')
+        category = Category.objects.create(name='Kiyim')
+        products = [
+            Product.objects.create(category=category, name=f'Kóylek {i}', description='', price=10, stock=100)
+            for i in range(3)
+        ]
+        for _ in range(5):
+            order = Order.objects.create(user=self.user, total_price=60, address='Nukus')
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, price=10, quantity=2)
+        self.order = order
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_compact_and_query_count_is_flat(self):
+        with self.assertNumQueries(2):  # count + страница
+            response = self.client.get('/api/orders/')
+
+        self.assertEqual(response.status_code, 200)
+        first = response.data['results'][0]
+        self.assertNotIn('items', first)
+        self.assertEqual((first['items_count'], first['total_quantity']), (3, 6))
+
+    def test_detail_prefetches_items_with_products(self):
+        with self.assertNumQueries(2):  # заказ + позиции с товарами
+            response = self.client.get(f'/api/orders/{self.order.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['product_name'] for item in response.data['items']], ['Kóylek 0', 'Kóylek 1', 'Kóylek 2'])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Нужны блокировки строк PostgreSQL')
+class CheckoutConcurrencyTests(TransactionTestCase):
+    buyers = 20
+    stock = 5
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        category = Category.objects.create(name='Aksiya')
+        product = Product.objects.create(category=category, name='Limited', description='', price=50, stock=self.stock)
+        cart_items = []
+        for index in range(self.buyers):
+            user = User.objects.create(username=f'buyer{index}', phone=f'+99890000{index:04d}')
+            cart = Cart.objects.create(user=user)
+            cart_items.append((user, CartItem.objects.create(cart=cart, product=product, quantity=1)))
+
+        barrier = threading.Barrier(self.buyers)
+        statuses = []
+
+        def checkout(user, item):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                response = client.post('/api/orders/checkout/', {'selected_cart_items': [item.id]}, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=pair) for pair in cart_items]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(statuses.count(201), self.stock)
+        self.assertEqual(statuses.count(400), self.buyers - self.stock)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(sum(OrderItem.objects.values_list('quantity', flat=True)), self.stock)
+
+    def test_parallel_replays_of_one_checkout_create_one_order(self):
+        category = Category.objects.create(name='Aksiya')
+        product = Product.objects.create(category=category, name='Phone', description='', price=50, stock=10)
+        user = User.objects.create(username='buyer', phone='+998900009999', address='Nukus')
+        item = CartItem.objects.create(cart=Cart.objects.create(user=user), product=product, quantity=2)
+
+        replays = 5
+        barrier = threading.Barrier(replays)
+        statuses = []
+
+        def checkout():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                response = client.post('/api/orders/checkout/', {'selected_cart_items': [item.id]}, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(replays)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(sorted(statuses), [201] + [409] * (replays - 1))
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(product.stock, 8)
@@ -1,20 +1,43 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from collections import defaultdict
 from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Prefetch, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from .models import Order, OrderItem
-from .serializers import OrderSerializer, CheckoutSerializer
-from cart.models import Cart
-from products.pagination import CustomPagination
+from .serializers import OrderListSerializer, OrderSerializer, CheckoutSerializer
+from analytics.recommendations import record_co_purchases
+from analytics.rollups import record_order
+from cart.models import Cart, StockReservation
+from products.cache import bump_product_version
+from products.models import Product
+from products.pagination import CustomPagination, KeysetPaginationMixin
+from users.authentication import resolve_user
 
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderViewSet(KeysetPaginationMixin, viewsets.ReadOnlyModelViewSet):
     """Просмотр своих заказов — только для авторизованных"""
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Order.objects.filter(user_id=self.request.user.pk).order_by('-created_at')
+        if self.action == 'list':
+            # Количество позиций считается в том же запросе, сами позиции не загружаются
+            return queryset.annotate(
+                items_count=Count('items'),
+                total_quantity=Coalesce(Sum('items__quantity'), 0),
+            )
+        return queryset.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id'))
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return OrderSerializer
 
 class CheckoutView(APIView):
     """Оформление заказа — только для авторизованных"""
@@ -26,41 +49,110 @@ class CheckoutView(APIView):
 
         user = request.user
         selected_ids = serializer.validated_data.get('selected_cart_items')
-        address = serializer.validated_data.get('address', user.address)
-        
-        cart, _ = Cart.objects.get_or_create(user=user)
-        items_to_buy = cart.items.select_related('product').filter(id__in=selected_ids)
+        # Профиль загружается из БД только если адрес не передан
+        address = serializer.validated_data.get('address') or resolve_user(user).address
         
-        if not items_to_buy.exists(): 
-            return Response({"error": "Tovar tańlanbadi"}, status=400)
-        
-        try:
-            with transaction.atomic():
-                total = 0
-                prepared_items = []
-                for item in items_to_buy:
-                    if item.product.stock < item.quantity: 
-                        raise ValueError(f"'{item.product.name}' jetkiliksiz (stokta: {item.product.stock})")
-                    
-                    price = item.product.discount_price or item.product.price
-                    total += price * item.quantity
-                    prepared_items.append({'item': item, 'price': price})
-                
-                order = Order.objects.create(user=user, total_price=total, address=address)
-                for data in prepared_items:
-                    item = data['item']
-                    OrderItem.objects.create(
-                        order=order, product=item.product, 
-                        price=data['price'], quantity=item.quantity
-                    )
-                    item.product.stock -= item.quantity
-                    item.product.save()
-                
-                items_to_buy.delete()
+        cart, _ = Cart.objects.get_or_create(user_id=user.pk)
+
+        with transaction.atomic():
+            # Сначала блокируем выбранные строки корзины: повторная отправка того же заказа
+            # ждёт здесь и после коммита первой уже не находит удалённых строк
+            items_to_buy = list(cart.items.select_for_update().filter(id__in=selected_ids).order_by('id'))
+            missing = set(selected_ids) - {item.id for item in items_to_buy}
+            if missing:
+                # Строки уже оформлены параллельным запросом (или удалены из корзины)
                 return Response({
-                    "status": "Buyırtpa qabıllandı", 
-                    "order_id": order.id, 
-                    "total_price": str(total)
-                }, status=201)
-        except ValueError as e: 
-            return Response({"error": str(e)}, status=400)
\ No newline at end of file
+                    "error": "Sebet ózgerdi: tańlanǵan tovarlar sebette joq",
+                    "missing": sorted(missing),
+                }, status=409)
+            if not items_to_buy:
+                return Response({"error": "Tovar tańlanbadi"}, status=400)
+
+            # Один товар может встречаться в нескольких строках корзины
+            quantities = defaultdict(int)
+            for item in items_to_buy:
+                quantities[item.product_id] += item.quantity
+
+            # Блокируем строки товаров в порядке id — параллельные заказы не перепродадут
+            # остаток и не попадут в взаимную блокировку
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update().filter(id__in=quantities).order_by('id')
+            }
+
+            # Резервы корзины уже учтены в reserved_stock: активный резерв просто
+            # конвертируется в списание, без него товар должен быть свободен
+            now = timezone.now()
+            reservations, active = {}, set()
+            for product_id, held, expires_at in StockReservation.objects.filter(
+                cart=cart, product_id__in=quantities
+            ).values_list('product_id', 'quantity', 'expires_at'):
+                reservations[product_id] = held
+                if expires_at > now:
+                    active.add(product_id)
+
+            errors = []
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                held = reservations.get(product_id, 0)
+                if product is None:
+                    available = 0
+                elif product_id in active and held >= quantity:
+                    available = product.stock
+                else:
+                    available = product.stock - product.reserved_stock + held
+                if available < quantity:
+                    errors.append({
+                        'product_id': product_id,
+                        'product_name': product.name if product else None,
+                        'requested': quantity,
+                        'available': max(available, 0),
+                    })
+            if errors:
+                first = errors[0]
+                return Response({
+                    "error": f"'{first['product_name']}' jetkiliksiz (stokta: {first['available']})",
+                    "items": errors,
+                }, status=400)
+
+            total = 0
+            order_items, sale_lines = [], []
+            for item in items_to_buy:
+                product = products[item.product_id]
+                price = product.effective_price
+                total += price * item.quantity
+                order_items.append(OrderItem(product_id=item.product_id, price=price, quantity=item.quantity))
+                sale_lines.append((item.product_id, product.category_id, item.quantity, price))
+
+            order = Order.objects.create(user_id=user.pk, total_price=total, address=address)
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+            record_order(order, sale_lines)
+            record_co_purchases(quantities)
+
+            # Списание остатков и снятие резервов одним UPDATE ... SET stock = CASE id WHEN ... END
+            Product.objects.filter(id__in=quantities).update(
+                stock=Case(
+                    *[When(id=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()],
+                    output_field=IntegerField(),
+                ),
+                reserved_stock=Case(
+                    *[When(id=product_id, then=F('reserved_stock') - held) for product_id, held in reservations.items()],
+                    default=F('reserved_stock'),
+                    output_field=IntegerField(),
+                ),
+            )
+            StockReservation.objects.filter(cart=cart, product_id__in=quantities).delete()
+            bump_product_version(*quantities)
+
+            deleted, _ = cart.items.filter(id__in=[item.id for item in items_to_buy]).delete()
+            if deleted != len(items_to_buy):
+                # Строки корзины изменились в обход блокировки — заказ не оформляем
+                transaction.set_rollback(True)
+                return Response({"error": "Sebet ózgerdi, qaytadan urınıp kóriń"}, status=409)
+            return Response({
+                "status": "Buyırtpa qabıllandı", 
+                "order_id": order.id, 
+                "total_price": str(total)
+            }, status=201)
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+EPOCH_KEY = 'catalog:epoch'
+CATALOG_VERSION_KEY = 'catalog:version'
+PRODUCT_VERSION_KEY = 'catalog:product:{}:version'
+STATS_KEY = 'catalog:stats:{}'
+MODIFIED_KEY = '{}:modified'  # время последнего инкремента версии (для Last-Modified)
+
+# Версия входит в ключ ответа: инвалидация — это инкремент версии,
+# старые записи просто перестают читаться и вытесняются по TTL.
+
+
+def _initial_version():
+    # Не начинаем с 1: после очистки кэша версии не должны совпасть со старыми
+    return int(time.time() * 1000)
+
+
+def _incr(key, initial):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+        return cache.get(key, initial)
+
+
+def _get_versions(*keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key, 0)
+    return [versions[key] for key in keys]
+
+
+def _get_modified(*keys):
+    # Время изменения неизвестно (кэш очищен) — считаем, что всё изменилось сейчас
+    modified_keys = [MODIFIED_KEY.format(key) for key in keys]
+    stamps = cache.get_many(modified_keys)
+    for key in modified_keys:
+        if key not in stamps:
+            cache.add(key, time.time(), timeout=None)
+            stamps[key] = cache.get(key, time.time())
+    return max(stamps.values())
+
+
+def _bump(key):
+    _incr(key, _initial_version())
+    # Не раньше предыдущей отметки (часы воркеров расходятся), но и не позже текущего времени
+    modified_key = MODIFIED_KEY.format(key)
+    cache.set(modified_key, max(time.time(), cache.get(modified_key, 0)), timeout=None)
+
+
+def bump_catalog_version():
+    transaction.on_commit(lambda: _bump(CATALOG_VERSION_KEY))
+
+
+def bump_product_version(*product_ids):
+    """Инвалидирует карточки указанных товаров и все списки каталога"""
+    def bump():
+        for product_id in product_ids:
+            _bump(PRODUCT_VERSION_KEY.format(product_id))
+        _bump(CATALOG_VERSION_KEY)
+    transaction.on_commit(bump)
+
+
+def invalidate_catalog():
+    """Полная инвалидация — для массовых операций в обход Product.save"""
+    def bump():
+        _bump(EPOCH_KEY)
+        _bump(CATALOG_VERSION_KEY)
+    transaction.on_commit(bump)
+
+
+def record_stat(name):
+    _incr(STATS_KEY.format(name), 1)
+
+
+def cache_stats():
+    stats = cache.get_many([STATS_KEY.format(name) for name in ('hits', 'misses', 'not_modified')])
+    hits = stats.get(STATS_KEY.format('hits'), 0)
+    misses = stats.get(STATS_KEY.format('misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'not_modified': stats.get(STATS_KEY.format('not_modified'), 0),
+        'hit_ratio': round(hits / total, 4) if total else 0,
+    }
+
+
+def version_keys(view, per_product=False):
+    if per_product:
+        pk = view.kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+        return [EPOCH_KEY, PRODUCT_VERSION_KEY.format(pk)]
+    return [CATALOG_VERSION_KEY]
+
+
+def build_cache_key(view, request, per_product=False, ignore_params=()):
+    pk = view.kwargs.get(view.lookup_url_kwarg or view.lookup_field) if per_product else None
+    versions = _get_versions(*version_keys(view, per_product))
+    audience = 'staff' if request.user.is_staff else 'public'
+    params = [(name, values) for name, values in request.query_params.lists() if name not in ignore_params]
+    query = urlencode(sorted(params), doseq=True)
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    version = '.'.join(str(v) for v in versions)
+    return f'catalog:resp:{view.basename}:{view.action}:{audience}:{pk or "-"}:{version}:{digest}'
+
+
+def finalize_conditional(response, validators):
+    for header, value in validators.items():
+        response[header] = value
+    # Ответы для staff и гостей различаются — CDN не должен их смешивать
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def cache_catalog_response(per_product=False, ignore_params=()):
+    """
+    Кэширует GET-ответ метода ViewSet.
+    per_product=True — запись привязана к версии конкретного товара (detail-роуты).
+    ignore_params — параметры запроса, не влияющие на ответ (не входят в ключ).
+    Ответ получает слабый ETag (из ключа кэша) и Last-Modified (время последнего
+    инкремента версии, если оно не в текущей секунде); If-None-Match / If-Modified-Since
+    дают 304 без запросов к БД.
+    CATALOG_CACHE_TIMEOUT=0 отключает и кэш, и валидаторы (версии тоже хранятся в кэше).
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET' or settings.CATALOG_CACHE_TIMEOUT <= 0:
+                return view_method(self, request, *args, **kwargs)
+
+            key = build_cache_key(self, request, per_product=per_product, ignore_params=ignore_params)
+            etag = 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()
+            last_modified = int(_get_modified(*version_keys(self, per_product)))
+            validators = {'ETag': etag}
+            # Дата с точностью до секунды: пока идёт секунда последнего изменения, следующее
+            # изменение получит ту же дату — Last-Modified не отдаём и не сравниваем, хватает ETag
+            if last_modified < int(time.time()):
+                validators['Last-Modified'] = http_date(last_modified)
+            else:
+                last_modified = None
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                record_stat('not_modified')
+                return finalize_conditional(not_modified, validators)
+
+            data = cache.get(key)
+            if data is not None:
+                record_stat('hits')
+                return finalize_conditional(Response(data, headers={'X-Cache': 'HIT'}), validators)
+
+            record_stat('misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+                finalize_conditional(response, validators)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
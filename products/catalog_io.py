@@ -0,0 +1,199 @@
+import csv
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from .cache import invalidate_catalog
+from .models import Category, Product
+
+# Колонки файла каталога; category — slug категории
+CATALOG_FIELDS = ['id', 'category', 'name', 'slug', 'description', 'price', 'discount_price', 'stock', 'is_active']
+# Что перезаписывается у существующего товара (резервы и агрегаты отзывов не трогаем)
+UPDATE_FIELDS = [
+    'category', 'name', 'slug', 'description', 'price', 'discount_price', 'effective_price', 'stock', 'is_active',
+    'updated_at',
+]
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+# Поля из файла, которые проверяются ограничениями модели (max_digits, max_length, диапазон int):
+# иначе строка падает в bulk_create с DataError и обрывает весь импорт
+VALIDATED_FIELDS = {'name', 'slug', 'price', 'discount_price', 'effective_price', 'stock', 'is_active'}
+
+
+class CatalogRowError(ValueError):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def open_stream(path, mode):
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def read_rows(stream, fmt):
+    """
+    Построчно отдаёт (номер строки файла, словарь) из CSV/JSONL — файл целиком в память не читается.
+    Нечитаемая строка JSONL отдаётся как CatalogRowError и пропускается импортом, как любая плохая строка.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, CatalogRowError(f"JSON oqılmadı: {e.msg} (baǵana {e.colno})")
+            continue
+        yield line_number, row if isinstance(row, dict) else CatalogRowError("JSON obyekt bolıwı kerek")
+
+
+def parse_decimal(value, field, required=True):
+    if value in (None, ''):
+        if required:
+            raise CatalogRowError(f"{field}: bos bolmawı kerek")
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise CatalogRowError(f"{field}: san emes ({value!r})")
+    if not number.is_finite():
+        raise CatalogRowError(f"{field}: san emes ({value!r})")
+    return number
+
+
+def build_product(row, category_ids):
+    """Словарь строки файла -> несохранённый Product"""
+    try:
+        category_id = category_ids[row.get('category') or '']
+    except KeyError:
+        raise CatalogRowError(f"category: '{row.get('category')}' tabılmadı")
+    name = (row.get('name') or '').strip()
+    if not name:
+        raise CatalogRowError("name: bos bolmawı kerek")
+    try:
+        stock = int(row.get('stock') or 0)
+        product_id = int(row['id']) if row.get('id') not in (None, '') else None
+    except (TypeError, ValueError):
+        raise CatalogRowError(f"id/stock: pútin san emes ({row.get('id')!r}, {row.get('stock')!r})")
+    is_active = row.get('is_active', True)
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() in TRUE_VALUES
+    price = parse_decimal(row.get('price'), 'price')
+    discount_price = parse_decimal(row.get('discount_price'), 'discount_price', required=False)
+    product = Product(
+        id=product_id,
+        category_id=category_id,
+        name=name,
+        slug=row.get('slug') or slugify(name),
+        description=row.get('description') or '',
+        price=price,
+        discount_price=discount_price,
+        # bulk_create обходит Product.save
+        effective_price=Product.effective_price_of(price, discount_price),
+        stock=stock,
+        is_active=bool(is_active),
+    )
+    try:
+        product.clean_fields(exclude=[field.name for field in Product._meta.fields if field.name not in VALIDATED_FIELDS])
+    except ValidationError as e:
+        raise CatalogRowError('; '.join(f"{field}: {' '.join(messages)}" for field, messages in e.message_dict.items()))
+    return product
+
+
+def upsert_products(products):
+    """Вставка новых и обновление существующих (по id) товаров одним INSERT ... ON CONFLICT"""
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=['id'], update_fields=UPDATE_FIELDS,
+        )
+
+
+def reset_product_sequence():
+    # После вставки с явными id счётчик PostgreSQL отстаёт от max(id)
+    statements = connection.ops.sequence_reset_sql(no_style(), [Product])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def import_catalog(rows, batch_size=2000, on_error=None, on_progress=None):
+    """
+    Загружает товары пачками из пар (номер строки, словарь) от read_rows. Возвращает (импортировано, пропущено).
+    Повтор id внутри пачки схлопывается — побеждает последняя строка (PostgreSQL не даёт
+    ON CONFLICT DO UPDATE изменить одну строку дважды).
+    on_error(номер_строки, ошибка) и on_progress(импортировано, секунды) — для отчёта команды.
+    """
+    category_ids = dict(Category.objects.values_list('slug', 'id'))
+    started = time.monotonic()
+    imported = skipped = 0
+    batch = {}
+    explicit_ids = False
+    try:
+        for line_number, row in rows:
+            try:
+                if isinstance(row, CatalogRowError):
+                    raise row
+                product = build_product(row, category_ids)
+            except CatalogRowError as e:
+                skipped += 1
+                if on_error:
+                    on_error(line_number, e)
+                continue
+            explicit_ids = explicit_ids or product.id is not None
+            batch[product.id if product.id is not None else ('new', line_number)] = product
+            if len(batch) >= batch_size:
+                upsert_products(list(batch.values()))
+                imported += len(batch)
+                batch = {}
+                if on_progress:
+                    on_progress(imported, time.monotonic() - started)
+        if batch:
+            upsert_products(list(batch.values()))
+            imported += len(batch)
+    finally:
+        # Пачки до ошибки уже зафиксированы: счётчик id и кэш каталога должны их видеть
+        if explicit_ids:
+            reset_product_sequence()
+        if imported:
+            invalidate_catalog()
+    return imported, skipped
+
+
+def export_rows(queryset, chunk_size=2000):
+    """Товары как словари строк файла; курсор читается кусками по chunk_size"""
+    columns = [field if field != 'category' else 'category__slug' for field in CATALOG_FIELDS]
+    for values in queryset.order_by('id').values_list(*columns).iterator(chunk_size=chunk_size):
+        yield dict(zip(CATALOG_FIELDS, values))
+
+
+def write_rows(stream, rows, fmt):
+    """Пишет строки в CSV/JSONL, возвращает их количество"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CATALOG_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        count += 1
+    return count
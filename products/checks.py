@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from config.caches import cache_is_shared
+
+
+@register(Tags.caches)
+def check_catalog_cache(app_configs, **kwargs):
+    # Версии каталога живут в кэше: в локальном кэше каждый воркер видит только свои инкременты
+    if settings.CATALOG_CACHE_TIMEOUT > 0 and settings.WEB_CONCURRENCY > 1 and not cache_is_shared():
+        return [Error(
+            f'CATALOG_CACHE_TIMEOUT > 0 при WEB_CONCURRENCY={settings.WEB_CONCURRENCY} требует общего кэша, '
+            f"а CACHE_BACKEND — {settings.CACHES['default']['BACKEND']}",
+            hint='Задайте общий CACHE_BACKEND (Redis, Memcached, файловый), один воркер или CATALOG_CACHE_TIMEOUT=0.',
+            id='products.E001',
+        )]
+    return []
@@ -0,0 +1,49 @@
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+# Верхние границы корзин гистограммы цены к оплате (effective_price); последняя корзина — от PRICE_BUCKETS[-1] и выше
+PRICE_BUCKETS = (10, 50, 100, 500, 1000)
+
+
+def price_bucket_expression(field='effective_price'):
+    return Case(
+        *[When(**{f'{field}__lt': bound}, then=Value(index)) for index, bound in enumerate(PRICE_BUCKETS)],
+        default=Value(len(PRICE_BUCKETS)),
+        output_field=IntegerField(),
+    )
+
+
+def compute_facets(queryset):
+    """
+    Счётчики по категориям, корзинам цены и наличию для уже отфильтрованного queryset.
+    Один GROUP BY (категория, корзина цены); свёртка по осям — в Python.
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket_expression())
+        .values('category_id', 'category__name', 'category__slug', 'price_bucket')
+        .annotate(count=Count('id'), in_stock=Count('id', filter=Q(stock__gt=F('reserved_stock'))))
+    )
+    categories = {}
+    buckets = [0] * (len(PRICE_BUCKETS) + 1)
+    total = in_stock = 0
+    for row in rows:
+        category = categories.setdefault(row['category_id'], {
+            'id': row['category_id'], 'name': row['category__name'], 'slug': row['category__slug'],
+            'count': 0, 'in_stock': 0,
+        })
+        category['count'] += row['count']
+        category['in_stock'] += row['in_stock']
+        buckets[row['price_bucket']] += row['count']
+        total += row['count']
+        in_stock += row['in_stock']
+
+    bounds = (0,) + PRICE_BUCKETS
+    return {
+        'total': total,
+        'in_stock': in_stock,
+        'categories': sorted(categories.values(), key=lambda c: (-c['count'], c['id'])),
+        'price_buckets': [
+            {'min': low, 'max': PRICE_BUCKETS[index] if index < len(PRICE_BUCKETS) else None, 'count': count}
+            for index, (low, count) in enumerate(zip(bounds, buckets))
+        ],
+    }
@@ -1,26 +1,50 @@
 import django_filters
+from rest_framework import filters
 from .models import Product, Category
 
 
 class ProductFilter(django_filters.FilterSet):
-    min_price = django_filters.NumberFilter(field_name="price", lookup_expr='gte')
-    max_price = django_filters.NumberFilter(field_name="price", lookup_expr='lte')
+    # Цена к оплате — с учётом скидки
+    min_price = django_filters.NumberFilter(field_name="effective_price", lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name="effective_price", lookup_expr='lte')
+    category_tree = django_filters.NumberFilter(method='filter_by_category_tree')
+
+    def filter_by_category_tree(self, queryset, name, value):
+        # Все товары поддерева: один префиксный поиск по индексу Category.path
+        root_path = Category.objects.filter(pk=value).values_list('path', flat=True).first()
+        if not root_path:
+            return queryset.none()
+        return queryset.filter(category__path__startswith=root_path)
     
     class Meta:
         model = Product
-        fields = ['category', 'min_price', 'max_price']
+        fields = ['category', 'min_price', 'max_price', 'category_tree']
 
 
 class CategoryFilter(django_filters.FilterSet):
     parent = django_filters.NumberFilter(field_name="parent", lookup_expr='exact')
-    parent_name = django_filters.CharFilter(method='filter_by_parent_name')
-    
-    def filter_by_parent_name(self, queryset, name, value):
-        parent_category = Category.objects.filter(name__iexact=value).first()
-        if parent_category:
-            return queryset.filter(parent=parent_category)
-        return queryset.none()
+    parent_name = django_filters.CharFilter(field_name='parent__name', lookup_expr='iexact')
     
     class Meta:
         model = Category
-        fields = ['parent', 'parent_name']
\ No newline at end of file
+        fields = ['parent', 'parent_name']
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """
+    ?ordering=price / -price сортирует по effective_price (цена со скидкой).
+    id добавляется вторым ключом: порядок страниц однозначен и совпадает с индексом.
+    """
+    field_aliases = {'price': 'effective_price'}
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or request.query_params.get(self.ordering_param) is None:
+            return ordering
+        ordering = [
+            ('-' if term.startswith('-') else '') + self.field_aliases.get(term.lstrip('-'), term.lstrip('-'))
+            for term in ordering
+        ]
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append(('-' if ordering[0].startswith('-') else '') + 'id')
+        return ordering
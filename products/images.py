@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from .cache import bump_product_version
+from .imaging import render_variants
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_store_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_context():
+    """
+    Процессы нарезки запускаются через forkserver (spawn, где его нет): fork из
+    многопоточного сервера копирует чужие блокировки и открытые соединения с БД.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def get_pool():
+    """Общий пул процессов для нарезки (создаётся при первом обращении)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, mp_context=process_context())
+        return _pool
+
+
+def get_store_pool():
+    """Потоки, которые ждут нарезку и сохраняют результат (файлы + ORM)"""
+    global _store_pool
+    with _pool_lock:
+        if _store_pool is None:
+            _store_pool = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+        return _store_pool
+
+
+def variant_name(image_name, product_id, variant, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'products/variants/{product_id}/{stem}-{variant}.{extension}'
+
+
+def variant_files(variants):
+    return {meta['file'] for formats in (variants or {}).values() for meta in formats.values()}
+
+
+def delete_variant_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def read_image(image_name):
+    with default_storage.open(image_name, 'rb') as f:
+        return f.read()
+
+
+def store_variants(product_id, image_name, previous, rendered):
+    """
+    Сохраняет нарезанные файлы и их размеры в Product.image_variants.
+    Если картинку успели заменить — результат отбрасывается.
+    """
+    variants = {}
+    for variant, fmt, extension, data, width, height in rendered:
+        name = variant_name(image_name, product_id, variant, extension)
+        default_storage.delete(name)
+        saved = default_storage.save(name, ContentFile(data))
+        variants.setdefault(variant, {})[fmt] = {'file': saved, 'width': width, 'height': height}
+
+    # update() в обход Product.save: сохранение не должно снова запускать нарезку
+    if not Product.objects.filter(pk=product_id, image=image_name).update(image_variants=variants):
+        delete_variant_files(variant_files(variants))
+        return False
+    delete_variant_files(variant_files(previous) - variant_files(variants))
+    bump_product_version(product_id)
+    return True
+
+
+def generate_variants(product):
+    """Синхронная нарезка одного товара (через пул, если он включён)"""
+    data = read_image(product.image.name)
+    if settings.IMAGE_VARIANT_WORKERS:
+        rendered = get_pool().submit(render_variants, data).result()
+    else:
+        rendered = render_variants(data)
+    return store_variants(product.pk, product.image.name, product.image_variants, rendered)
+
+
+def finish_variants(product_id, image_name, previous, future):
+    # Обычный поток со своим соединением с БД; служебный поток ProcessPoolExecutor не блокируем
+    try:
+        return store_variants(product_id, image_name, previous, future.result())
+    except Exception:
+        logger.exception('Не удалось нарезать изображение товара %s', product_id)
+        return False
+    finally:
+        connection.close()
+
+
+def submit_variants(product_id):
+    """
+    Отправляет нарезку в пул процессов, сохранение — в пул потоков; запрос их не ждёт.
+    Возвращает future сохранения (None, если нарезка прошла синхронно или не нужна).
+    """
+    product = Product.objects.filter(pk=product_id).only('image', 'image_variants').first()
+    if product is None or not product.image:
+        return
+    image_name, previous = product.image.name, product.image_variants
+    # Вызывается из on_commit: товар уже сохранён, ошибка файла или Pillow не должна стать 500
+    try:
+        if not settings.IMAGE_VARIANT_WORKERS:
+            generate_variants(product)
+            return
+        future = get_pool().submit(render_variants, read_image(image_name))
+    except Exception:
+        logger.exception('Не удалось нарезать изображение товара %s', product_id)
+        return
+    return get_store_pool().submit(finish_variants, product_id, image_name, previous, future)
+
+
+def schedule_variants(product_id):
+    transaction.on_commit(lambda: submit_variants(product_id))
@@ -0,0 +1,40 @@
+"""
+Нарезка вариантов изображения товара на Pillow.
+Модуль не импортирует Django: функции выполняются в процессах пула.
+"""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Вариант -> максимальная сторона (px)
+VARIANT_SIZES = {'thumb': 160, 'card': 480, 'full': 1200}
+# Формат -> (формат Pillow, расширение, параметры сохранения)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def render_variants(data):
+    """
+    Байты оригинала -> [(вариант, формат, расширение, байты, ширина, высота), ...].
+    Меньшие картинки не увеличиваются.
+    """
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode != 'RGB':
+            # JPEG не поддерживает прозрачность — подкладываем белый фон
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+
+        rendered = []
+        for variant, size in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            for fmt, (pil_format, extension, params) in VARIANT_FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, pil_format, **params)
+                rendered.append((variant, fmt, extension, buffer.getvalue(), resized.width, resized.height))
+        return rendered
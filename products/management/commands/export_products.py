@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from products.catalog_io import detect_format, export_rows, open_stream, write_rows
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Потоковый экспорт товаров в CSV/JSONL (формат совместим с import_products)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл .csv/.jsonl или '-' для stdout")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='По умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--active-only', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        queryset = Product.objects.all()
+        if options['active_only']:
+            queryset = queryset.filter(is_active=True)
+
+        started = time.monotonic()
+        stream = open_stream(path, 'w')
+        try:
+            count = write_rows(stream, export_rows(queryset, options['chunk_size']), detect_format(path, options['format']))
+        finally:
+            if path != '-':
+                stream.close()
+        seconds = time.monotonic() - started
+        # Отчёт в stderr, чтобы не смешивать с данными при выводе в stdout
+        self.stderr.write(f'Экспортировано: {count} за {seconds:.1f} с ({count / max(seconds, 1e-6):.0f} строк/с)')
@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from products.images import process_context, read_image, store_variants
+from products.imaging import render_variants
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Нарезает варианты изображений (thumb/card/full, WebP/JPEG) для уже загруженных картинок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Перенарезать и товары, у которых варианты уже есть')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.filter(image_variants={})
+        products = products.order_by('id').only('id', 'image', 'image_variants')
+
+        done = failed = 0
+        # Не больше двух задач на процесс в очереди: оригиналы не копятся в памяти
+        max_pending = options['workers'] * 2
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=process_context()) as pool:
+            pending = {}
+
+            def collect(futures):
+                nonlocal done, failed
+                for future in futures:
+                    product = pending.pop(future)
+                    try:
+                        store_variants(product.pk, product.image.name, product.image_variants, future.result())
+                        done += 1
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f'Товар {product.pk}: {e}')
+
+            for product in products.iterator(chunk_size=500):
+                try:
+                    data = read_image(product.image.name)
+                except OSError as e:
+                    failed += 1
+                    self.stderr.write(f'Товар {product.pk}: {e}')
+                    continue
+                pending[pool.submit(render_variants, data)] = product
+                if len(pending) >= max_pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            collect(list(pending))
+
+        self.stdout.write(self.style.SUCCESS(f'Нарезано: {done}, ошибок: {failed}'))
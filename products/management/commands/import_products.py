@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from products.catalog_io import detect_format, import_catalog, open_stream, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт товаров из CSV/JSONL: новые вставляются, существующие (по id) обновляются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл .csv/.jsonl или '-' для stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+
+        def on_error(line_number, error):
+            self.stderr.write(f'Строка {line_number}: {error}')
+
+        def on_progress(imported, seconds):
+            self.stdout.write(f'{imported} строк, {imported / max(seconds, 1e-6):.0f} строк/с')
+
+        started = time.monotonic()
+        stream = open_stream(path, 'r')
+        try:
+            imported, skipped = import_catalog(
+                read_rows(stream, fmt), options['batch_size'], on_error=on_error, on_progress=on_progress
+            )
+        finally:
+            if path != '-':
+                stream.close()
+        seconds = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {imported}, пропущено: {skipped} за {seconds:.1f} с '
+            f'({imported / max(seconds, 1e-6):.0f} строк/с)'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from products.cache import invalidate_catalog
+from products.models import Product, Review
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает rating_sum, rating_count и reviews_count товаров по таблице Review'
+
+    def handle(self, *args, **options):
+        def review_aggregate(expression):
+            subquery = (
+                Review.objects.filter(product=OuterRef('pk'))
+                .order_by()
+                .values('product')
+                .annotate(value=expression)
+                .values('value')
+            )
+            return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+        with transaction.atomic():
+            updated = Product.objects.update(
+                rating_sum=review_aggregate(Sum('rating')),
+                rating_count=review_aggregate(Count('rating')),
+                reviews_count=review_aggregate(Count('id')),
+            )
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано товаров: {updated}'))
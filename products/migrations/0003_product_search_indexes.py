@@ -0,0 +1,42 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Индексы только для PostgreSQL: на SQLite поиск работает через icontains.
+# Выражение зафиксировано здесь и должно совпадать с products.search.product_search_vector()
+SEARCH_INDEXES = [
+    GinIndex(
+        SearchVector('name', weight='A', config='simple') + SearchVector('description', weight='B', config='simple'),
+        name='product_search_vector_gin',
+    ),
+    GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='product_name_trgm_gin'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Product = apps.get_model('products', 'Product')
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(Product, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Product = apps.get_model('products', 'Product')
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(Product, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_rating_aggregates'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    level = list(Category.objects.filter(parent__isnull=True))
+    depth = 0
+    while level:
+        for category in level:
+            parent_path = category.parent.path if category.parent_id else '/'
+            category.path = f'{parent_path}{category.pk}/'
+            category.depth = depth
+        Category.objects.bulk_update(level, ['path', 'depth'], batch_size=500)
+        level = list(Category.objects.filter(parent__in=level).select_related('parent'))
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
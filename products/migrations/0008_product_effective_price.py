@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:17
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_effective_price(apps, schema_editor):
+    # Один UPDATE до создания индексов
+    Product = apps.get_model('products', 'Product')
+    Product.objects.update(effective_price=Coalesce('discount_price', 'price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_review_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_category_price_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'effective_price'], name='product_cat_eff_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_price_id_idx'),
+        ),
+    ]
@@ -1,23 +1,74 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
+from .cache import bump_catalog_version, bump_product_version
 
 User = get_user_model()
 
+CATEGORY_CYCLE_ERROR = 'Kategoriya óziniń ishki kategoriyasına kóshirile almaydı'
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True) 
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Материализованный путь вида "/1/5/12/": поддерево = path__startswith
+    path = models.CharField(max_length=255, db_index=True, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     
     def __str__(self): 
         return self.name
 
+    def build_path(self):
+        # Путь родителя читаем из БД: объект self.parent может быть устаревшим
+        parent_path = '/'
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).get()
+        return f'{parent_path}{self.pk}/'
+
+    def in_subtree(self, category_id):
+        """category_id — эта категория или её потомок (path у сохранённой — текущее место в дереве)"""
+        return bool(self.pk and category_id and self.path) and Category.objects.filter(
+            pk=category_id, path__startswith=self.path,
+        ).exists()
+
+    def clean(self):
+        if self.in_subtree(self.parent_id):
+            raise ValidationError({'parent': CATEGORY_CYCLE_ERROR})
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'path', 'depth'}
+
+        with transaction.atomic():
+            if self.pk is None:
+                super().save(*args, **kwargs)
+                kwargs.pop('force_insert', None)
+                self.path = self.build_path()
+                self.depth = self.path.count('/') - 2
+                Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            else:
+                old_path, old_depth = self.path, self.depth
+                self.path = self.build_path()
+                if old_path and self.path.startswith(old_path) and self.path != old_path:
+                    # Обычно ловит clean() в админке/сериализаторе; здесь — для прямых вызовов save()
+                    raise ValidationError({'parent': CATEGORY_CYCLE_ERROR})
+                self.depth = self.path.count('/') - 2
+                super().save(*args, **kwargs)
+                if old_path and old_path != self.path:
+                    # Переносим всё поддерево одним UPDATE
+                    Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                        depth=F('depth') + (self.depth - old_depth),
+                    )
+        bump_catalog_version()
 
 
 class Product(models.Model):
@@ -27,19 +78,101 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Цена к оплате (discount_price, если задана, иначе price) — поддерживается в save();
+    # по ней фильтры, сортировка, суммы корзины и checkout
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Нарезанные варианты: {'thumb': {'webp': {'file', 'width', 'height'}, 'jpeg': {...}}, 'card': ..., 'full': ...}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     stock = models.IntegerField(default=0)
+    # Сумма резервов корзин (cart.StockReservation), поддерживается атомарно
+    reserved_stock = models.PositiveIntegerField(default=0, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Денормализованные агрегаты отзывов (обновляются атомарно через F-выражения)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    reviews_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Витрина: is_active=True ORDER BY -id (ProductViewSet.get_queryset)
+            models.Index(fields=['is_active', '-id'], name='product_active_id_idx'),
+            # ProductFilter: category + диапазон цены к оплате
+            models.Index(fields=['category', 'effective_price'], name='product_cat_eff_price_idx'),
+            # ?ordering=price / -price (id — второй ключ сортировки и курсора); is_active проверяется
+            # по ходу обхода — неактивных мало, и тот же индекс служит списку для staff
+            models.Index(fields=['effective_price', 'id'], name='product_price_id_idx'),
+        ]
     
     def __str__(self): 
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Имя исходного файла: по нему save() понимает, что загружено новое изображение
+        instance._loaded_image = instance.__dict__.get('image')
+        # Исходная категория: аналитика переносит сводки товара при её смене
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+    @staticmethod
+    def effective_price_of(price, discount_price):
+        return price if discount_price is None else discount_price
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        self.effective_price = self.effective_price_of(self.price, self.discount_price)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'discount_price'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'effective_price'}
+        loaded_image = getattr(self, '_loaded_image', None) or ''
+        image_changed = (self.image.name or '') != loaded_image and (
+            kwargs.get('update_fields') is None or 'image' in kwargs['update_fields']
+        )
+        stale_variants = self.image_variants if image_changed else None
+        if image_changed:
+            # Варианты старой картинки больше не отдаём; новые появятся после нарезки
+            self.image_variants = {}
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'image_variants'}
         super().save(*args, **kwargs)
+        self._loaded_image = self.image.name or ''
+        self._loaded_category_id = self.category_id
+        bump_product_version(self.pk)
+        if image_changed:
+            from .images import delete_variant_files, schedule_variants, variant_files
+            transaction.on_commit(lambda: delete_variant_files(variant_files(stale_variants)))
+            if self.image:
+                schedule_variants(self.pk)
+
+    @property
+    def available(self):
+        return max(self.stock - self.reserved_stock, 0)
+
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @classmethod
+    def apply_review_delta(cls, product_id, rating_sum=0, rating_count=0, reviews_count=0):
+        """Сдвигает агрегаты отзывов одним UPDATE без чтения строки"""
+        changes = {}
+        if rating_sum:
+            changes['rating_sum'] = F('rating_sum') + rating_sum
+        if rating_count:
+            changes['rating_count'] = F('rating_count') + rating_count
+        if reviews_count:
+            changes['reviews_count'] = F('reviews_count') + reviews_count
+        if changes:
+            cls.objects.filter(pk=product_id).update(**changes)
+            bump_product_version(product_id)
 
 
 class Review(models.Model):
@@ -54,4 +187,28 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'product')
\ No newline at end of file
+        unique_together = ('user', 'product')
+        indexes = [
+            # Отзывы товара, новые первыми
+            models.Index(fields=['product', '-created_at'], name='review_product_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем исходную оценку, чтобы при сохранении посчитать разницу
+        instance._loaded_rating = instance.__dict__.get('rating')
+        return instance
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        old_rating = None if created else getattr(self, '_loaded_rating', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Product.apply_review_delta(
+                self.product_id,
+                rating_sum=(self.rating or 0) - (old_rating or 0),
+                rating_count=(self.rating is not None) - (old_rating is not None),
+                reviews_count=1 if created else 0,
+            )
+        self._loaded_rating = self.rating
\ No newline at end of file
@@ -1,7 +1,192 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
-    page_size = 10                  
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация: WHERE (поле, id) > (значения курсора) вместо OFFSET
+    и без COUNT(*). Включается параметром ?pagination=cursor.
+    Сортировка берётся из queryset (в т.ч. после OrderingFilter), id добавляется
+    вторым ключом, чтобы позиция была однозначной.
+    """
+    page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    total_query_param = 'with_total'
+    default_ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self.get_field(queryset.model, name) for name in self.ordering]
+
+        values, reverse = self.decode_cursor(request)
+        ordering = [self.invert(name) for name in self.ordering] if reverse else self.ordering
+        page_queryset = queryset.order_by(*ordering)
+        if values is not None:
+            page_queryset = page_queryset.filter(self.build_filter(ordering, values))
+
+        self.approximate_total = None
+        if request.query_params.get(self.total_query_param) in ('1', 'true'):
+            self.approximate_total = self.estimate_count(queryset)
+
+        results = list(page_queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self.position_of(results[-1])
+            if (has_more and reverse) or (values is not None and not reverse):
+                self.previous_position = self.position_of(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_link(self.next_position, reverse=False),
+            'previous': self.get_link(self.previous_position, reverse=True),
+            'results': data,
+        }
+        if self.approximate_total is not None:
+            payload['approximate_count'] = self.approximate_total
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'approximate_count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        # Поддерживаем только простые поля модели; всё остальное — сортировка по умолчанию
+        ordering = [name for name in queryset.query.order_by if isinstance(name, str)]
+        if not ordering or len(ordering) != len(queryset.query.order_by) or not all(
+            self.is_model_field(queryset.model, name) for name in ordering
+        ):
+            ordering = list(self.default_ordering)
+        pk_name = queryset.model._meta.pk.name
+        ordering = [name.replace('pk', pk_name) if name.lstrip('-') == 'pk' else name for name in ordering]
+        if ordering[-1].lstrip('-') != pk_name:
+            ordering.append(('-' if ordering[0].startswith('-') else '') + pk_name)
+        return ordering
+
+    @staticmethod
+    def is_model_field(model, name):
+        name = name.lstrip('-')
+        if name == 'pk':
+            return True
+        try:
+            return model._meta.get_field(name).concrete
+        except FieldDoesNotExist:
+            return False
+
+    def get_field(self, model, name):
+        try:
+            return model._meta.get_field(name.lstrip('-'))
+        except FieldDoesNotExist:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def invert(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    @staticmethod
+    def build_filter(ordering, values):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+        conditions = []
+        for index, name in enumerate(ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            equal = {ordering[i].lstrip('-'): values[i] for i in range(index)}
+            conditions.append(Q(**equal, **{f'{field}__{lookup}': values[index]}))
+        return reduce(or_, conditions)
+
+    def position_of(self, instance):
+        return [getattr(instance, field.attname) for field in self.fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            values = [field.to_python(value) for field, value in zip(self.fields, payload['v'])]
+            if len(values) != len(self.fields):
+                raise ValueError
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        payload = json.dumps({'v': position, 'r': reverse}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, urlsafe_b64encode(payload.encode()).decode())
+
+    @staticmethod
+    def estimate_count(queryset):
+        # Оценка планировщика PostgreSQL вместо COUNT(*); на других СУБД — None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPaginationMixin:
+    """Переключает ViewSet на KeysetPagination при ?pagination=cursor"""
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            if request is not None and request.query_params.get('pagination') == 'cursor':
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,44 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from rest_framework import filters
+
+# Конфигурация без стемминга: названия товаров смешанные (каракалпакский/русский/латиница).
+# Должна совпадать в индексе и в запросе, иначе PostgreSQL не использует expression index.
+SEARCH_CONFIG = 'simple'
+
+
+def product_search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    ?search= по названию и описанию.
+    PostgreSQL: полнотекстовый поиск (GIN по tsvector) + триграммы по названию
+    для опечаток, результаты отсортированы по релевантности.
+    Другие СУБД (SQLite в тестах): обычный icontains по search_fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = ' '.join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+        return (
+            queryset
+            .annotate(
+                search=product_search_vector(),
+                search_rank=SearchRank(product_search_vector(), query) + TrigramSimilarity('name', terms),
+            )
+            # name % terms: порог — pg_trgm.similarity_threshold (по умолчанию 0.3);
+            # явное similarity() > порога не использовало бы GIN-индекс по триграммам
+            .filter(Q(search=query) | Q(name__trigram_similar=terms))
+            .order_by('-search_rank', '-id')
+        )
@@ -1,12 +1,25 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
-from .models import Product, Category, Review
+from .models import CATEGORY_CYCLE_ERROR, Product, Category, Review
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta: 
         model = Category
         fields = '__all__'
 
+    def validate_parent(self, parent):
+        if self.instance is not None and parent is not None and self.instance.in_subtree(parent.pk):
+            raise serializers.ValidationError(CATEGORY_CYCLE_ERROR)
+        return parent
+
+class CategoryTreeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    slug = serializers.SlugField()
+    children = serializers.ListField(child=serializers.DictField())
+
 class ReviewSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     
@@ -34,22 +47,76 @@ class AddReviewSerializer(serializers.Serializer):
             raise serializers.ValidationError("Нужно указать хотя бы оценку или комментарий.")
         return attrs
 
+class CategoryFacetSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    slug = serializers.SlugField()
+    count = serializers.IntegerField()
+    in_stock = serializers.IntegerField()
+
+class PriceBucketSerializer(serializers.Serializer):
+    min = serializers.IntegerField()
+    max = serializers.IntegerField(allow_null=True)
+    count = serializers.IntegerField()
+
+class ProductFacetsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    in_stock = serializers.IntegerField()
+    categories = CategoryFacetSerializer(many=True)
+    price_buckets = PriceBucketSerializer(many=True)
+
+class ProductRecommendationSerializer(serializers.Serializer):
+    # Строка analytics.ProductRecommendation с select_related('related')
+    id = serializers.IntegerField(source='related_id')
+    name = serializers.CharField(source='related.name')
+    slug = serializers.SlugField(source='related.slug')
+    price = serializers.DecimalField(source='related.price', max_digits=10, decimal_places=2)
+    discount_price = serializers.DecimalField(source='related.discount_price', max_digits=10, decimal_places=2,
+                                              allow_null=True)
+    effective_price = serializers.DecimalField(source='related.effective_price', max_digits=10, decimal_places=2)
+    orders = serializers.IntegerField()
+
+class ProductAvailabilitySerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(source='id', read_only=True)
+    reserved = serializers.IntegerField(source='reserved_stock', read_only=True)
+    available = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ['product_id', 'stock', 'reserved', 'available']
+
 class ProductSerializer(serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
     
     @extend_schema_field(serializers.FloatField)
     def get_avg_rating(self, obj):
-        from django.db.models import Avg
-        avg = obj.reviews.filter(rating__isnull=False).aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 0
-    
-    @extend_schema_field(serializers.IntegerField)
-    def get_reviews_count(self, obj):
-        return obj.reviews.count()
+        # Читаем денормализованные колонки — без отдельного запроса на каждый товар
+        return obj.avg_rating
     
     avg_rating = serializers.SerializerMethodField()
-    reviews_count = serializers.SerializerMethodField()
+    reviews_count = serializers.IntegerField(read_only=True)
+    images = serializers.SerializerMethodField()
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_images(self, obj):
+        """
+        Нарезанные варианты: {'thumb': {'webp': {'url', 'width', 'height'}, 'jpeg': ...}, ...,
+        'srcset': {'webp': 'url 160w, url 480w, ...', 'jpeg': ...}}. None, пока нарезки нет.
+        """
+        if not obj.image_variants:
+            return None
+        request = self.context.get('request')
+        images, srcset = {}, {}
+        for variant, formats in obj.image_variants.items():
+            for fmt, meta in formats.items():
+                url = default_storage.url(meta['file'])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                images.setdefault(variant, {})[fmt] = {'url': url, 'width': meta['width'], 'height': meta['height']}
+                srcset.setdefault(fmt, []).append(f"{url} {meta['width']}w")
+        images['srcset'] = {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
+        return images
 
     class Meta:
         model = Product
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['rating_sum', 'rating_count', 'reserved_stock', 'image_variants']
\ No newline at end of file
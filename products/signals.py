@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .cache import bump_catalog_version, bump_product_version
+from .images import delete_variant_files, variant_files
+from .models import Category, Product, Review
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    # Срабатывает и для queryset.delete() / каскада, в отличие от Review.delete()
+    Product.apply_review_delta(
+        instance.product_id,
+        rating_sum=-(instance.rating or 0),
+        rating_count=-1 if instance.rating is not None else 0,
+        reviews_count=-1,
+    )
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    bump_product_version(instance.pk)
+    # Нарезанные варианты больше никому не нужны; файлы удаляем только после коммита
+    names = variant_files(instance.image_variants)
+    if names:
+        transaction.on_commit(lambda: delete_variant_files(names))
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    bump_catalog_version()
@@ -1,3 +1,594 @@
-from django.test import TestCase
+import os
+import tempfile
+import unittest
+from base64 import urlsafe_b64encode
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils.http import http_date, parse_http_date
+from PIL import Image
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem
+from users.models import User
+from . import catalog_io, images
+from .cache import CATALOG_VERSION_KEY, MODIFIED_KEY, _bump
+from .models import Category, Product, Review
+from .search import product_search_vector
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = Category.objects.create(name='Texnika')
+        self.phones = Category.objects.create(name='Telefonlar', parent=self.root)
+        self.android = Category.objects.create(name='Android', parent=self.phones)
+        self.books = Category.objects.create(name='Kitaplar')
+
+    def paths(self):
+        return dict(Category.objects.values_list('name', 'path'))
+
+    def test_path_and_depth_follow_subtree_moves(self):
+        self.assertEqual(
+            (self.android.path, self.android.depth),
+            (f'/{self.root.pk}/{self.phones.pk}/{self.android.pk}/', 2),
+        )
+
+        self.phones.parent = self.books
+        self.phones.save()
+
+        self.android.refresh_from_db()
+        self.assertEqual(
+            (self.android.path, self.android.depth),
+            (f'/{self.books.pk}/{self.phones.pk}/{self.android.pk}/', 2),
+        )
+        self.phones.parent = None
+        self.phones.save()
+        self.android.refresh_from_db()
+        self.assertEqual((self.android.path, self.android.depth), (f'/{self.phones.pk}/{self.android.pk}/', 1))
+
+    def test_move_into_own_subtree_is_a_validation_error(self):
+        paths = self.paths()
+        self.root.parent = self.android
+        with self.assertRaises(ValidationError) as raised:
+            self.root.full_clean()
+        self.assertIn('parent', raised.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            self.root.save()
+        self.assertEqual(self.paths(), paths)
+
+    def test_admin_reports_cycle_as_form_error(self):
+        staff = User.objects.create(username='boss', phone='+998900000061', is_staff=True, is_superuser=True)
+        self.client.force_login(staff)
+
+        response = self.client.post(f'/admin/products/category/{self.root.pk}/change/', {
+            'name': self.root.name, 'slug': self.root.slug, 'parent': self.android.pk,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'óziniń ishki kategoriyasına')
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent_id)
+
+    def test_tree_and_category_tree_filter(self):
+        Product.objects.create(category=self.android, name='Pixel', description='', price=100)
+        Product.objects.create(category=self.books, name='Kitap', description='', price=10)
+
+        tree = APIClient().get('/api/products/categories/tree/').data
+        self.assertEqual(
+            [(node['name'], [child['name'] for child in node['children']]) for node in tree],
+            [('Texnika', ['Telefonlar']), ('Kitaplar', [])],
+        )
+        self.assertEqual(tree[0]['children'][0]['children'][0]['name'], 'Android')
+
+        response = APIClient().get('/api/products/', {'category_tree': self.root.pk})
+        self.assertEqual([product['name'] for product in response.data['results']], ['Pixel'])
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Kitaplar', slug='kitaplar')
+        self.other = Category.objects.create(name='Oyınshıqlar', slug='oyinshiqlar')
+        self.book = Product.objects.create(category=self.category, name='Kitap', description='', price=20, stock=3)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def run_command(self, *args):
+        with open(os.devnull, 'w') as devnull:
+            call_command(*args, stdout=devnull, stderr=devnull)
+
+    def test_round_trip_updates_existing_and_inserts_new(self):
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                self.run_command('export_products', self.path(f'catalog.{fmt}'))
+                Product.objects.filter(pk=self.book.pk).update(name='Ózgertilgen', stock=0)
+
+                self.run_command('import_products', self.path(f'catalog.{fmt}'))
+
+                self.book.refresh_from_db()
+                self.assertEqual((self.book.name, self.book.stock), ('Kitap', 3))
+                self.assertEqual(Product.objects.count(), 1)
+
+    def test_import_resolves_slugs_and_skips_bad_rows(self):
+        with open(self.path('new.csv'), 'w', encoding='utf-8') as f:
+            f.write('category,name,price,stock\n')
+            f.write('oyinshiqlar,Top,15.50,7\n')
+            f.write('joq,Qate,1,1\n')
+            f.write('kitaplar,Baha joq,,1\n')
+
+        self.run_command('import_products', self.path('new.csv'), '--batch-size', '1')
+
+        ball = Product.objects.get(name='Top')
+        self.assertEqual((ball.category, ball.slug, ball.stock), (self.other, 'top', 7))
+        self.assertEqual(Product.objects.count(), 2)
+        # Последовательность id не сломана импортом
+        self.assertGreater(Product.objects.create(category=self.other, name='Jańa', description='', price=1).pk, ball.pk)
+
+    def test_malformed_jsonl_line_is_reported_and_skipped(self):
+        with open(self.path('broken.jsonl'), 'w', encoding='utf-8') as f:
+            f.write('{"category": "kitaplar", "name": "Birinshi", "price": "1"}\n')
+            f.write('\n')
+            f.write('{"category": "kitaplar", "name": \n')
+            f.write('[1, 2]\n')
+            f.write('{"category": "kitaplar", "name": "Ekinshi", "price": "2"}\n')
+        stderr = StringIO()
+
+        call_command('import_products', self.path('broken.jsonl'), '--batch-size', '1', stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(set(Product.objects.values_list('name', flat=True)), {'Kitap', 'Birinshi', 'Ekinshi'})
+        self.assertEqual([line.split(':')[0] for line in stderr.getvalue().splitlines()], ['Строка 3', 'Строка 4'])
+
+    def test_duplicate_ids_in_one_batch_keep_last_row(self):
+        with open(self.path('dupes.csv'), 'w', encoding='utf-8') as f:
+            f.write('id,category,name,price,stock\n')
+            f.write(f'{self.book.pk},kitaplar,Birinshi nusqa,10,1\n')
+            f.write('900,kitaplar,Jańa,5,1\n')
+            f.write(f'{self.book.pk},kitaplar,Sońǵı nusqa,12,4\n')
+
+        self.run_command('import_products', self.path('dupes.csv'))
+
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.name, self.book.stock), ('Sońǵı nusqa', 4))
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_rows_outside_field_limits_are_skipped(self):
+        with open(self.path('limits.csv'), 'w', encoding='utf-8') as f:
+            f.write('category,name,slug,price,discount_price,stock\n')
+            f.write('kitaplar,Qımbat,,123456789012,,1\n')
+            f.write('kitaplar,Belgisiz,,NaN,,1\n')
+            f.write('kitaplar,Sheksiz,,10,Infinity,1\n')
+            f.write(f'kitaplar,{"U" * 201},,10,,1\n')
+            f.write(f'kitaplar,Uzın slug,{"s" * 51},10,,1\n')
+            f.write('kitaplar,Durıs,,10,,1\n')
+        stderr = StringIO()
+
+        call_command('import_products', self.path('limits.csv'), stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(set(Product.objects.values_list('name', flat=True)), {'Kitap', 'Durıs'})
+        self.assertEqual([line.split(':')[0] for line in stderr.getvalue().splitlines()],
+                         [f'Строка {number}' for number in range(2, 7)])
+
+    def test_failed_batch_still_resets_sequence_and_cache(self):
+        rows = [(number, {'id': str(900 + number), 'category': 'kitaplar', 'name': f'Tovar {number}', 'price': '1'})
+                for number in (1, 2)]
+        upsert = catalog_io.upsert_products
+        calls = []
+
+        def upsert_then_fail(products):
+            # Первая пачка фиксируется, вторая падает ошибкой БД
+            calls.append(products)
+            if len(calls) > 1:
+                raise DatabaseError('value out of range')
+            upsert(products)
+
+        with mock.patch.object(catalog_io, 'upsert_products', upsert_then_fail), \
+                mock.patch.object(catalog_io, 'invalidate_catalog') as invalidate, \
+                self.assertRaises(DatabaseError):
+            catalog_io.import_catalog(iter(rows), batch_size=1)
+
+        invalidate.assert_called_once()
+        self.assertTrue(Product.objects.filter(pk=901).exists())
+        self.assertGreater(Product.objects.create(category=self.other, name='Jańa', description='', price=1).pk, 901)
+
+
+def png_upload(name='photo.png', size=(2000, 1000)):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Foto')
+
+    def test_upload_generates_variants_and_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(category=self.category, name='Kamera', description='', price=1, image=png_upload())
+
+        product.refresh_from_db()
+        self.assertEqual(
+            {variant: (formats['webp']['width'], formats['webp']['height']) for variant, formats in product.image_variants.items()},
+            {'thumb': (160, 80), 'card': (480, 240), 'full': (1200, 600)},
+        )
+        images = APIClient().get(f'/api/products/{product.id}/').data['images']
+        self.assertEqual(images['card']['jpeg']['width'], 480)
+        self.assertEqual(len(images['srcset']['webp'].split(', ')), 3)
+
+    def test_unreadable_image_is_logged_not_raised_after_commit(self):
+        with self.assertLogs('products.images', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(category=self.category, name='Kamera', description='', price=1, image=png_upload())
+            default_storage.delete(product.image.name)
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+
+    def test_deleting_product_removes_variant_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(category=self.category, name='Kamera', description='', price=1, image=png_upload())
+        product.refresh_from_db()
+        files = images.variant_files(product.image_variants)
+        self.assertTrue(files and all(default_storage.exists(name) for name in files))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=product.pk).delete()
+
+        self.assertFalse(any(default_storage.exists(name) for name in files))
+
+    def test_backfill_command_fills_missing_variants(self):
+        product = Product.objects.create(category=self.category, name='Kamera', description='', price=1)
+        Product.objects.filter(pk=product.pk).update(image=default_storage.save('products/old.png', png_upload()))
+
+        call_command('generate_image_variants', '--workers', '1', stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants), {'thumb', 'card', 'full'})
+
+
+class ImageVariantPoolTests(TransactionTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, IMAGE_VARIANT_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(self.shutdown_pools)
+
+    def shutdown_pools(self):
+        for name in ('_pool', '_store_pool'):
+            pool = getattr(images, name)
+            if pool is not None:
+                pool.shutdown()
+                setattr(images, name, None)
+
+    def test_variants_are_rendered_in_processes_and_stored_in_a_thread(self):
+        product = Product.objects.create(category=Category.objects.create(name='Foto'), name='Kamera', description='', price=1)
+        Product.objects.filter(pk=product.pk).update(image=default_storage.save('products/new.png', png_upload()))
+
+        self.assertTrue(images.submit_variants(product.pk).result(timeout=60))
+
+        self.assertIn(images.get_pool()._mp_context.get_start_method(), ('forkserver', 'spawn'))
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['thumb']['webp']['width'], 160)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Kitaplar')
+        self.product = Product.objects.create(category=category, name='Kitap', description='', price=20, stock=3)
+        self.client = APIClient()
+
+    def test_miss_hit_and_invalidation_on_save(self):
+        list_url, detail_url = '/api/products/', f'/api/products/{self.product.id}/'
+        self.assertEqual(self.client.get(list_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(detail_url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(list_url)['X-Cache'], 'HIT')
+            self.assertEqual(self.client.get(detail_url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Kitap 2'
+            self.product.save()
+
+        for url in (list_url, detail_url):
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertIn('Kitap 2', response.content.decode())
+
+    @override_settings(CATALOG_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_cache_and_validators(self):
+        self.client.get('/api/products/')
+        response = self.client.get('/api/products/')
+        self.assertNotIn('X-Cache', response)
+        self.assertNotIn('ETag', response)
+
+    def test_several_workers_require_shared_cache(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=local, WEB_CONCURRENCY=4):
+            self.assertIn('products.E001', [error.id for error in run_checks()])
+        for overrides in ({'CACHES': local, 'WEB_CONCURRENCY': 1}, {'CACHES': shared, 'WEB_CONCURRENCY': 4},
+                          {'CACHES': local, 'WEB_CONCURRENCY': 4, 'CATALOG_CACHE_TIMEOUT': 0}):
+            with override_settings(**overrides):
+                self.assertNotIn('products.E001', [error.id for error in run_checks()])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Kitaplar')
+        self.product = Product.objects.create(category=category, name='Kitap', description='', price=20, stock=3)
+        self.client = APIClient()
+
+    def test_etag_short_circuits_until_product_changes(self):
+        url = f'/api/products/{self.product.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = 2
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def at(self, moment):
+        """Часы products.cache: Last-Modified зависит от секунды изменения и текущей"""
+        clock = mock.patch('products.cache.time')
+        clock.start().time.return_value = moment
+        self.addCleanup(clock.stop)
+
+    def test_if_modified_since_on_list(self):
+        self.at(1_000_000.2)
+        self.client.get('/api/products/')
+        self.at(1_000_005.1)
+        last_modified = self.client.get('/api/products/')['Last-Modified']
+        self.assertEqual(last_modified, http_date(1_000_000))
+
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_within_the_same_second_is_not_modified_since(self):
+        self.at(1_000_000.2)
+        self.client.get('/api/products/')
+        self.at(1_000_005.1)
+        first = self.client.get('/api/products/')
+        self.at(1_000_005.4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = 2
+            self.product.save()
+
+        # Та же секунда: дата не различает версии — Last-Modified нет, If-Modified-Since не даёт 304
+        self.at(1_000_005.7)
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        self.at(1_000_006.1)
+        response = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual((response.status_code, response['Last-Modified']), (200, http_date(1_000_005)))
+
+        # При обоих заголовках решает If-None-Match
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'],
+                                   HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_many_changes_per_second_never_date_ahead_of_now(self):
+        self.at(1_000_000.5)
+        for _ in range(50):
+            _bump(CATALOG_VERSION_KEY)
+        self.assertEqual(cache.get(MODIFIED_KEY.format(CATALOG_VERSION_KEY)), 1_000_000.5)
+
+        self.at(1_000_001.0)
+        response = self.client.get('/api/products/')
+        self.assertLessEqual(parse_http_date(response['Last-Modified']), 1_000_001)
+
+
+class ProductFacetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.books = Category.objects.create(name='Kitaplar')
+        self.phones = Category.objects.create(name='Telefonlar')
+        Product.objects.create(category=self.books, name='Kitap', description='', price=5, stock=3)
+        Product.objects.create(category=self.books, name='Albom', description='', price=60, stock=0)
+        Product.objects.create(category=self.phones, name='Telefon', description='', price=700, stock=2, reserved_stock=2)
+        Product.objects.create(category=self.phones, name='Eski', description='', price=30, stock=1, is_active=False)
+        self.client = APIClient()
+
+    def test_counts_follow_filters_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/products/facets/').json()
+        self.assertEqual((data['total'], data['in_stock']), (3, 1))
+        self.assertEqual([(c['slug'], c['count'], c['in_stock']) for c in data['categories']],
+                         [('kitaplar', 2, 1), ('telefonlar', 1, 0)])
+        self.assertEqual([b['count'] for b in data['price_buckets']], [1, 0, 1, 0, 1, 0])
+        self.assertIsNone(data['price_buckets'][-1]['max'])
+
+        data = self.client.get('/api/products/facets/', {'min_price': 50, 'max_price': 100}).json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['categories'][0]['id'], self.books.id)
+
+    def test_cached_per_filter_signature(self):
+        self.client.get('/api/products/facets/', {'category': self.books.id})
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/facets/', {'category': self.books.id, 'page': 2})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/api/products/facets/', {'category': self.phones.id})['X-Cache'], 'MISS')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Telefonlar')
+        for name, description in (('Samsung Galaxy', 'Smartfon'), ('Chexol', 'Samsung ushın chexol'), ('Nokia', '')):
+            Product.objects.create(category=category, name=name, description=description, price=10, stock=1)
+        self.client = APIClient()
+
+    def names(self, search):
+        response = self.client.get('/api/products/', {'search': search})
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.data['results']]
+
+    def test_migration_indexes_the_query_expression(self):
+        # Иначе PostgreSQL не подставит expression index в поиск
+        migration = import_module('products.migrations.0003_product_search_indexes')
+        self.assertEqual(migration.SEARCH_INDEXES[0].expressions[0], product_search_vector())
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'Запасной вариант для других СУБД')
+    def test_icontains_fallback_searches_name_and_description(self):
+        self.assertEqual(sorted(self.names('samsung')), ['Chexol', 'Samsung Galaxy'])
+        self.assertEqual(self.names('nok'), ['Nokia'])
+        self.assertEqual(self.names('iphone'), [])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Полнотекстовый поиск только в PostgreSQL')
+    def test_full_text_ranks_name_first_and_tolerates_typos(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest('Нужно расширение pg_trgm')
+        self.assertEqual(self.names('samsung'), ['Samsung Galaxy', 'Chexol'])
+        self.assertEqual(self.names('Samsng Galaxi'), ['Samsung Galaxy'])
+        self.assertEqual(self.names('iphone'), [])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Kitaplar')
+        # Одинаковые цены: порядок внутри них задаёт id
+        self.products = [
+            Product.objects.create(category=category, name=f'Kitap {index}', description='', price=price, stock=1)
+            for index, price in enumerate([30, 10, 20, 10, 30, 10, 20])
+        ]
+        self.client = APIClient()
+
+    def walk(self, url, params=None, direction='next'):
+        pages = []
+        while url:
+            data = self.client.get(url, params).json()
+            params = None
+            pages.append([product['id'] for product in data['results']])
+            url = data[direction]
+        return pages
+
+    def test_forward_and_backward_round_trip_with_ties(self):
+        expected = [p.id for p in sorted(self.products, key=lambda p: (p.effective_price, p.id))]
+        pages = self.walk('/api/products/', {'pagination': 'cursor', 'ordering': 'price', 'page_size': 2})
+        self.assertEqual(pages, [expected[0:2], expected[2:4], expected[4:6], expected[6:7]])
+
+        data = self.client.get('/api/products/', {'pagination': 'cursor', 'ordering': 'price', 'page_size': 2}).json()
+        third_page = self.client.get(self.client.get(data['next']).json()['next']).json()
+        back = self.walk(third_page['previous'], direction='previous')
+        self.assertEqual(back, [expected[2:4], expected[0:2]])
+
+    def test_default_ordering_is_newest_first(self):
+        pages = self.walk('/api/products/', {'pagination': 'cursor', 'page_size': 3})
+        self.assertEqual(sum(pages, []), [p.id for p in reversed(self.products)])
+
+    def test_malformed_cursor_is_not_found(self):
+        short = urlsafe_b64encode(b'{"v":[10]}').decode()
+        for cursor in ('not-a-cursor', urlsafe_b64encode(b'[1, 2]').decode(), short):
+            response = self.client.get('/api/products/', {'pagination': 'cursor', 'ordering': 'price', 'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class ReviewAggregateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Kitaplar')
+        self.product = Product.objects.create(category=category, name='Kitap', description='', price=20, stock=3)
+        for index in range(5):
+            Product.objects.create(category=category, name=f'Kitap {index}', description='', price=10, stock=1)
+        self.buyers = [
+            User.objects.create(username=f'buyer{index}', phone=f'+99890000006{index}', address='Nukus')
+            for index in range(3)
+        ]
+        for buyer in self.buyers:
+            order = Order.objects.create(user=buyer, total_price=20, address='Nukus')
+            OrderItem.objects.create(order=order, product=self.product, price=20, quantity=1)
+
+    def review(self, buyer, **data):
+        client = APIClient()
+        client.force_authenticate(buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(f'/api/products/{self.product.id}/add_review/', data, format='json')
+
+    def aggregates(self):
+        data = APIClient().get(f'/api/products/{self.product.id}/').data
+        return data['avg_rating'], data['reviews_count']
+
+    def test_list_reads_aggregates_without_per_product_queries(self):
+        Review.objects.create(user=self.buyers[0], product=self.product, rating=4)
+        with self.assertNumQueries(2):  # COUNT для пагинации + страница
+            response = APIClient().get('/api/products/')
+        row = next(product for product in response.data['results'] if product['id'] == self.product.id)
+        self.assertEqual((row['avg_rating'], row['reviews_count']), (4.0, 1))
+
+    def test_create_update_and_delete_keep_aggregates(self):
+        self.assertEqual(self.review(self.buyers[0], rating=5).status_code, 201)
+        self.assertEqual(self.review(self.buyers[1], rating=2).status_code, 201)
+        self.assertEqual(self.review(self.buyers[2], comment='Jaqsı').status_code, 201)
+        self.assertEqual(self.aggregates(), (3.5, 3))
+
+        self.assertEqual(self.review(self.buyers[1], rating=4).status_code, 200)
+        self.assertEqual(self.review(self.buyers[0], comment='Ózgertildi').status_code, 200)
+        self.assertEqual(self.review(self.buyers[2], rating=3).status_code, 200)
+        self.assertEqual(self.aggregates(), (4.0, 3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.get(user=self.buyers[0]).delete()
+            Review.objects.filter(user=self.buyers[2]).delete()
+        self.assertEqual(self.aggregates(), (4.0, 1))
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (4, 1))
+
+
+class EffectivePriceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Kitaplar')
+        self.cheap = Product.objects.create(category=category, name='Arzan', description='', price=30)
+        self.sale = Product.objects.create(category=category, name='Skidka', description='', price=100, discount_price=20)
+        self.dear = Product.objects.create(category=category, name='Qımbat', description='', price=50)
+        self.client = APIClient()
+
+    def names(self, response):
+        return [product['name'] for product in response.json()['results']]
+
+    def test_maintained_on_save(self):
+        self.assertEqual(self.sale.effective_price, 20)
+        self.sale.discount_price = None
+        self.sale.save(update_fields=['discount_price'])
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.effective_price, 100)
+
+    def test_filter_and_ordering_use_discounted_price(self):
+        self.assertEqual(self.names(self.client.get('/api/products/', {'ordering': 'price'})), ['Skidka', 'Arzan', 'Qımbat'])
+        self.assertEqual(self.names(self.client.get('/api/products/', {'ordering': '-price', 'pagination': 'cursor'})),
+                         ['Qımbat', 'Arzan', 'Skidka'])
+        self.assertEqual(self.names(self.client.get('/api/products/', {'max_price': 25})), ['Skidka'])
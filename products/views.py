@@ -1,17 +1,26 @@
-from rest_framework import viewsets, permissions, filters, status, mixins
+from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
+from analytics.models import ProductRecommendation
 from .models import Product, Category, Review
 from .serializers import (
     ProductSerializer, 
+    ProductAvailabilitySerializer,
+    ProductFacetsSerializer,
+    ProductRecommendationSerializer,
     CategorySerializer, 
+    CategoryTreeSerializer,
     ReviewSerializer, 
     AddReviewSerializer
 )
-from .filters import ProductFilter, CategoryFilter
-from .pagination import CustomPagination
+from .filters import ProductFilter, ProductOrderingFilter, CategoryFilter
+from .pagination import CustomPagination, KeysetPaginationMixin
+from .cache import cache_catalog_response, cache_stats
+from .facets import compute_facets
+from .search import ProductSearchFilter
 
 class CategoryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     queryset = Category.objects.all().order_by('id')
@@ -21,24 +30,51 @@ class CategoryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = CategoryFilter
     
+    @cache_catalog_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         queryset = super().get_queryset()
         if 'parent' not in self.request.query_params and 'parent_name' not in self.request.query_params:
             queryset = queryset.filter(parent__isnull=True)
         return queryset
 
-class ProductViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        responses={200: CategoryTreeSerializer(many=True)},
+        description='Всё дерево категорий одним ответом',
+        summary='Дерево категорий'
+    )
+    @action(detail=False, methods=['get'])
+    @cache_catalog_response()
+    def tree(self, request):
+        nodes = {}
+        roots = []
+        for category in Category.objects.order_by('depth', 'id').values('id', 'name', 'slug', 'parent_id'):
+            node = {'id': category['id'], 'name': category['name'], 'slug': category['slug'], 'children': []}
+            nodes[node['id']] = node
+            if category['parent_id'] is None:
+                roots.append(node)
+            elif category['parent_id'] in nodes:
+                nodes[category['parent_id']]['children'].append(node)
+        return Response(roots)
+
+# Пагинация и сортировка на счётчики не влияют — не дробят кэш фасетов
+FACETS_IGNORED_PARAMS = ('page', 'page_size', 'pagination', 'cursor', 'with_total', 'ordering')
+
+
+class ProductViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name']
+    search_fields = ['name', 'description']
     ordering_fields = ['price']
     pagination_class = CustomPagination
 
     def get_permissions(self):
         # 1. Добавление, удаление и редактирование товара — только Админ
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'toggle_active']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'toggle_active', 'cache_stats']:
             return [permissions.IsAdminUser()]
         # 2. Добавление отзыва — только авторизованный клиент
         if self.action == 'add_review':
@@ -52,6 +88,27 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Product.objects.all().order_by('-id')
         return Product.objects.filter(is_active=True).order_by('-id')
 
+    @cache_catalog_response()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_catalog_response(per_product=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        responses={200: ProductFacetsSerializer},
+        description=(
+            'Счётчики по категориям, корзинам цены и наличию для текущих фильтров и ?search= '
+            '(одним GROUP BY; кэшируется по набору фильтров)'
+        ),
+        summary='Фасеты каталога'
+    )
+    @action(detail=False, methods=['get'])
+    @cache_catalog_response(ignore_params=FACETS_IGNORED_PARAMS)
+    def facets(self, request):
+        return Response(compute_facets(self.filter_queryset(self.get_queryset())))
+
     @extend_schema(
         request=AddReviewSerializer,
         responses={201: {'type': 'object', 'properties': {'status': {'type': 'string'}}}},
@@ -68,7 +125,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         
         # Проверка покупки (клиент должен был купить этот товар ранее)
-        if not OrderItem.objects.filter(order__user=user, product=product).exists():
+        if not OrderItem.objects.filter(order__user_id=user.pk, product=product).exists():
             return Response({"error": "Pikir qaldırıw ushın aldın satıp alıń"}, status=403)
 
         defaults = {
@@ -79,25 +136,69 @@ class ProductViewSet(viewsets.ModelViewSet):
         defaults = {k: v for k, v in defaults.items() if v is not None}
 
         review, created = Review.objects.update_or_create(
-            user=user, product=product,
+            user_id=user.pk, product=product,
             defaults=defaults
         )
         msg = "Pikir qosıldı!" if created else "Pikir jańalandı!"
         return Response({'status': msg}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    @cache_catalog_response(per_product=True)
     def reviews(self, request, pk=None):
         product = self.get_object()
-        reviews = product.reviews.all().order_by('-created_at')
+        reviews = product.reviews.select_related('user').order_by('-created_at')
         page = self.paginate_queryset(reviews)
         if page is not None:
             serializer = ReviewSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         return Response(ReviewSerializer(reviews, many=True).data)
 
+    @extend_schema(
+        responses={200: ProductRecommendationSerializer(many=True)},
+        description=(
+            'Top-K товаров, которые чаще всего покупают вместе с этим '
+            '(одна выборка по индексу (product, rank); неактивные соседи пропускаются)'
+        ),
+        summary='Часто покупают вместе'
+    )
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny], pagination_class=None)
+    def recommendations(self, request, pk=None):
+        # Без get_object: у неизвестного товара соседей нет — пустой список, а не лишний запрос
+        if not pk.isdigit():
+            raise NotFound()
+        recommendations = (
+            ProductRecommendation.objects.filter(product_id=pk, related__is_active=True)
+            .select_related('related').order_by('rank')
+        )
+        return Response(ProductRecommendationSerializer(recommendations, many=True).data)
+
+    @extend_schema(
+        responses={200: ProductAvailabilitySerializer},
+        description='Остаток с учётом резервов корзин (без кэша, одна выборка по PK)',
+        summary='Доступное количество'
+    )
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        product = self.get_object()
+        return Response(ProductAvailabilitySerializer(product).data)
+
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
         product = self.get_object()
         product.is_active = not product.is_active
         product.save()
-        return Response({'status': 'success', 'message': f'Tovar {"Aktivlestirildi" if product.is_active else "Jasırıldı"}'})
\ No newline at end of file
+        return Response({'status': 'success', 'message': f'Tovar {"Aktivlestirildi" if product.is_active else "Jasırıldı"}'})
+
+    @extend_schema(
+        responses={200: {'type': 'object', 'properties': {
+            'hits': {'type': 'integer'},
+            'misses': {'type': 'integer'},
+            'not_modified': {'type': 'integer'},
+            'hit_ratio': {'type': 'number'},
+        }}},
+        description='Счётчики попаданий/промахов кэша каталога',
+        summary='Статистика кэша'
+    )
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        return Response(cache_stats())
\ No newline at end of file
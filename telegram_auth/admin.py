@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import TelegramOutbox
+from .outbox import REDACTED_TEXT
 
-# Register your models here.
+
+@admin.register(TelegramOutbox)
+class TelegramOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'chat_id', 'status', 'sensitive', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'sensitive')
+    search_fields = ('chat_id',)
+    # Коды входа не показываются даже до отправки
+    exclude = ('payload',)
+    readonly_fields = ('text',)
+
+    @admin.display(description='Текст')
+    def text(self, obj):
+        return REDACTED_TEXT if obj.sensitive else obj.payload.get('text', '')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from telegram_auth.otp import delete_expired_codes
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие одноразовые коды входа'
+
+    def handle(self, *args, **options):
+        deleted = delete_expired_codes()
+        self.stdout.write(self.style.SUCCESS(f'Удалено кодов: {deleted}'))
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from telegram_auth.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = 'Воркер отправки сообщений Telegram из outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--idle-sleep', type=float, default=0.5, help='Пауза, когда очередь пуста (сек)')
+        parser.add_argument('--once', action='store_true', help='Одна пачка и выход')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker()
+        while True:
+            close_old_connections()
+            worker.prune_if_due()
+            processed = worker.drain(batch_size=options['batch_size'])
+            if options['once']:
+                self.stdout.write(f'Обработано сообщений: {processed}')
+                return
+            if not processed:
+                time.sleep(options['idle_sleep'])
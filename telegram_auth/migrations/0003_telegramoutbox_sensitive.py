@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_auth', '0002_one_time_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramoutbox',
+            name='sensitive',
+            field=models.BooleanField(default=False),
+        ),
+    ]
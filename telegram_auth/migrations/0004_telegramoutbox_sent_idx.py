@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_auth', '0003_telegramoutbox_sensitive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='telegramoutbox',
+            index=models.Index(fields=['status', 'sent_at'], name='tg_outbox_sent_idx'),
+        ),
+    ]
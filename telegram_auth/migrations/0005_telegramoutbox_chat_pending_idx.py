@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_auth', '0004_telegramoutbox_sent_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='telegramoutbox',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['chat_id', 'id'], name='tg_outbox_chat_pending_idx'),
+        ),
+    ]
@@ -1,3 +1,48 @@
 from django.db import models
+from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-# Create your models here.
+User = get_user_model()
+
+
+class TelegramOutbox(models.Model):
+    """Исходящие сообщения бота; отправляет воркер `manage.py telegram_outbox`"""
+    STATUS_CHOICES = (
+        ('pending', 'Kútilmekte'),
+        ('sent', 'Jiberildi'),
+        ('failed', 'Qáte'),
+    )
+    chat_id = models.CharField(max_length=50)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Текст с кодом входа: после отправки (или окончательной ошибки) стирается из payload
+    sensitive = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='tg_outbox_due_idx'),
+            # Очистка отправленных: status='sent' AND sent_at < порога
+            models.Index(fields=['status', 'sent_at'], name='tg_outbox_sent_idx'),
+            # Порядок внутри чата: есть ли более раннее ожидающее сообщение (claim_batch)
+            models.Index(fields=['chat_id', 'id'], name='tg_outbox_chat_pending_idx', condition=models.Q(status='pending')),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} → {self.chat_id} ({self.status})"
+
+
+class OneTimeCode(models.Model):
+    """Одноразовый код входа. Хранится только HMAC кода, поиск — по уникальному индексу."""
+    code_hash = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='one_time_codes')
+    chat_id = models.CharField(max_length=50)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"OTP {self.user_id} до {self.expires_at:%H:%M}"
@@ -0,0 +1,75 @@
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import OneTimeCode
+
+
+class OTPRateLimited(Exception):
+    pass
+
+
+def hash_code(code):
+    return hmac.new(settings.SECRET_KEY.encode(), code.encode(), hashlib.sha256).hexdigest()
+
+
+def hit_limit(key, limit, window):
+    """Счётчик попыток в кэше; True — лимит за окно превышен"""
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, window)
+        count = 1
+    return count > limit
+
+
+def issue_code(user, chat_id):
+    """Выдаёт новый код пользователю (старые коды пользователя удаляются)"""
+    if hit_limit(f'otp:issued:chat:{chat_id}', settings.OTP_MAX_CODES_PER_CHAT, settings.OTP_LIMIT_WINDOW):
+        raise OTPRateLimited
+    OneTimeCode.objects.filter(user=user).delete()
+    expires_at = timezone.now() + timedelta(seconds=settings.OTP_TTL_SECONDS)
+    for _ in range(10):
+        code = str(secrets.randbelow(900000) + 100000)
+        code_hash = hash_code(code)
+        try:
+            with transaction.atomic():
+                # Тот же код мог остаться от истёкшей записи, ещё не удалённой чистильщиком
+                OneTimeCode.objects.filter(code_hash=code_hash, expires_at__lte=timezone.now()).delete()
+                OneTimeCode.objects.create(code_hash=code_hash, user=user, chat_id=str(chat_id), expires_at=expires_at)
+            return code
+        except IntegrityError:
+            continue
+    raise RuntimeError('Не удалось выдать уникальный код')
+
+
+aissue_code = sync_to_async(issue_code)
+
+
+def consume_code(code):
+    """
+    Одноразовое использование: DELETE ... RETURNING в одном запросе,
+    повторно тот же код не сработает даже при параллельных запросах.
+    Возвращает user_id или None.
+    """
+    table = connection.ops.quote_name(OneTimeCode._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE code_hash = %s AND expires_at > %s RETURNING user_id',
+            [hash_code(code), now],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def delete_expired_codes():
+    return OneTimeCode.objects.filter(expires_at__lte=timezone.now()).delete()[0]
@@ -0,0 +1,143 @@
+import random
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import TelegramOutbox
+from .utils import RateLimiter, TelegramClient, TelegramError, TelegramRetryAfter
+
+# Сколько секунд сообщение «арендовано» воркером; если воркер упал — его подхватит другой
+CLAIM_LEASE_SECONDS = 60
+# Текст sensitive-сообщения (код входа) после отправки: в БД код хранится только как HMAC
+REDACTED_TEXT = '[скрыто]'
+# Как часто воркер удаляет старые отправленные сообщения (сек)
+PRUNE_INTERVAL_SECONDS = 600
+
+
+def redact(message, fields):
+    if message.sensitive:
+        message.payload = {**message.payload, 'text': REDACTED_TEXT}
+        fields.append('payload')
+    return fields
+
+
+def claim_batch(batch_size):
+    """
+    Забирает пачку готовых к отправке сообщений (несколько воркеров не пересекаются).
+    Порядок внутри чата: сообщение не берётся, пока более раннее в том же чате ждёт
+    повтора или арендовано другим воркером; внутри пачки порядок держит drain().
+    """
+    now = timezone.now()
+    waiting_earlier = TelegramOutbox.objects.filter(
+        chat_id=OuterRef('chat_id'), status='pending', id__lt=OuterRef('id'), next_attempt_at__gt=now,
+    )
+    with transaction.atomic():
+        ids = list(
+            TelegramOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .exclude(Exists(waiting_earlier))
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            TelegramOutbox.objects.filter(id__in=ids).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+            )
+    return list(TelegramOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def prune_sent(retention_days=None, batch_size=1000):
+    """
+    Удаляет отправленные сообщения старше retention_days пачками по batch_size,
+    чтобы не держать долгие блокировки. Ошибочные (failed) остаются для разбора.
+    Возвращает число удалённых строк.
+    """
+    if retention_days is None:
+        retention_days = settings.TELEGRAM_OUTBOX_RETENTION_DAYS
+    threshold = timezone.now() - timedelta(days=retention_days)
+    old = TelegramOutbox.objects.filter(status='sent', sent_at__lt=threshold)
+    deleted = 0
+    while True:
+        ids = list(old.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += TelegramOutbox.objects.filter(id__in=ids).delete()[0]
+
+
+def retry_delay(attempts):
+    # Экспоненциальная задержка с джиттером: 2, 4, 8, ... секунд, не больше 5 минут
+    return min(2 ** attempts, 300) + random.uniform(0, 1)
+
+
+class OutboxWorker:
+    def __init__(self, client=None, limiter=None, max_attempts=None):
+        self.client = client or TelegramClient()
+        self.limiter = limiter or RateLimiter()
+        self.max_attempts = max_attempts or settings.TELEGRAM_OUTBOX_MAX_ATTEMPTS
+        self.next_prune_at = 0
+
+    def prune_if_due(self):
+        """Очистка раз в PRUNE_INTERVAL_SECONDS; возвращает число удалённых сообщений"""
+        now = time.monotonic()
+        if now < self.next_prune_at:
+            return 0
+        self.next_prune_at = now + PRUNE_INTERVAL_SECONDS
+        return prune_sent()
+
+    def drain(self, batch_size=100):
+        """Отправляет одну пачку. Возвращает количество обработанных сообщений."""
+        messages = claim_batch(batch_size)
+        deferred_chats = set()
+        for message in messages:
+            # Порядок внутри чата: если предыдущее сообщение отложено — откладываем и это
+            delay = self.limiter.chat_delay(message.chat_id)
+            if message.chat_id in deferred_chats or delay > 0:
+                deferred_chats.add(message.chat_id)
+                self.postpone(message, max(delay, self.limiter.chat_interval))
+                continue
+            self.limiter.acquire(message.chat_id)
+            if not self.deliver(message):
+                deferred_chats.add(message.chat_id)
+        return len(messages)
+
+    def deliver(self, message):
+        now = timezone.now()
+        try:
+            self.client.call('sendMessage', message.payload)
+        except TelegramRetryAfter as e:
+            self.postpone(message, e.retry_after, error=str(e))
+            return False
+        except TelegramError as e:
+            message.attempts += 1
+            self.fail(message, str(e))
+            return False
+        except (requests.RequestException, ValueError) as e:
+            message.attempts += 1
+            if message.attempts >= self.max_attempts:
+                self.fail(message, str(e))
+            else:
+                self.postpone(message, retry_delay(message.attempts), error=str(e))
+            return False
+
+        message.status = 'sent'
+        message.sent_at = now
+        message.attempts += 1
+        message.save(update_fields=redact(message, ['status', 'sent_at', 'attempts']))
+        return True
+
+    def postpone(self, message, seconds, error=None):
+        message.next_attempt_at = timezone.now() + timedelta(seconds=seconds)
+        fields = ['next_attempt_at', 'attempts']
+        if error is not None:
+            message.last_error = error
+            fields.append('last_error')
+        message.save(update_fields=fields)
+
+    def fail(self, message, error):
+        message.status = 'failed'
+        message.last_error = error
+        message.save(update_fields=redact(message, ['status', 'last_error', 'attempts']))
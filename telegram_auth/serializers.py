@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from django.utils import timezone
 from django.contrib.auth import get_user_model
+from .otp import consume_code
 
 User = get_user_model()
 
@@ -18,12 +18,10 @@ class TelegramLoginSerializer(serializers.Serializer):
         if not code or len(code) != 6 or not code.isdigit():
             raise serializers.ValidationError("Kod 6 san bolıwı kerek")
 
-        user = User.objects.filter(
-            verification_code=code, 
-            code_expires_at__gt=timezone.now()
-        ).first()
+        user_id = consume_code(code)
+        user = User.objects.filter(pk=user_id).first() if user_id else None
         
         if not user:
             raise serializers.ValidationError("Kod qate yamasa waqtı ótken")
 
-        return {'user': user}
\ No newline at end of file
+        return {'user': user}
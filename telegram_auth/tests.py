@@ -1,3 +1,183 @@
-from django.test import TestCase
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.test import Client, TestCase, override_settings
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import OneTimeCode, TelegramOutbox
+from .otp import consume_code, hash_code, issue_code
+from .outbox import OutboxWorker, prune_sent
+from .utils import RateLimiter, TelegramClient, enqueue_telegram_message
+
+
+class StubTelegramHandler(BaseHTTPRequestHandler):
+    """Локальная заглушка Bot API: отвечает по очереди из server.responses"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append((self.path, body))
+        status, payload = self.server.responses.pop(0) if self.server.responses else (200, {'ok': True, 'result': {}})
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(TELEGRAM_BOT_TOKEN='test-token')
+class TelegramOutboxTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubTelegramHandler)
+        self.server.requests = []
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        client = TelegramClient(api_url=f'http://127.0.0.1:{self.server.server_port}', timeout=(1, 2))
+        self.worker = OutboxWorker(client=client, limiter=RateLimiter(global_per_second=1000, chat_per_second=1000))
+
+    def test_webhook_enqueues_instead_of_sending(self):
+        response = self.client.post(
+            '/api/auth/telegram/webhook/',
+            data=json.dumps({'message': {'chat': {'id': 42}, 'text': '/start', 'from': {'first_name': 'Ali'}}}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TelegramOutbox.objects.get().chat_id, '42')
+        self.assertEqual(self.server.requests, [])
+
+    def test_webhook_drops_redelivered_updates(self):
+        client = Client(enforce_csrf_checks=True)
+        update = json.dumps({'update_id': 9001, 'message': {'chat': {'id': 7}, 'text': '/login'}})
+        for _ in range(3):
+            response = client.post('/api/auth/telegram/webhook/', data=update, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(TelegramOutbox.objects.get().payload['text'], '/start basıń.')
+
+    def test_failed_update_is_processed_on_retry(self):
+        client = Client(raise_request_exception=False)
+        update = json.dumps({'update_id': 9002, 'message': {'chat': {'id': 8}, 'text': '/login'}})
+        with mock.patch('telegram_auth.views.aenqueue_telegram_messages', side_effect=RuntimeError('db down')):
+            response = client.post('/api/auth/telegram/webhook/', data=update, content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+
+        response = client.post('/api/auth/telegram/webhook/', data=update, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TelegramOutbox.objects.get().chat_id, '8')
+
+    def test_worker_sends_pending_messages_in_order(self):
+        enqueue_telegram_message(42, 'first')
+        enqueue_telegram_message(42, 'second')
+
+        self.assertEqual(self.worker.drain(), 2)
+
+        self.assertEqual([body['text'] for _, body in self.server.requests], ['first', 'second'])
+        self.assertEqual(self.server.requests[0][0], '/bottest-token/sendMessage')
+        self.assertEqual(set(TelegramOutbox.objects.values_list('status', flat=True)), {'sent'})
+
+    def test_rate_limited_and_failed_messages_are_retried_later(self):
+        self.server.responses = [
+            (429, {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 7}}),
+            (502, {'ok': False}),
+        ]
+        limited = enqueue_telegram_message(1, 'limited')
+        broken = enqueue_telegram_message(2, 'broken')
+
+        self.worker.drain()
+
+        limited.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((limited.status, limited.attempts), ('pending', 0))
+        self.assertGreater(limited.next_attempt_at, limited.created_at)
+        self.assertEqual((broken.status, broken.attempts), ('pending', 1))
+        self.assertEqual(self.worker.drain(), 0)
+
+    def test_message_waits_for_earlier_one_in_backoff(self):
+        self.server.responses = [(502, {'ok': False})]
+        first = enqueue_telegram_message(1, 'first')
+        enqueue_telegram_message(1, 'second')
+        enqueue_telegram_message(2, 'other')
+
+        self.worker.drain()
+        self.assertEqual(self.worker.drain(), 0)  # first в backoff — second его ждёт
+
+        TelegramOutbox.objects.filter(pk=first.pk).update(next_attempt_at=timezone.now())
+        self.worker.drain()
+
+        self.assertEqual([body['text'] for _, body in self.server.requests], ['first', 'other', 'first', 'second'])
+        self.assertEqual(set(TelegramOutbox.objects.values_list('status', flat=True)), {'sent'})
+
+    def test_login_code_is_erased_from_outbox_after_delivery(self):
+        user = User.objects.create(username='ali', phone='+998900000051', telegram_chat_id='77')
+        update = {'update_id': 9101, 'message': {'chat': {'id': 77}, 'text': '/login'}}
+        self.client.post('/api/auth/telegram/webhook/', data=json.dumps(update), content_type='application/json')
+
+        self.worker.drain()
+
+        code = re.search(r'<code>(\d+)</code>', self.server.requests[0][1]['text']).group(1)
+        self.assertEqual(consume_code(code), user.pk)
+        payloads = json.dumps(list(TelegramOutbox.objects.values_list('payload', flat=True)))
+        self.assertNotIn(code, payloads)
+        self.assertEqual(TelegramOutbox.objects.get().status, 'sent')
+
+    def test_worker_prunes_old_sent_messages(self):
+        old, recent, failed = (enqueue_telegram_message(1, text) for text in ('old', 'recent', 'failed'))
+        TelegramOutbox.objects.filter(pk__in=[old.pk, recent.pk]).update(status='sent', sent_at=timezone.now())
+        TelegramOutbox.objects.filter(pk=old.pk).update(sent_at=timezone.now() - timedelta(days=8))
+        TelegramOutbox.objects.filter(pk=failed.pk).update(status='failed', created_at=timezone.now() - timedelta(days=30))
+
+        with self.settings(TELEGRAM_OUTBOX_RETENTION_DAYS=7):
+            self.assertEqual(self.worker.prune_if_due(), 1)
+            self.assertEqual(self.worker.prune_if_due(), 0)
+
+        self.assertEqual(set(TelegramOutbox.objects.values_list('id', flat=True)), {recent.pk, failed.pk})
+        self.assertEqual(prune_sent(retention_days=0, batch_size=1), 1)
+
+
+class OneTimeCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='ali', phone='+998901112233', telegram_chat_id='5')
+
+    def test_code_is_stored_hashed_and_consumed_once(self):
+        code = issue_code(self.user, 5)
+
+        self.assertEqual(OneTimeCode.objects.get().code_hash, hash_code(code))
+        self.assertEqual(consume_code(code), self.user.id)
+        self.assertIsNone(consume_code(code))
+
+    def test_expired_code_is_rejected(self):
+        code = issue_code(self.user, 5)
+        OneTimeCode.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = APIClient().post('/api/auth/telegram/', {'code': code}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_returns_tokens(self):
+        code = issue_code(self.user, 5)
+
+        response = APIClient().post('/api/auth/telegram/', {'code': code}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'ali')
+        self.assertFalse(OneTimeCode.objects.exists())
+
+    @override_settings(OTP_MAX_ATTEMPTS_PER_IP=2)
+    def test_attempts_are_limited_per_ip(self):
+        client = APIClient()
+        statuses = [client.post('/api/auth/telegram/', {'code': '000000'}, format='json').status_code for _ in range(3)]
+        self.assertEqual(statuses, [400, 400, 429])
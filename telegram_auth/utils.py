@@ -1,22 +1,117 @@
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 
 
-def send_telegram_message(chat_id, text, reply_markup=None):
-    token = settings.TELEGRAM_BOT_TOKEN
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    
+class TelegramError(Exception):
+    """Постоянная ошибка (400/403 и т.п.) — повтор не поможет"""
+
+
+class TelegramRetryAfter(TelegramError):
+    """429 от Telegram: повторить не раньше чем через retry_after секунд"""
+
+    def __init__(self, retry_after, description=''):
+        self.retry_after = retry_after
+        super().__init__(description or f'Retry after {retry_after}s')
+
+
+class TelegramClient:
+    """HTTP-клиент Bot API с постоянным пулом соединений и таймаутами"""
+
+    def __init__(self, token=None, api_url=None, timeout=None, pool_size=10):
+        self.token = token or settings.TELEGRAM_BOT_TOKEN
+        self.api_url = (api_url or settings.TELEGRAM_API_URL).rstrip('/')
+        self.timeout = timeout or settings.TELEGRAM_HTTP_TIMEOUT
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def call(self, method, payload):
+        """
+        Вызывает метод Bot API. Сетевые ошибки и 5xx пробрасываются как
+        requests.RequestException — их стоит повторить.
+        """
+        response = self.session.post(f"{self.api_url}/bot{self.token}/{method}", json=payload, timeout=self.timeout)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        data = response.json()
+        if data.get('ok'):
+            return data
+        if response.status_code == 429:
+            retry_after = data.get('parameters', {}).get('retry_after', 1)
+            raise TelegramRetryAfter(retry_after, data.get('description', ''))
+        raise TelegramError(data.get('description') or f'HTTP {response.status_code}')
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        return self.call('sendMessage', build_message(chat_id, text, reply_markup))
+
+
+class RateLimiter:
+    """
+    Ограничения Telegram: ~30 сообщений/с на бота и ~1 сообщение/с в один чат.
+    Глобальный лимит выдерживается ожиданием, по чату — отвечаем, когда чат освободится.
+    """
+
+    def __init__(self, global_per_second=None, chat_per_second=None):
+        self.global_interval = 1 / (global_per_second or settings.TELEGRAM_GLOBAL_RATE_LIMIT)
+        self.chat_interval = 1 / (chat_per_second or settings.TELEGRAM_CHAT_RATE_LIMIT)
+        self.next_global = 0.0
+        self.next_chat = {}
+
+    def chat_delay(self, chat_id):
+        return max(self.next_chat.get(chat_id, 0.0) - time.monotonic(), 0.0)
+
+    def acquire(self, chat_id):
+        wait = self.next_global - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        now = time.monotonic()
+        self.next_global = now + self.global_interval
+        self.next_chat[chat_id] = now + self.chat_interval
+        if len(self.next_chat) > 10000:
+            self.next_chat = {chat: ts for chat, ts in self.next_chat.items() if ts > now}
+
+
+def build_message(chat_id, text, reply_markup=None):
     data = {
         "chat_id": chat_id,
         "text": text,
         "parse_mode": "HTML"
     }
-    
     if reply_markup:
         data["reply_markup"] = reply_markup
-        
+    return data
+
+
+def outbox_message(chat_id, text, reply_markup=None, sensitive=False):
+    from .models import TelegramOutbox
+    return TelegramOutbox(chat_id=str(chat_id), payload=build_message(chat_id, text, reply_markup), sensitive=sensitive)
+
+
+def enqueue_telegram_message(chat_id, text, reply_markup=None, sensitive=False):
+    """Кладёт сообщение в outbox — HTTP-запрос выполнит воркер, а не поток запроса"""
+    message = outbox_message(chat_id, text, reply_markup, sensitive)
+    message.save()
+    return message
+
+
+async def aenqueue_telegram_messages(chat_id, messages):
+    """Async-вариант для webhook: [(text, reply_markup[, sensitive]), ...] одной вставкой в outbox"""
+    from .models import TelegramOutbox
+    await TelegramOutbox.objects.abulk_create([outbox_message(chat_id, *message) for message in messages])
+
+
+_client = None
+
+
+def send_telegram_message(chat_id, text, reply_markup=None):
+    """Синхронная отправка в обход outbox (для скриптов и админских действий)"""
+    global _client
+    if _client is None:
+        _client = TelegramClient()
     try:
-        response = requests.post(url, json=data)
-        return response.json()
-    except Exception as e:
-        print(f"Telegram send error: {e}")  # Оставьте только ошибки
\ No newline at end of file
+        return _client.send_message(chat_id, text, reply_markup=reply_markup)
+    except (TelegramError, requests.RequestException) as e:
+        print(f"Telegram send error: {e}")  # Оставьте только ошибки
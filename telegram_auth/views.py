@@ -1,7 +1,8 @@
 import json
-import random
-from datetime import timedelta
-from django.utils import timezone
+from collections import OrderedDict
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
@@ -10,25 +11,69 @@ from rest_framework import permissions, status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema  # ДОБАВЬТЕ
+from users.authentication import user_token_claims
 from .serializers import TelegramLoginSerializer
-from .utils import send_telegram_message
+from .otp import OTPRateLimited, aissue_code, hit_limit
+from .utils import aenqueue_telegram_messages
 
 User = get_user_model()
 
 
+class RecentUpdates:
+    """
+    Ограниченное окно последних update_id: Telegram повторяет апдейты при медленном ответе.
+    Окно живёт в памяти процесса — повтор, пришедший в другой воркер, не отсекается.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.ids = OrderedDict()
+
+    def seen(self, update_id):
+        if update_id in self.ids:
+            return True
+        self.ids[update_id] = None
+        if len(self.ids) > self.size:
+            self.ids.popitem(last=False)
+        return False
+
+    def forget(self, update_id):
+        """Апдейт не обработан — повтор от Telegram должен пройти"""
+        self.ids.pop(update_id, None)
+
+
+recent_updates = RecentUpdates(settings.TELEGRAM_UPDATE_WINDOW)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
-class TelegramWebhookView(APIView):
-    permission_classes = [permissions.AllowAny]
-    
-    def post(self, request):
+class TelegramWebhookView(View):
+    """
+    Асинхронный webhook (ASGI): ORM через async API, ответы бота — одной вставкой в outbox,
+    HTTP к Telegram отправляет воркер telegram_outbox.
+    """
+    http_method_names = ['post']
+
+    async def post(self, request):
         try: 
             data = json.loads(request.body)
-        except: 
-            return Response(status=status.HTTP_200_OK)
-            
+        except ValueError: 
+            return HttpResponse(status=200)
+
+        update_id = data.get('update_id')
+        if update_id is None:
+            return await self.handle_update(data)
+        if recent_updates.seen(update_id):
+            return HttpResponse(status=200)
+        try:
+            return await self.handle_update(data)
+        except BaseException:
+            recent_updates.forget(update_id)
+            raise
+
+    async def handle_update(self, data):
         message = data.get('message', {})
         if not message: 
-            return Response(status=status.HTTP_200_OK)
+            return HttpResponse(status=200)
             
         chat_id = message.get('chat', {}).get('id')
         text = message.get('text', '')
@@ -40,8 +85,9 @@ class TelegramWebhookView(APIView):
         tg_username = from_user.get('username')
 
         if not chat_id: 
-            return Response(status=status.HTTP_200_OK)
+            return HttpResponse(status=200)
 
+        replies = []
         if text == '/start':
             keyboard = {
                 "keyboard": [[{"text": "📱 Kontaktin'izdi jiberin'", "request_contact": True}]], 
@@ -49,14 +95,14 @@ class TelegramWebhookView(APIView):
                 "one_time_keyboard": True
             }
             msg = f"Salem {first_name} 👋\nOnline Dúkan'ǵa xosh kelibsiz!\n⬇️ Kontaktti jiberin'"
-            send_telegram_message(chat_id, msg, reply_markup=keyboard)
+            replies.append((msg, keyboard))
             
         elif contact:
             phone = contact.get('phone_number')
             if not phone.startswith('+'): 
                 phone = '+' + phone
                 
-            user, created = User.objects.get_or_create(
+            user, created = await User.objects.aget_or_create(
                 phone=phone, 
                 defaults={'telegram_chat_id': str(chat_id)}
             )
@@ -76,35 +122,37 @@ class TelegramWebhookView(APIView):
             if not new_username: 
                 new_username = phone
             if user.username != new_username:
-                if not User.objects.filter(username=new_username).exclude(id=user.id).exists(): 
+                if not await User.objects.filter(username=new_username).exclude(id=user.id).aexists(): 
                     user.username = new_username
                     changed = True
             
             if changed: 
-                user.save()
+                await user.asave()
 
             if created: 
-                send_telegram_message(chat_id, "🎉 <b>Siz tabıslı dizimnen óttińiz!</b>")
+                replies.append(("🎉 <b>Siz tabıslı dizimnen óttińiz!</b>", None))
             else: 
-                send_telegram_message(chat_id, "👋 <b>Qaytqanın'izdan quwanıshlımız!</b>")
-            self.send_otp(user, chat_id)
+                replies.append(("👋 <b>Qaytqanın'izdan quwanıshlımız!</b>", None))
+            replies.append(await self.send_otp(user, chat_id))
             
         elif text == '/login':
             try: 
-                user = User.objects.get(telegram_chat_id=str(chat_id))
-                self.send_otp(user, chat_id)
+                user = await User.objects.aget(telegram_chat_id=str(chat_id))
+                replies.append(await self.send_otp(user, chat_id))
             except User.DoesNotExist: 
-                send_telegram_message(chat_id, "/start basıń.")
-                
-        return Response(status=status.HTTP_200_OK)
+                replies.append(("/start basıń.", None))
 
-    def send_otp(self, user, chat_id):
-        code = str(random.randint(100000, 999999))
-        user.verification_code = code
-        user.code_expires_at = timezone.now() + timedelta(minutes=5)
-        user.save(update_fields=['verification_code', 'code_expires_at'])
+        if replies:
+            await aenqueue_telegram_messages(chat_id, replies)
+        return HttpResponse(status=200)
+
+    async def send_otp(self, user, chat_id):
+        try:
+            code = await aissue_code(user, chat_id)
+        except OTPRateLimited:
+            return "⏳ Kóp soraw. Birazdan soń /login basıń.", None
         msg = f"🔒 Code: <code>{code}</code>\n\n🔑 Jan'adan kod aliw ushin /login"
-        send_telegram_message(chat_id, msg, reply_markup={"remove_keyboard": True})
+        return msg, {"remove_keyboard": True}, True
 
 
 class TelegramAuthView(APIView):
@@ -127,16 +175,20 @@ class TelegramAuthView(APIView):
         summary='Telegram Login'
     )
     def post(self, request):
+        ip = request.META.get('REMOTE_ADDR', '')
+        if hit_limit(f'otp:attempts:ip:{ip}', settings.OTP_MAX_ATTEMPTS_PER_IP, settings.OTP_LIMIT_WINDOW):
+            return Response({"error": "Urınıwlar kóp. Keyinirek qaytalań."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
         serializer = TelegramLoginSerializer(data=request.data)
         if not serializer.is_valid(): 
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         user = serializer.validated_data['user']
-        user.verification_code = None
-        user.code_expires_at = None
-        user.save(update_fields=['verification_code', 'code_expires_at'])
         
         refresh = RefreshToken.for_user(user)
+        # Claims позволяют CachedJWTAuthentication не ходить в БД за пользователем
+        for claim, value in user_token_claims(user).items():
+            refresh[claim] = value
         return Response({
             'refresh': str(refresh), 
             'access': str(refresh.access_token), 
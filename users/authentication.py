@@ -0,0 +1,141 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+USER_CACHE_KEY = 'auth:user:{}'
+# Поля, которых хватает для проверки прав и фильтрации по пользователю
+CACHED_FIELDS = ('username', 'role', 'is_staff', 'is_superuser', 'is_active')
+# Claims, которые TelegramAuthView кладёт в токен при выдаче
+TOKEN_CLAIMS = ('username', 'role', 'is_staff', 'is_active')
+# Так кэшируется удалённый пользователь: токены с его claims отклоняются
+DELETED_ATTRS = {'username': '', 'role': 'client', 'is_staff': False, 'is_superuser': False, 'is_active': False}
+
+
+# Время выдачи claims: в отличие от iat, не обновляется при выпуске access по refresh-токену
+CLAIMS_ISSUED_AT = 'claims_iat'
+
+
+def user_token_claims(user):
+    claims = {claim: getattr(user, claim) for claim in TOKEN_CLAIMS}
+    claims[CLAIMS_ISSUED_AT] = int(time.time())
+    return claims
+
+
+class CachedUser(SimpleLazyObject):
+    """
+    Пользователь, известный по кэшу или claims токена.
+    id, username, role, is_staff и т.п. отдаются без запроса к БД;
+    обращение к любому другому атрибуту загружает настоящую модель User.
+    """
+
+    def __init__(self, user_id, attrs, instance=None):
+        super().__init__(lambda: User.objects.get(pk=user_id))
+        if instance is not None:
+            self._wrapped = instance
+        self.__dict__['_attrs'] = {
+            'id': user_id, 'pk': user_id, 'is_authenticated': True, 'is_anonymous': False, **attrs
+        }
+
+    def __bool__(self):
+        return True
+
+    def __getattr__(self, name):
+        attrs = self.__dict__['_attrs']
+        if self._wrapped is empty and name in attrs:
+            return attrs[name]
+        return super().__getattr__(name)
+
+
+def resolve_user(user):
+    """Настоящий экземпляр User (для сериализаторов, которые его сохраняют)"""
+    # isinstance() у ленивого объекта сам загрузил бы модель
+    if type(user) is CachedUser:
+        if user._wrapped is empty:
+            user._setup()
+        return user._wrapped
+    return user
+
+
+def cache_user_attrs(user_id, attrs):
+    # Живёт не меньше срока доверия claims: свежие данные перекрывают устаревшие claims токена
+    timeout = max(settings.AUTH_USER_CACHE_TTL, settings.AUTH_USER_CLAIMS_MAX_AGE)
+    cache.set(USER_CACHE_KEY.format(user_id), attrs, timeout)
+
+
+def invalidate_cached_user(user, deleted=False):
+    """Обновляет кэш после коммита; удалённый пользователь кэшируется как неактивный"""
+    user_id = user.pk
+    attrs = {field: getattr(user, field) for field in CACHED_FIELDS}
+    if deleted:
+        attrs['is_active'] = False
+    transaction.on_commit(lambda: cache_user_attrs(user_id, attrs))
+
+
+def invalidate_cached_users(user_ids):
+    """
+    То же для QuerySet.update()/delete() в обход save/delete: после коммита
+    атрибуты перечитываются из БД, не найденные пользователи кэшируются как удалённые.
+    """
+    user_ids = list(user_ids)
+
+    def refresh():
+        found = {row.pop('pk'): row for row in User.objects.filter(pk__in=user_ids).values('pk', *CACHED_FIELDS)}
+        for user_id in user_ids:
+            cache_user_attrs(user_id, found.get(user_id, DELETED_ATTRS))
+    if user_ids:
+        transaction.on_commit(refresh)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication без запроса к users_user на каждый вызов:
+    1) кэш (обновляется в User.save/delete и UserQuerySet.update/delete),
+    2) claims из токена, если токен выдан недавно (только с общим кэшем, см. users.E001),
+    3) иначе одна загрузка из БД с записью в кэш.
+    is_active проверяется на любом пути: запись кэша о деактивации живёт
+    не меньше AUTH_USER_CLAIMS_MAX_AGE и перекрывает claims.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+        # simplejwt кладёт id строкой, а request.user.pk должен совпадать с user_id моделей
+        user_id = User._meta.get_field(api_settings.USER_ID_FIELD).to_python(user_id)
+
+        instance = None
+        attrs = cache.get(USER_CACHE_KEY.format(user_id))
+        if attrs is None:
+            attrs = self.attrs_from_claims(validated_token)
+        if attrs is None:
+            try:
+                instance = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist as e:
+                raise AuthenticationFailed("User not found", code="user_not_found") from e
+            attrs = {field: getattr(instance, field) for field in CACHED_FIELDS}
+            cache.set(USER_CACHE_KEY.format(user_id), attrs, settings.AUTH_USER_CACHE_TTL)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not attrs['is_active']:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return CachedUser(user_id, attrs, instance=instance)
+
+    @staticmethod
+    def attrs_from_claims(validated_token):
+        # Claims могли устареть (смена роли), поэтому доверяем им ограниченное время
+        if settings.AUTH_USER_CLAIMS_MAX_AGE <= 0:
+            return None
+        issued_at = validated_token.get(CLAIMS_ISSUED_AT)
+        if issued_at is None or any(claim not in validated_token for claim in TOKEN_CLAIMS):
+            return None
+        if time.time() - issued_at > settings.AUTH_USER_CLAIMS_MAX_AGE:
+            return None
+        return {claim: validated_token[claim] for claim in TOKEN_CLAIMS}
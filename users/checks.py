@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from config.caches import cache_is_shared
+
+
+@register(Tags.security)
+def check_claims_cache(app_configs, **kwargs):
+    # Деактивация пользователя должна дойти до всех воркеров раньше, чем истечёт доверие к claims
+    if settings.AUTH_USER_CLAIMS_MAX_AGE > 0 and not cache_is_shared():
+        return [Error(
+            'AUTH_USER_CLAIMS_MAX_AGE > 0 требует общего кэша (Redis, Memcached, файловый), '
+            f"а CACHE_BACKEND — {settings.CACHES['default']['BACKEND']}",
+            hint='Задайте общий CACHE_BACKEND или AUTH_USER_CLAIMS_MAX_AGE=0.',
+            id='users.E001',
+        )]
+    return []
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 20:47
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='code_expires_at',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='verification_code',
+        ),
+    ]
@@ -1,7 +1,31 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
 
+class UserQuerySet(models.QuerySet):
+    """Массовые update()/delete() тоже обновляют кэш пользователей для JWT"""
+
+    def update(self, **kwargs):
+        from .authentication import CACHED_FIELDS, invalidate_cached_users
+        if not set(kwargs) & set(CACHED_FIELDS):
+            return super().update(**kwargs)
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        invalidate_cached_users(user_ids)
+        return rows
+
+    def delete(self):
+        from .authentication import invalidate_cached_users
+        user_ids = list(self.values_list('pk', flat=True))
+        result = super().delete()
+        invalidate_cached_users(user_ids)
+        return result
+
+
+class CachedUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     """Модель пользователя с дополнительными полями"""
     ROLES = (('admin', 'Admin'), ('client', 'Client'))
@@ -12,14 +36,24 @@ class User(AbstractUser):
     
     # Поля для Telegram авторизации
     telegram_chat_id = models.CharField(max_length=50, unique=True, null=True, blank=True)
-    verification_code = models.CharField(max_length=6, null=True, blank=True)
-    code_expires_at = models.DateTimeField(null=True, blank=True)
     
     REQUIRED_FIELDS = ['phone']
 
+    objects = CachedUserManager()
+
     def __str__(self):
         return self.username or self.phone
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .authentication import invalidate_cached_user
+        invalidate_cached_user(self)
+
+    def delete(self, *args, **kwargs):
+        from .authentication import invalidate_cached_user
+        invalidate_cached_user(self, deleted=True)
+        return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
\ No newline at end of file
@@ -0,0 +1,6 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Та же схема Bearer JWT в документации для CachedJWTAuthentication"""
+    target_class = 'users.authentication.CachedJWTAuthentication'
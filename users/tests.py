@@ -1,3 +1,105 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication, CachedUser, user_token_claims
+from .models import User
+
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Claims доверяются только с общим кэшем — здесь файловый во временном каталоге"""
+
+    @classmethod
+    def setUpClass(cls):
+        cache_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cache_dir.cleanup)
+        cls.enterClassContext(override_settings(
+            CACHES={'default': {'BACKEND': FILE_CACHE, 'LOCATION': cache_dir.name}},
+            AUTH_USER_CLAIMS_MAX_AGE=600,
+        ))
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='aziz', phone='+998900000021', address='Nukus')
+        self.factory = APIRequestFactory()
+
+    def token_for(self, user, claims=True):
+        refresh = RefreshToken.for_user(user)
+        if claims:
+            for claim, value in user_token_claims(user).items():
+                refresh[claim] = value
+        return str(refresh.access_token)
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_claims_resolve_user_without_queries(self):
+        token = self.token_for(self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+            self.assertEqual((user.pk, user.username, user.role, user.is_staff), (self.user.pk, 'aziz', 'client', False))
+        self.assertIs(type(user), CachedUser)
+
+    def test_plain_token_is_loaded_once_then_cached(self):
+        token = self.token_for(self.user, claims=False)
+        with self.assertNumQueries(1):
+            self.authenticate(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(token).username, 'aziz')
+
+    def test_save_overrides_stale_claims(self):
+        token = self.token_for(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = 'admin'
+            self.user.save()
+        self.assertEqual(self.authenticate(token).role, 'admin')
+
+    def test_profile_gets_real_instance(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token_for(self.user)}')
+
+        response = client.patch('/api/users/profile/', {'address': 'Tashkent'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.address, 'Tashkent')
+
+    def test_deactivated_user_is_rejected_with_old_token(self):
+        token = self.token_for(self.user)
+        self.authenticate(token)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deactivation_via_save_overrides_claims(self):
+        token = self.token_for(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deleted_user_is_rejected_with_old_token(self):
+        token = self.token_for(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).delete()
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+
+class ClaimsCacheCheckTests(TestCase):
+    def test_claims_require_shared_cache(self):
+        with override_settings(AUTH_USER_CLAIMS_MAX_AGE=600):
+            self.assertIn('users.E001', [error.id for error in run_checks()])
+        with override_settings(AUTH_USER_CLAIMS_MAX_AGE=0):
+            self.assertNotIn('users.E001', [error.id for error in run_checks()])
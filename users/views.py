@@ -1,4 +1,5 @@
 from rest_framework import generics, permissions
+from .authentication import resolve_user
 from .models import User
 from .serializers import UserSerializer
 
@@ -13,4 +14,4 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         # Возвращает текущего пользователя, залогиненного через токен
-        return self.request.user
\ No newline at end of file
+        return resolve_user(self.request.user)